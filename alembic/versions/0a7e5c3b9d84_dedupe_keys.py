@@ -0,0 +1,35 @@
+"""dedupe keys
+
+Revision ID: 0a7e5c3b9d84
+Revises: f3b8d2a6e910
+Create Date: 2026-10-18 19:05:12.840617
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7e5c3b9d84'
+down_revision: Union[str, None] = 'f3b8d2a6e910'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('dedupe_keys',
+    sa.Column('entity_type', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('value', sa.String(), nullable=False),
+    sa.Column('indexed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('entity_type', 'entity_id', 'kind', 'value')
+    )
+    op.create_index('ix_dedupe_keys_kind_value', 'dedupe_keys', ['kind', 'value'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_dedupe_keys_kind_value', table_name='dedupe_keys')
+    op.drop_table('dedupe_keys')
@@ -0,0 +1,31 @@
+"""lead score
+
+Revision ID: 1c4e8f2b7a65
+Revises: 0a7e5c3b9d84
+Create Date: 2026-10-18 21:12:47.306118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c4e8f2b7a65'
+down_revision: Union[str, None] = '0a7e5c3b9d84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # a constant server default is a catalog-only change, existing leads read
+    # as 0 until the first rescore
+    op.add_column('leads', sa.Column('lead_score', sa.Float(),
+                  server_default='0', nullable=False))
+    op.create_index('ix_leads_lead_score_id', 'leads', ['lead_score', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leads_lead_score_id', table_name='leads')
+    op.drop_column('leads', 'lead_score')
@@ -0,0 +1,38 @@
+"""lead keyset index
+
+Revision ID: 57b9fafa6d81
+Revises: c7403cba2adb
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '57b9fafa6d81'
+down_revision: Union[str, None] = 'c7403cba2adb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # rows without created_at would drop out of (created_at, id) keyset pages
+    op.execute("UPDATE leads SET created_at = now() WHERE created_at IS NULL")
+    op.alter_column('leads', 'created_at',
+                    existing_type=sa.DateTime(timezone=True),
+                    existing_server_default=sa.text('now()'),
+                    nullable=False)
+    op.create_index('ix_leads_created_at_id', 'leads', ['created_at', 'id'], unique=False)
+    op.create_index('ix_leads_lead_status_created_at_id', 'leads', ['lead_status', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_leads_lead_status_created_at_id', table_name='leads')
+    op.drop_index('ix_leads_created_at_id', table_name='leads')
+    op.alter_column('leads', 'created_at',
+                    existing_type=sa.DateTime(timezone=True),
+                    existing_server_default=sa.text('now()'),
+                    nullable=True)
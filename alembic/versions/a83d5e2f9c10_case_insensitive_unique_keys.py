@@ -0,0 +1,42 @@
+"""case insensitive unique keys
+
+Revision ID: a83d5e2f9c10
+Revises: e41f0c9a7b23
+Create Date: 2026-10-18 13:26:51.447190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a83d5e2f9c10'
+down_revision: Union[str, None] = 'e41f0c9a7b23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNIQUE_KEYS = (
+    ('ux_leads_lower_lead_email', 'leads', 'lead_email'),
+    ('ux_contacts_lower_contact_email', 'contacts', 'contact_email'),
+    ('ux_customers_lower_customer_name', 'customers', 'customer_name'),
+)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    for name, table, column in UNIQUE_KEYS:
+        # fail with the offending values instead of a bare unique violation;
+        # duplicates have to be merged by hand before this can run
+        duplicates = connection.execute(sa.text(
+            f"SELECT lower({column}) FROM {table} GROUP BY lower({column}) HAVING count(*) > 1 LIMIT 10"
+        )).scalars().all()
+        if duplicates:
+            raise RuntimeError(f"Duplicate {table}.{column} values: {duplicates}")
+        op.create_index(name, table, [sa.text(f'lower({column})')], unique=True)
+
+
+def downgrade() -> None:
+    for name, table, column in reversed(UNIQUE_KEYS):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,32 @@
+"""row versions
+
+Revision ID: b5d21c7e4f38
+Revises: a83d5e2f9c10
+Create Date: 2026-10-18 15:02:11.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d21c7e4f38'
+down_revision: Union[str, None] = 'a83d5e2f9c10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('leads', 'customers', 'contacts', 'notes', 'users')
+
+
+def upgrade() -> None:
+    # the server default fills existing rows, so no backfill is needed
+    for table in VERSIONED_TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(),
+                      server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    for table in reversed(VERSIONED_TABLES):
+        op.drop_column(table, 'version')
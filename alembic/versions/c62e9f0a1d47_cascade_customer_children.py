@@ -0,0 +1,36 @@
+"""cascade customer children
+
+Revision ID: c62e9f0a1d47
+Revises: b5d21c7e4f38
+Create Date: 2026-10-18 16:41:37.902615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c62e9f0a1d47'
+down_revision: Union[str, None] = 'b5d21c7e4f38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the constraints were created unnamed, these are postgres' default names
+CHILD_TABLES = ('contacts', 'notes')
+
+
+def upgrade() -> None:
+    for table in CHILD_TABLES:
+        name = f'{table}_customer_id_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, 'customers', ['customer_id'], ['id'],
+                              ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    for table in reversed(CHILD_TABLES):
+        name = f'{table}_customer_id_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, 'customers', ['customer_id'], ['id'])
@@ -0,0 +1,61 @@
+"""rationalize indexes
+
+Revision ID: d9a4b3e6c215
+Revises: c62e9f0a1d47
+Create Date: 2026-10-18 17:12:05.664019
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a4b3e6c215'
+down_revision: Union[str, None] = 'c62e9f0a1d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# foreign keys postgres doesn't index on its own, and composites for the
+# read_leads filters; each walks (created_at, id) like the keyset pages do
+NEW_INDEXES = (
+    ('ix_contacts_customer_id', 'contacts', ['customer_id']),
+    ('ix_notes_customer_id', 'notes', ['customer_id']),
+    ('ix_leads_lead_converted_created_at_id', 'leads', ['lead_converted', 'created_at', 'id']),
+    ('ix_leads_lead_company_created_at_id', 'leads', ['lead_company', 'created_at', 'id']),
+)
+
+# duplicates of a primary key, a lower() unique index or a composite prefix,
+# or columns no query filters on
+UNUSED_INDEXES = (
+    ('ix_leads_id', 'leads', ['id']),
+    ('ix_leads_lead_first_name', 'leads', ['lead_first_name']),
+    ('ix_leads_lead_last_name', 'leads', ['lead_last_name']),
+    ('ix_leads_lead_email', 'leads', ['lead_email']),
+    ('ix_leads_lead_phone', 'leads', ['lead_phone']),
+    ('ix_leads_lead_company', 'leads', ['lead_company']),
+    ('ix_leads_lead_website', 'leads', ['lead_website']),
+    ('ix_leads_lead_status', 'leads', ['lead_status']),
+    ('ix_customers_id', 'customers', ['id']),
+    ('ix_customers_customer_phone', 'customers', ['customer_phone']),
+    ('ix_customers_customer_website', 'customers', ['customer_website']),
+    ('ix_contacts_id', 'contacts', ['id']),
+    ('ix_contacts_contact_email', 'contacts', ['contact_email']),
+    ('ix_notes_id', 'notes', ['id']),
+    ('ix_users_id', 'users', ['id']),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in NEW_INDEXES:
+        op.create_index(name, table, columns, unique=False)
+    for name, table, columns in UNUSED_INDEXES:
+        op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(UNUSED_INDEXES):
+        op.create_index(name, table, columns, unique=False)
+    for name, table, columns in reversed(NEW_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,62 @@
+"""full text search
+
+Revision ID: e7c1f4a9b302
+Revises: d9a4b3e6c215
+Create Date: 2026-10-18 17:48:20.114873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c1f4a9b302'
+down_revision: Union[str, None] = 'd9a4b3e6c215'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _weighted(weight: str, *columns: str) -> str:
+    document = " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+    return f"setweight(to_tsvector('simple', {document}), '{weight}')"
+
+
+def _email(column: str) -> str:
+    # the parser keeps an address as one token; split it so "acme" finds a@acme.com
+    return f"translate({column}, '@.-_+', '     ')"
+
+
+# search_vector of each table, names weigh most; these have to stay in step
+# with SEARCH_TARGETS in crud/search_service.py
+SEARCH_VECTORS = {
+    'leads': " || ".join((
+        _weighted('A', 'lead_first_name', 'lead_last_name'),
+        _weighted('B', 'lead_company'),
+        _weighted('C', 'lead_email', _email('lead_email')))),
+    'customers': " || ".join((
+        _weighted('A', 'customer_name'),
+        _weighted('B', 'customer_city'),
+        _weighted('C', 'customer_website', _email('customer_website')))),
+    'contacts': " || ".join((
+        _weighted('A', 'contact_first_name', 'contact_last_name'),
+        _weighted('C', 'contact_email', _email('contact_email')))),
+    'notes': " || ".join((
+        _weighted('A', 'note_title'),
+        _weighted('D', 'note_content'))),
+}
+
+
+def upgrade() -> None:
+    for table, vector in SEARCH_VECTORS.items():
+        op.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+                   f"GENERATED ALWAYS AS ({vector}) STORED")
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'],
+                        postgresql_using='gin')
+
+
+def downgrade() -> None:
+    for table in reversed(list(SEARCH_VECTORS)):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
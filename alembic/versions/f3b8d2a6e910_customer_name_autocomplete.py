@@ -0,0 +1,32 @@
+"""customer name autocomplete
+
+Revision ID: f3b8d2a6e910
+Revises: e7c1f4a9b302
+Create Date: 2026-10-18 18:20:43.557301
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a6e910'
+down_revision: Union[str, None] = 'e7c1f4a9b302'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # LIKE 'prefix%' on lower(customer_name); the unique index on the same
+    # expression only serves equality under the database's collation
+    op.create_index('ix_customers_lower_customer_name_pattern', 'customers',
+                    [sa.text('lower(customer_name) text_pattern_ops')], unique=False)
+    # name lookups go through lower(customer_name) now
+    op.drop_index('ix_customers_customer_name', table_name='customers')
+
+
+def downgrade() -> None:
+    op.create_index('ix_customers_customer_name', 'customers', ['customer_name'], unique=False)
+    op.drop_index('ix_customers_lower_customer_name_pattern', table_name='customers')
@@ -1,13 +1,19 @@
 # andromeda_ng/app.py
+import asyncio
 from loguru import logger
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from alembic import command
 from alembic.config import Config
-from .service.database import get_db
+from sqlalchemy import text
+from .service.crud import dedupe_service, lead_import_service, lead_scoring_service
+from .service.database import AsyncSessionLocal, async_engine, replica_engine
+from .service.libs import zammad
+from .service.libs.lead_ingest import lead_ingest
+from .service.libs.query_stats import QueryStatsMiddleware
 from .service.settings import config
 from .service.ping import router as ping_router
-from andromeda_ng.service.api.routes import leads_controller, customers_controller, contact_controller, notes_controller, users_controller, auth_controller
+from andromeda_ng.service.api.routes import leads_controller, customers_controller, contact_controller, notes_controller, users_controller, auth_controller, admin_controller, integrations_controller, search_controller
 
 
 def configure_app():
@@ -18,8 +24,11 @@ def configure_app():
         allow_origins=["*"],
         allow_credentials=True,
         allow_methods=["*"],
-        allow_headers=["*"]
+        allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-DB-Query-Count"]
     )
+    app.add_middleware(QueryStatsMiddleware)
+    background_tasks = []
 
     @app.on_event("startup")
     async def startup_event():
@@ -33,18 +42,34 @@ def configure_app():
 
             # Establish Database Connection
             logger.info("Connecting to database...")
-            db_gen = get_db()
-            db = next(db_gen)
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
             logger.info("Database connection established.")
+
+            # leads accepted by a worker that stopped before inserting them
+            await lead_ingest.start(AsyncSessionLocal)
+
+            if config.DEDUPE_INTERVAL_SECONDS > 0:
+                background_tasks.append(asyncio.create_task(dedupe_service.index_periodically(
+                    AsyncSessionLocal, config.DEDUPE_INTERVAL_SECONDS)))
+            if config.LEAD_SCORE_INTERVAL_SECONDS > 0:
+                background_tasks.append(asyncio.create_task(lead_scoring_service.rescore_periodically(
+                    AsyncSessionLocal, config.LEAD_SCORE_INTERVAL_SECONDS)))
         except Exception as e:
             logger.error(f"Startup error: {e}")
             raise
-        finally:
-            try:
-                db.close()
-                logger.info("Database session closed")
-            except Exception as e:
-                logger.error(f"Error closing session: {e}")
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        for task in background_tasks:
+            task.cancel()
+        await lead_import_service.cancel_imports()
+        await lead_ingest.stop(AsyncSessionLocal)
+        await async_engine.dispose()
+        if replica_engine is not None:
+            await replica_engine.dispose()
+        logger.info("Database connections closed")
+        await zammad.close_client()
 
     app.include_router(ping_router)
     app.include_router(leads_controller.router)
@@ -53,6 +78,9 @@ def configure_app():
     app.include_router(notes_controller.router)
     app.include_router(users_controller.router)
     app.include_router(auth_controller.router)
+    app.include_router(admin_controller.router)
+    app.include_router(integrations_controller.router)
+    app.include_router(search_controller.router)
     return app
 
 
@@ -0,0 +1,90 @@
+from fastapi import status, APIRouter, Depends, HTTPException, Query
+from loguru import logger
+from andromeda_ng.service.crud import dedupe_service, lead_scoring_service
+from andromeda_ng.service.database import async_engine, get_async_db, get_async_sessionmaker
+from andromeda_ng.service.libs import auth
+from andromeda_ng.service.libs.lead_ingest import lead_ingest
+from andromeda_ng.service.libs.pool_stats import pool_stats
+from andromeda_ng.service.libs.slow_queries import slow_query_log
+from andromeda_ng.service.utils.cache import caches
+from andromeda_ng.service.utils.passwords import password_hasher
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"],
+                   dependencies=[Depends(auth.get_current_admin)])
+
+
+@router.get("/db/pool", status_code=status.HTTP_200_OK)
+async def read_pool_stats():
+    """Live connection pool usage: checked-out, idle and overflow connections plus checkout wait times"""
+    try:
+        return pool_stats.snapshot(async_engine.pool)
+    except Exception as e:
+        logger.error(f"Error reading pool stats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
+
+
+@router.get("/db/slow-queries", status_code=status.HTTP_200_OK)
+async def read_slow_queries(limit: int = Query(20, ge=1, le=1000),
+                            order: str = Query("duration", pattern="^(duration|recent)$")):
+    """Recent statements over SLOW_QUERY_THRESHOLD_MS, slowest or newest first"""
+    return {"threshold_ms": slow_query_log.threshold_ms,
+            "queries": slow_query_log.entries(limit, order)}
+
+
+@router.get("/cache", status_code=status.HTTP_200_OK)
+async def read_cache_stats():
+    """Hit/miss counters and sizes of the in-process caches"""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+@router.get("/passwords", status_code=status.HTTP_200_OK)
+async def read_password_hasher_stats():
+    """Password hashing pool load: queue depth, rejections, queue wait and hash times"""
+    return password_hasher.snapshot()
+
+
+@router.post("/dedupe/index", status_code=status.HTTP_200_OK)
+async def run_dedupe_index(db=Depends(get_async_db)):
+    """Rekey new and changed leads, customers and contacts for duplicate detection"""
+    try:
+        return {"indexed": await dedupe_service.run_dedupe_index(db)}
+    except Exception as e:
+        logger.error(f"Error updating dedupe index: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
+
+
+@router.post("/leads/rescore", status_code=status.HTTP_200_OK)
+async def rescore_leads(db=Depends(get_async_db)):
+    """Recompute every lead's lead_score"""
+    try:
+        result = await lead_scoring_service.rescore_leads(db)
+        if "error" in result:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=result["error"])
+        return result
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error rescoring leads: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
+
+
+@router.get("/leads/ingest", status_code=status.HTTP_200_OK)
+async def read_lead_ingest_stats():
+    """This worker's lead ingest buffer: leads waiting, accepted, rejected with 503 and inserted"""
+    return lead_ingest.snapshot()
+
+
+@router.post("/leads/ingest/flush", status_code=status.HTTP_200_OK)
+async def flush_lead_ingest(session_factory=Depends(get_async_sessionmaker)):
+    """Insert this worker's buffered leads now instead of at the next flush"""
+    try:
+        inserted = await lead_ingest.flush(session_factory)
+        return {"inserted": inserted, **lead_ingest.snapshot()}
+    except Exception as e:
+        logger.error(f"Error flushing lead ingest buffer: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
@@ -8,7 +8,7 @@ import uuid
 from pydantic import EmailStr
 from andromeda_ng.service.schema import PasswordResetRequest
 from andromeda_ng.service.crud import user_service
-from andromeda_ng.service.database import get_db
+from andromeda_ng.service.database import get_async_db
 from andromeda_ng.service.utils import passwords
 from andromeda_ng.service.libs import auth, email
 from andromeda_ng.service.schema import Token, TokenData
@@ -17,7 +17,7 @@ router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=Token, status_code=status.HTTP_200_OK)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_async_db)):
     try:
         logger.info(f"checking if user {form_data.username} exists")
         user = await user_service.get_user_by_username(db, form_data.username)
@@ -30,7 +30,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get
 
         # Check password
         logger.info("checking if password is correct")
-        if not passwords.verify_password(form_data.password, user.hashed_password):
+        if not await passwords.verify_password_async(form_data.password, user.hashed_password):
             logger.error(f"Password is incorrect for user {user.username}")
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -62,6 +62,14 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get
             "username": user.username,
             "admin": user.admin
         }
+    except HTTPException as e:
+        raise e
+    except passwords.PasswordHasherBusy as e:
+        logger.warning("Password hashing pool saturated, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password requests, try again shortly",
+            headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(e)
         raise HTTPException(
@@ -91,7 +99,7 @@ async def verify_token(token: str):
 
 
 @router.post("/refresh/{token}", response_model=Token, status_code=status.HTTP_200_OK)
-async def refresh_token(token: str, db=Depends(get_db)):
+async def refresh_token(token: str, db=Depends(get_async_db)):
     try:
         logger.info("Refreshing token")
         user_id = auth.verify_refresh_token(token)
@@ -136,7 +144,7 @@ async def refresh_token(token: str, db=Depends(get_db)):
 
 
 @router.post("/forgot-password", status_code=status.HTTP_200_OK)
-async def forgot_password(email: EmailStr, db=Depends(get_db)):
+async def forgot_password(email: EmailStr, db=Depends(get_async_db)):
     """
     Send password reset email to user including token
     """
@@ -167,7 +175,7 @@ async def forgot_password(email: EmailStr, db=Depends(get_db)):
 
 
 @router.post("/reset-password", status_code=status.HTTP_200_OK)
-async def reset_password(reset_data: PasswordResetRequest, db=Depends(get_db)):
+async def reset_password(reset_data: PasswordResetRequest, db=Depends(get_async_db)):
     """Reset user password using reset token"""
     try:
         logger.info("Verifying password reset token")
@@ -197,7 +205,7 @@ async def reset_password(reset_data: PasswordResetRequest, db=Depends(get_db)):
             )
 
         # Hash and update password
-        hashed_password = passwords.hash_password(reset_data.new_password)
+        hashed_password = await passwords.hash_password_async(reset_data.new_password)
         success = await user_service.update_user_password(db, user_id, hashed_password)
 
         if not success:
@@ -211,6 +219,12 @@ async def reset_password(reset_data: PasswordResetRequest, db=Depends(get_db)):
 
     except HTTPException as he:
         raise he
+    except passwords.PasswordHasherBusy as e:
+        logger.warning("Password hashing pool saturated, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password requests, try again shortly",
+            headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(f"Password reset failed: {e}")
         raise HTTPException(
@@ -1,36 +1,42 @@
-from fastapi import status, APIRouter, Depends, HTTPException
+from fastapi import status, APIRouter, Depends, HTTPException, Query, Response
 from typing import List, Optional
 from loguru import logger
 import uuid
-from andromeda_ng.service.schema import ContactSchema, ContactOutput
+from datetime import datetime
+from fastapi.responses import StreamingResponse
+from andromeda_ng.service.schema import ContactSchema, ContactPatch, ContactOutput
 from andromeda_ng.service.crud import contact_service, customer_service
-from andromeda_ng.service.database import get_db
+from andromeda_ng.service.database import get_async_db, get_async_read_db, get_async_sessionmaker
+from andromeda_ng.service.utils.export import column_values, ndjson_stream
+from andromeda_ng.service.utils.upsert import ConflictPolicy
+from andromeda_ng.service.utils.update import etag, if_match_version, update_error_status
 
 router = APIRouter(prefix="/api/v1/contacts", tags=["contacts"])
 
 
 @router.post("/", response_model=ContactOutput, status_code=status.HTTP_201_CREATED)
-async def create_contact(contact_data: ContactSchema, db=Depends(get_db)):
+async def create_contact(contact_data: ContactSchema,
+                         on_conflict: Optional[ConflictPolicy] = Query(
+                             None, description="Duplicate email handling, defaults to CONTACT_CONFLICT_POLICY"),
+                         db=Depends(get_async_db)):
     try:
-
         # check if customer exists
-        check_customer = customer_service.read_customer_by_id(
-            db, contact_data.customer_id)
-        if not check_customer:
+        if not await customer_service.customer_exists(db, contact_data.customer_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
-        if not contact_data.customer_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Please provide a valid customer id")
-        contact_data.contact_email = contact_data.contact_email.lower()
-        check_contact = await contact_service.read_contact_by_email(db, contact_data.contact_email)
-        if check_contact:
+        # duplicates are caught by the lower(contact_email) unique index in the same statement
+        contact = await contact_service.create_contact(db, contact_data, on_conflict)
+        if isinstance(contact, dict) and contact.get("error") == "Contact already exists":
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Contact already exists")
-        contact = await contact_service.create_contact(db, contact_data)
+        if isinstance(contact, dict):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
 
         logger.info(f"Contact created: {contact.id}")
         return contact
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error creating contact: {e}")
         raise HTTPException(
@@ -38,7 +44,7 @@ async def create_contact(contact_data: ContactSchema, db=Depends(get_db)):
 
 
 @router.get("/", response_model=List[ContactOutput], status_code=status.HTTP_200_OK)
-async def read_contacts(db=Depends(get_db)):
+async def read_contacts(db=Depends(get_async_read_db)):
     try:
         contacts = await contact_service.read_contacts(db)
         contacts = [ContactOutput.model_validate(
@@ -50,14 +56,24 @@ async def read_contacts(db=Depends(get_db)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
 
 
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_contacts(since: Optional[datetime] = None, session_factory=Depends(get_async_sessionmaker)):
+    """Stream every contact as newline-delimited JSON. Pass since to only get contacts created or updated after that time."""
+    return StreamingResponse(
+        ndjson_stream(session_factory, contact_service.stream_contacts, ContactOutput, since),
+        media_type="application/x-ndjson")
+
+
 @router.get("/{contact_id}", response_model=ContactOutput, status_code=status.HTTP_200_OK)
-async def read_contact_by_id(contact_id: uuid.UUID, db=Depends(get_db)):
+async def read_contact_by_id(contact_id: uuid.UUID, db=Depends(get_async_read_db)):
     try:
         contact = await contact_service.read_contact_by_id(db, contact_id)
         if not contact:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
         return contact
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error reading contact: {e}")
         raise HTTPException(
@@ -65,31 +81,58 @@ async def read_contact_by_id(contact_id: uuid.UUID, db=Depends(get_db)):
 
 
 @router.put("/{contact_id}", response_model=ContactOutput, status_code=status.HTTP_200_OK)
-async def update_contact(contact_id: uuid.UUID, contact_data: ContactSchema, db=Depends(get_db)):
+async def update_contact(contact_id: uuid.UUID, contact_data: ContactSchema, response: Response,
+                      expected_version: Optional[int] = Depends(if_match_version),
+                      db=Depends(get_async_db)):
+    """Replace a contact; If-Match makes it fail with 412 if the contact changed since it was read"""
     try:
-        check_contact = await contact_service.read_contact_by_id(db, contact_id)
-        if not check_contact:
-            logger.error(f"Contact not found with id: {contact_id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-        updated_contact = await contact_service.update_contact(db, contact_id, contact_data)
-        return updated_contact
-    except Exception as e:
+        contact = await contact_service.update_contact(db, contact_id, contact_data, expected_version)
+        if isinstance(contact, dict):
+            raise HTTPException(status_code=update_error_status(contact), detail=contact["error"])
+        response.headers["ETag"] = etag(contact.version)
+        logger.info(f"Contact updated: {contact_id}")
+        return contact
+    except HTTPException as e:
         logger.error(f"Error updating contact: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error updating contact: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
+@router.patch("/{contact_id}", response_model=ContactOutput, status_code=status.HTTP_200_OK)
+async def patch_contact(contact_id: uuid.UUID, contact_data: ContactPatch, response: Response,
+                     expected_version: Optional[int] = Depends(if_match_version),
+                     db=Depends(get_async_db)):
+    """Update only the fields sent, in a single UPDATE ... RETURNING statement"""
+    try:
+        contact = await contact_service.update_contact(db, contact_id, contact_data, expected_version, reload=False)
+        if isinstance(contact, dict):
+            raise HTTPException(status_code=update_error_status(contact), detail=contact["error"])
+        response.headers["ETag"] = etag(contact.version)
+        logger.info(f"Contact patched: {contact_id}")
+        return column_values(contact)
+    except HTTPException as e:
+        logger.error(f"Error patching contact: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error patching contact: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
 
 
 @router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_contact(contact_id: uuid.UUID, db=Depends(get_db)):
+async def delete_contact(contact_id: uuid.UUID, db=Depends(get_async_db)):
     try:
-        check_contact = await contact_service.read_contact_by_id(db, contact_id)
-        if not check_contact:
-            logger.error(f"Contact not found with id: {contact_id}")
+        result = await contact_service.delete_contact(db, contact_id)
+        if isinstance(result, dict):
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-        await contact_service.delete_contact(db, contact_id)
+                status_code=status.HTTP_404_NOT_FOUND if result["error"] == "Contact not found"
+                else status.HTTP_500_INTERNAL_SERVER_ERROR, detail=result["error"])
         return
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error deleting contact: {e}")
         raise HTTPException(
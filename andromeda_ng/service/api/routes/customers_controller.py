@@ -1,25 +1,31 @@
-from fastapi import status, APIRouter, Depends, HTTPException
+from fastapi import status, APIRouter, Depends, HTTPException, Query, Response
 from typing import List, Optional
 from loguru import logger
 import uuid
-from andromeda_ng.service.schema import CustomerSchema, CustomerOutput
+from datetime import datetime
+from fastapi.responses import StreamingResponse
+from andromeda_ng.service.schema import CustomerBasic, CustomerSchema, CustomerPatch, CustomerOutput, CustomerStats
 from andromeda_ng.service.crud import customer_service
-from andromeda_ng.service.database import get_db
+from andromeda_ng.service.database import get_async_db, get_async_read_db, get_async_sessionmaker
+from andromeda_ng.service.utils.export import column_values, ndjson_stream
+from andromeda_ng.service.utils.upsert import ConflictPolicy
+from andromeda_ng.service.utils.update import etag, if_match_version, update_error_status
 
 router = APIRouter(prefix="/api/v1/customers", tags=["customers"])
 
 
 @router.post("/", response_model=CustomerSchema, status_code=status.HTTP_201_CREATED)
-async def create_customer(customer_data: CustomerSchema, db=Depends(get_db)):
-    customer_name = customer_data.customer_name.lower()
-    # Check if customer already exists
-    check_customer = await customer_service.read_customer_by_name(db, customer_name)
-    if check_customer:
-        logger.error(f"Customer already exists with name: {customer_name}")
+async def create_customer(customer_data: CustomerSchema,
+                          on_conflict: Optional[ConflictPolicy] = Query(
+                              None, description="Duplicate name handling, defaults to CUSTOMER_CONFLICT_POLICY"),
+                          db=Depends(get_async_db)):
+    # duplicates are caught by the lower(customer_name) unique index in the same statement
+    customer = await customer_service.create_customer(db, customer_data, on_conflict)
+    if isinstance(customer, dict) and customer.get("error") == "Customer already exists":
+        logger.error(f"Customer already exists with name: {customer_data.customer_name}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Customer already exists")
-    customer = await customer_service.create_customer(db, customer_data)
-    if not customer:
+    if not customer or isinstance(customer, dict):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Please check your input data")
     logger.info(f"Customer created: {customer.id}")
@@ -27,10 +33,22 @@ async def create_customer(customer_data: CustomerSchema, db=Depends(get_db)):
 
 
 @router.get("/", response_model=List[CustomerOutput],  status_code=status.HTTP_200_OK)
-async def read_customers(db=Depends(get_db)):
+async def read_customers(
+        include: Optional[str] = Query(
+            None, description="Comma separated extras to embed: contacts, notes, tickets"),
+        db=Depends(get_async_read_db)):
+    """List customers. Contacts, notes and ticket counts are left out unless asked for with include."""
     try:
         logger.info("Reading customers")
-        customers = await customer_service.read_customers(db)
+        includes = {name.strip() for name in include.split(",") if name.strip()} if include else set()
+        unknown = includes - set(customer_service.CUSTOMER_INCLUDES)
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Unknown include: {', '.join(sorted(unknown))}")
+        customers = await customer_service.read_customers(db, includes)
+        if isinstance(customers, dict) and "error" in customers:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="An unexpected error occurred")
         return customers
     except HTTPException as e:
         logger.error(f"Error reading customers: {e}")
@@ -41,8 +59,54 @@ async def read_customers(db=Depends(get_db)):
                             detail="An unexpected error occurred")
 
 
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_customers(since: Optional[datetime] = None, session_factory=Depends(get_async_sessionmaker)):
+    """Stream every customer as newline-delimited JSON. Pass since to only get customers created or updated after that time."""
+    return StreamingResponse(
+        ndjson_stream(session_factory, customer_service.stream_customers, CustomerOutput, since),
+        media_type="application/x-ndjson")
+
+
+@router.get("/stats", response_model=CustomerStats, status_code=status.HTTP_200_OK)
+async def read_customer_stats(db=Depends(get_async_read_db)):
+    """Customer totals by status plus contact and note counts, cached for CUSTOMER_STATS_CACHE_TTL seconds"""
+    try:
+        stats = await customer_service.get_customer_stats(db)
+        if "error" in stats:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="An unexpected error occurred")
+        return stats
+    except HTTPException as e:
+        logger.error(f"Error reading customer stats: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error reading customer stats: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
+@router.get("/autocomplete", response_model=List[CustomerBasic], status_code=status.HTTP_200_OK)
+async def autocomplete_customers(prefix: str = Query(..., min_length=1, max_length=100),
+                                 limit: int = Query(10, ge=1, le=50),
+                                 db=Depends(get_async_read_db)):
+    """Customers whose name starts with prefix, ignoring case: id and name only, for pickers"""
+    try:
+        customers = await customer_service.autocomplete_customers(db, prefix, limit)
+        if isinstance(customers, dict) and "error" in customers:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="An unexpected error occurred")
+        return customers
+    except HTTPException as e:
+        logger.error(f"Error autocompleting customers: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error autocompleting customers: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
 @router.get("/{customer_id}", response_model=CustomerOutput, status_code=status.HTTP_200_OK)
-async def read_customer_by_id(customer_id: uuid.UUID, db=Depends(get_db)):
+async def read_customer_by_id(customer_id: uuid.UUID, db=Depends(get_async_read_db)):
     try:
         customer = await customer_service.read_customer_by_id(db, customer_id)
         if not customer:
@@ -61,13 +125,15 @@ async def read_customer_by_id(customer_id: uuid.UUID, db=Depends(get_db)):
 
 
 @router.put("/{customer_id}", response_model=CustomerOutput, status_code=status.HTTP_200_OK)
-async def update_customer(customer_id: uuid.UUID, customer_data: CustomerSchema, db=Depends(get_db)):
+async def update_customer(customer_id: uuid.UUID, customer_data: CustomerSchema, response: Response,
+                      expected_version: Optional[int] = Depends(if_match_version),
+                      db=Depends(get_async_db)):
+    """Replace a customer; If-Match makes it fail with 412 if the customer changed since it was read"""
     try:
-        customer = await customer_service.update_customer(db, customer_id, customer_data)
-        if not customer:
-            logger.error(f"Customer not found with id: {customer_id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
+        customer = await customer_service.update_customer(db, customer_id, customer_data, expected_version)
+        if isinstance(customer, dict):
+            raise HTTPException(status_code=update_error_status(customer), detail=customer["error"])
+        response.headers["ETag"] = etag(customer.version)
         logger.info(f"Customer updated: {customer_id}")
         return customer
     except HTTPException as e:
@@ -79,10 +145,35 @@ async def update_customer(customer_id: uuid.UUID, customer_data: CustomerSchema,
                             detail="An unexpected error occurred")
 
 
+@router.patch("/{customer_id}", response_model=CustomerOutput, status_code=status.HTTP_200_OK)
+async def patch_customer(customer_id: uuid.UUID, customer_data: CustomerPatch, response: Response,
+                     expected_version: Optional[int] = Depends(if_match_version),
+                     db=Depends(get_async_db)):
+    """Update only the fields sent, in a single UPDATE ... RETURNING statement"""
+    try:
+        customer = await customer_service.update_customer(db, customer_id, customer_data, expected_version, reload=False)
+        if isinstance(customer, dict):
+            raise HTTPException(status_code=update_error_status(customer), detail=customer["error"])
+        response.headers["ETag"] = etag(customer.version)
+        logger.info(f"Customer patched: {customer_id}")
+        return column_values(customer)
+    except HTTPException as e:
+        logger.error(f"Error patching customer: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error patching customer: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
 @router.delete("/{customer_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_customer(customer_id: uuid.UUID, db=Depends(get_db)):
+async def delete_customer(customer_id: uuid.UUID, db=Depends(get_async_db)):
     try:
-        await customer_service.delete_customer(db, customer_id)
+        result = await customer_service.delete_customer(db, customer_id)
+        if isinstance(result, dict):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND if result["error"] == "Customer not found"
+                else status.HTTP_500_INTERNAL_SERVER_ERROR, detail=result["error"])
         logger.info(f"Customer deleted: {customer_id}")
     except HTTPException as e:
         logger.error(f"Error deleting customer: {e}")
@@ -95,7 +186,7 @@ async def delete_customer(customer_id: uuid.UUID, db=Depends(get_db)):
 
 # Additional routes for customer-related operations
 @router.get("/name/{customer_name}", response_model=CustomerOutput, status_code=status.HTTP_200_OK)
-async def read_customer_by_name(customer_name: str, db=Depends(get_db)):
+async def read_customer_by_name(customer_name: str, db=Depends(get_async_read_db)):
     try:
         customer = await customer_service.read_customer_by_name(db, customer_name)
         if not customer:
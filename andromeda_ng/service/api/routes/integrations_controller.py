@@ -0,0 +1,57 @@
+from fastapi import status, APIRouter, Depends, HTTPException, Request
+from loguru import logger
+import hashlib
+import hmac
+import json
+from typing import Optional
+from andromeda_ng.service.crud import ticket_service
+from andromeda_ng.service.database import get_async_db
+from andromeda_ng.service.settings import config
+
+router = APIRouter(prefix="/api/v1/integrations", tags=["integrations"])
+
+
+def verify_zammad_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Zammad signs webhook bodies with HMAC-SHA1 of the webhook secret and
+    sends it as X-Hub-Signature: sha1=<hexdigest>"""
+    secret = config.ZAMMAD_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+    expected = "sha1=" + hmac.new(
+        secret.get_secret_value().encode(), body, hashlib.sha1).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+@router.post("/zammad/webhook", status_code=status.HTTP_200_OK)
+async def zammad_webhook(request: Request, db=Depends(get_async_db)):
+    """Ticket create/update events from Zammad, upserted into the tickets mirror"""
+    try:
+        if not config.ZAMMAD_WEBHOOK_SECRET:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Zammad webhook is not configured")
+        body = await request.body()
+        if not verify_zammad_signature(body, request.headers.get("X-Hub-Signature")):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                                detail="Invalid signature")
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Invalid JSON payload")
+        ticket = payload.get("ticket") if isinstance(payload, dict) else None
+        if not isinstance(ticket, dict) or "id" not in ticket:
+            logger.info("Ignoring Zammad webhook without a ticket")
+            return {"status": "ignored"}
+        result = await ticket_service.upsert_ticket(db, ticket)
+        if "error" in result:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="An error occurred")
+        logger.info(f"Zammad ticket {result['id']} synced")
+        return {"status": "ok", "ticket_id": result["id"]}
+    except HTTPException as e:
+        logger.error(f"Error handling Zammad webhook: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error handling Zammad webhook: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An error occurred")
@@ -1,41 +1,100 @@
-from fastapi import status, APIRouter, Depends, HTTPException
+from fastapi import status, APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from typing import List, Optional
 from loguru import logger
+import os
 import uuid
-from andromeda_ng.service.schema import LeadSchema, LeadOutput
-from andromeda_ng.service.crud import lead_service
-from andromeda_ng.service.database import get_db
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timezone
+from andromeda_ng.service.schema import (DuplicateCandidate, LeadImportJobOutput, LeadImportRowError, LeadSchema,
+                                         LeadPatch, LeadOutput, LeadPage)
+from andromeda_ng.service.crud import dedupe_service, lead_import_service, lead_service
+from andromeda_ng.service.database import get_async_db, get_async_read_db, get_async_sessionmaker
+from andromeda_ng.service.libs import auth
+from andromeda_ng.service.libs.lead_ingest import IngestBufferFull, lead_ingest
+from andromeda_ng.service.utils.export import ndjson_stream
+from andromeda_ng.service.settings import config
+from andromeda_ng.service.utils.upsert import ConflictPolicy
+from andromeda_ng.service.utils.update import etag, if_match_version, update_error_status
 
 router = APIRouter(prefix="/api/v1/leads", tags=["leads"])
 
 
 @router.post("/", response_model=LeadSchema, status_code=status.HTTP_201_CREATED)
-async def create_lead(lead_data: LeadSchema, db=Depends(get_db)):
+async def create_lead(lead_data: LeadSchema,
+                      on_conflict: Optional[ConflictPolicy] = Query(
+                          None, description="Duplicate email handling, defaults to LEAD_CONFLICT_POLICY"),
+                      db=Depends(get_async_db)):
     if not lead_data.lead_email:
         logger.error("Please provide a valid email address")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Please provide a valid email address")
-    # Normalize email to lowercase for case-insensitive search
-    lead_data.lead_email = lead_data.lead_email.lower()
-    # Check if lead already exists
-    check_lead = await lead_service.read_lead_by_email(db, lead_data.lead_email)
-    if check_lead:
+    # duplicates are caught by the lower(lead_email) unique index in the same statement
+    lead = await lead_service.create_lead(db, lead_data, on_conflict)
+    if isinstance(lead, dict) and lead.get("error") == "Lead already exists":
         logger.error(f"Lead already exists with email: {lead_data.lead_email}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Lead already exists")
-    lead = await lead_service.create_lead(db, lead_data)
-    if not lead:
+    if not lead or isinstance(lead, dict):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Please check your input data")
     return lead
 
 
-@router.get("/", response_model=List[LeadOutput],  status_code=status.HTTP_200_OK)
-async def read_leads(db=Depends(get_db)):
+@router.post("/ingest", status_code=status.HTTP_202_ACCEPTED)
+async def ingest_lead(lead_data: LeadSchema):
+    """Accept a lead for a batched insert shortly after. Duplicates of an
+    existing email are dropped then rather than reported."""
+    if not lead_data.lead_email:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Please provide a valid email address")
+    values = lead_data.model_dump()
+    values["id"] = uuid.uuid4()
+    values["lead_email"] = values["lead_email"].lower()
+    # when it was submitted, not when the batch happens to be flushed
+    values["created_at"] = datetime.now(timezone.utc)
+    try:
+        await lead_ingest.submit(values)
+    except IngestBufferFull as e:
+        logger.warning("Lead ingest buffer is full")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many leads waiting to be saved, try again shortly",
+            headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        logger.error(f"Error accepting lead: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+    return {"message": "Lead accepted"}
+
+
+@router.get("/", response_model=LeadPage,  status_code=status.HTTP_200_OK)
+async def read_leads(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    lead_status: Optional[str] = None,
+    lead_converted: Optional[bool] = None,
+    lead_company: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    sort: str = Query("created_at", pattern="^(created_at|score)$",
+                      description="score orders by lead_score as of the last rescore"),
+    db=Depends(get_async_read_db)
+):
+    """List leads a page at a time. Pass the returned next_cursor back as cursor to get the following page."""
     try:
         logger.info("Reading leads")
-        leads = await lead_service.read_leads(db)
-        return leads
+        page = await lead_service.read_leads(
+            db, limit=limit, cursor=cursor, lead_status=lead_status,
+            lead_converted=lead_converted, lead_company=lead_company,
+            created_after=created_after, created_before=created_before, order=order, sort=sort)
+        if page.get("error") == "Invalid cursor":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        if "error" in page:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="An unexpected error occurred")
+        return page
     except HTTPException as e:
         logger.error(f"Error reading leads: {e}")
         raise e
@@ -45,8 +104,89 @@ async def read_leads(db=Depends(get_db)):
                             detail="An unexpected error occurred")
 
 
+@router.post("/import", response_model=LeadImportJobOutput, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(auth.get_current_user)])
+async def import_leads(response: Response, file: UploadFile = File(...),
+                       format: Optional[str] = Query(
+                           None, pattern="^(csv|ndjson)$",
+                           description="Defaults to what the file name or content type says"),
+                       on_conflict: Optional[ConflictPolicy] = Query(
+                           None, description="Duplicate email handling, defaults to LEAD_CONFLICT_POLICY"),
+                       db=Depends(get_async_db), session_factory=Depends(get_async_sessionmaker)):
+    """Load leads from a CSV file with a header row or from NDJSON, one lead per line.
+
+    The file is loaded in the background; poll GET /import/{job_id} for
+    progress and GET /import/{job_id}/errors for the rows that were skipped.
+    """
+    try:
+        format = format or lead_import_service.detect_format(file.filename, file.content_type)
+        if format is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Pass format=csv or format=ndjson")
+        path, size = await lead_import_service.save_upload(file)
+        if path is None:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"Imports are limited to {config.IMPORT_MAX_BYTES} bytes")
+        if not size:
+            os.unlink(path)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The file is empty")
+        job = await lead_import_service.create_import_job(
+            db, format, file.filename, on_conflict or ConflictPolicy(config.LEAD_CONFLICT_POLICY), size)
+        if isinstance(job, dict):
+            os.unlink(path)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="An unexpected error occurred")
+        lead_import_service.start_import(session_factory, job.id, path)
+        logger.info(f"Lead import {job.id} queued, {size} bytes of {format}")
+        response.headers["Location"] = f"{router.prefix}/import/{job.id}"
+        return job
+    except HTTPException as e:
+        logger.error(f"Error importing leads: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error importing leads: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
+@router.get("/import/{job_id}", response_model=LeadImportJobOutput, status_code=status.HTTP_200_OK,
+            dependencies=[Depends(auth.get_current_user)])
+async def read_import_job(job_id: uuid.UUID, db=Depends(get_async_db)):
+    """An import's status, progress through the file and row counts so far"""
+    job = await lead_import_service.read_import_job(db, job_id)
+    if isinstance(job, dict):
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import not found")
+    return job
+
+
+@router.get("/import/{job_id}/errors", response_model=List[LeadImportRowError], status_code=status.HTTP_200_OK,
+            dependencies=[Depends(auth.get_current_user)])
+async def read_import_errors(job_id: uuid.UUID, after_row: int = Query(0, ge=0),
+                             limit: int = Query(100, ge=1, le=1000), db=Depends(get_async_db)):
+    """Rows of an import that weren't loaded and why, in file order; pass the
+    last row number back as after_row for the next page"""
+    errors = await lead_import_service.read_import_errors(db, job_id, after_row, limit)
+    if isinstance(errors, dict):
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+    if not errors and await lead_import_service.read_import_job(db, job_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import not found")
+    return errors
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_leads(since: Optional[datetime] = None, session_factory=Depends(get_async_sessionmaker)):
+    """Stream every lead as newline-delimited JSON. Pass since to only get leads created or updated after that time."""
+    return StreamingResponse(
+        ndjson_stream(session_factory, lead_service.stream_leads, LeadOutput, since),
+        media_type="application/x-ndjson")
+
+
 @router.get("/{lead_id}", response_model=LeadOutput, status_code=status.HTTP_200_OK)
-async def read_lead_by_id(lead_id: uuid.UUID, db=Depends(get_db)):
+async def read_lead_by_id(lead_id: uuid.UUID, db=Depends(get_async_read_db)):
     try:
         lead = await lead_service.read_lead_by_id(db, lead_id)
 
@@ -54,41 +194,109 @@ async def read_lead_by_id(lead_id: uuid.UUID, db=Depends(get_db)):
             logger.error(f"Lead not found with id: {lead_id}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found")
-        logger.infot("Found Lead id: {lead_id}")
+        logger.info(f"Found Lead id: {lead_id}")
         return lead
     except HTTPException as e:
         logger.error(f"Error reading lead: {e}")
         raise e
 
 
-@router.put("/{lead_id}", response_model=LeadOutput, status_code=status.HTTP_200_OK)
-async def update_lead(lead_id: uuid.UUID, lead_data: LeadSchema, db=Depends(get_db)):
+@router.get("/{lead_id}/duplicates", response_model=List[DuplicateCandidate], status_code=status.HTTP_200_OK)
+async def read_lead_duplicates(lead_id: uuid.UUID, limit: int = Query(20, ge=1, le=100),
+                               min_score: Optional[float] = Query(None, ge=0, le=1),
+                               db=Depends(get_async_read_db)):
+    """Leads, customers and contacts sharing an email, phone, domain or company name with the lead, best match first"""
     try:
-        check_lead = await lead_service.read_lead_by_id(db, lead_id)
-        if not check_lead:
-            logger.error(f"Lead not found with id: {lead_id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found")
-        updated_lead = await lead_service.update_lead(db, lead_id, lead_data)
-        if not updated_lead:
+        duplicates = await dedupe_service.find_lead_duplicates(db, lead_id, limit, min_score)
+        if isinstance(duplicates, dict):
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail="Please check your input data")
+                status_code=status.HTTP_404_NOT_FOUND if duplicates["error"] == "Lead not found"
+                else status.HTTP_500_INTERNAL_SERVER_ERROR, detail=duplicates["error"])
+        return duplicates
+    except HTTPException as e:
+        logger.error(f"Error finding lead duplicates: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error finding lead duplicates: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
+@router.put("/{lead_id}", response_model=LeadOutput, status_code=status.HTTP_200_OK)
+async def update_lead(lead_id: uuid.UUID, lead_data: LeadSchema, response: Response,
+                      expected_version: Optional[int] = Depends(if_match_version),
+                      db=Depends(get_async_db)):
+    """Replace a lead; If-Match makes it fail with 412 if the lead changed since it was read"""
+    try:
+        lead = await lead_service.update_lead(db, lead_id, lead_data, expected_version)
+        if isinstance(lead, dict):
+            raise HTTPException(status_code=update_error_status(lead), detail=lead["error"])
+        response.headers["ETag"] = etag(lead.version)
         logger.info(f"Lead updated: {lead_id}")
-        return updated_lead
+        return lead
     except HTTPException as e:
         logger.error(f"Error updating lead: {e}")
         raise e
+    except Exception as e:
+        logger.error(f"Unexpected error updating lead: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
+@router.patch("/{lead_id}", response_model=LeadOutput, status_code=status.HTTP_200_OK)
+async def patch_lead(lead_id: uuid.UUID, lead_data: LeadPatch, response: Response,
+                     expected_version: Optional[int] = Depends(if_match_version),
+                     db=Depends(get_async_db)):
+    """Update only the fields sent, in a single UPDATE ... RETURNING statement"""
+    try:
+        lead = await lead_service.update_lead(db, lead_id, lead_data, expected_version)
+        if isinstance(lead, dict):
+            raise HTTPException(status_code=update_error_status(lead), detail=lead["error"])
+        response.headers["ETag"] = etag(lead.version)
+        logger.info(f"Lead patched: {lead_id}")
+        return lead
+    except HTTPException as e:
+        logger.error(f"Error patching lead: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error patching lead: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
+@router.delete("/", status_code=status.HTTP_200_OK)
+async def delete_leads(ids: List[uuid.UUID] = Query(..., min_length=1, max_length=1000,
+                                                   description="Leads to delete, repeat the parameter for each id"),
+                       db=Depends(get_async_db)):
+    """Delete many leads in a single DELETE ... WHERE id IN (...) RETURNING id"""
+    try:
+        deleted = await lead_service.delete_leads(db, ids)
+        if isinstance(deleted, dict):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=deleted["error"])
+        found = set(deleted)
+        return {"deleted": deleted,
+                "not_found": [lead_id for lead_id in dict.fromkeys(ids) if lead_id not in found]}
+    except HTTPException as e:
+        logger.error(f"Error deleting leads: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error deleting leads: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
 
 
 @router.delete("/{lead_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_lead(lead_id: uuid.UUID, db=Depends(get_db)):
+async def delete_lead(lead_id: uuid.UUID, db=Depends(get_async_db)):
     try:
-        check_lead = await lead_service.read_lead_by_id(db, lead_id)
-        if not check_lead:
+        result = await lead_service.delete_lead(db, lead_id)
+        if result.get("error") == "Lead not found":
             logger.error(f"Lead not found with id: {lead_id}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found")
-        await lead_service.delete_lead(db, lead_id)
+        if "error" in result:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=result["error"])
         logger.info(f"Lead deleted: {lead_id}")
         return
     except HTTPException as e:
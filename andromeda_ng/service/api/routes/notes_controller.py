@@ -1,16 +1,20 @@
-from fastapi import status, APIRouter, Depends, HTTPException
+from fastapi import status, APIRouter, Depends, HTTPException, Response
 from typing import List, Optional
 from loguru import logger
 import uuid
-from andromeda_ng.service.schema import NoteOutput, NoteSchema
+from datetime import datetime
+from fastapi.responses import StreamingResponse
+from andromeda_ng.service.schema import NoteOutput, NotePatch, NoteSchema
 from andromeda_ng.service.crud import note_service, customer_service
-from andromeda_ng.service.database import get_db
+from andromeda_ng.service.database import get_async_db, get_async_read_db, get_async_sessionmaker
+from andromeda_ng.service.utils.export import ndjson_stream
+from andromeda_ng.service.utils.update import etag, if_match_version, update_error_status
 
 router = APIRouter(prefix="/api/v1/notes", tags=["notes"])
 
 
 @router.post("/", response_model=NoteOutput, status_code=status.HTTP_201_CREATED)
-async def create_note(note_data: NoteSchema, db=Depends(get_db)):
+async def create_note(note_data: NoteSchema, db=Depends(get_async_db)):
     try:
         # check if customer exists
         check_company = await customer_service.read_customer_by_id(db, note_data.customer_id)
@@ -33,7 +37,7 @@ async def create_note(note_data: NoteSchema, db=Depends(get_db)):
 
 
 @router.get("/", response_model=List[NoteOutput], status_code=status.HTTP_200_OK)
-async def read_notes(db=Depends(get_db)):
+async def read_notes(db=Depends(get_async_read_db)):
     try:
         notes = await note_service.read_notes(db)
         notes = [NoteOutput.model_validate(
@@ -45,8 +49,16 @@ async def read_notes(db=Depends(get_db)):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
 
 
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_notes(since: Optional[datetime] = None, session_factory=Depends(get_async_sessionmaker)):
+    """Stream every note as newline-delimited JSON. Pass since to only get notes created after that time."""
+    return StreamingResponse(
+        ndjson_stream(session_factory, note_service.stream_notes, NoteOutput, since),
+        media_type="application/x-ndjson")
+
+
 @router.get("/{note_id}", response_model=NoteOutput, status_code=status.HTTP_200_OK)
-async def read_note_by_id(note_id: uuid.UUID, db=Depends(get_db)):
+async def read_note_by_id(note_id: uuid.UUID, db=Depends(get_async_read_db)):
     try:
         note = await note_service.read_note_by_id(db, note_id)
         if not note:
@@ -60,15 +72,42 @@ async def read_note_by_id(note_id: uuid.UUID, db=Depends(get_db)):
 
 
 @router.put("/{note_id}", response_model=NoteOutput, status_code=status.HTTP_200_OK)
-async def update_note(note_id: uuid.UUID, note_data: NoteSchema, db=Depends(get_db)):
-    """Update a note by ID."""
+async def update_note(note_id: uuid.UUID, note_data: NoteSchema, response: Response,
+                      expected_version: Optional[int] = Depends(if_match_version),
+                      db=Depends(get_async_db)):
+    """Replace a note; If-Match makes it fail with 412 if the note changed since it was read"""
     try:
-        note = await note_service.update_note(db, note_id, note_data)
-        if not note:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
+        note = await note_service.update_note(db, note_id, note_data, expected_version)
+        if isinstance(note, dict):
+            raise HTTPException(status_code=update_error_status(note), detail=note["error"])
+        response.headers["ETag"] = etag(note.version)
+        logger.info(f"Note updated: {note_id}")
         return note
-    except Exception as e:
+    except HTTPException as e:
         logger.error(f"Error updating note: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error updating note: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
+@router.patch("/{note_id}", response_model=NoteOutput, status_code=status.HTTP_200_OK)
+async def patch_note(note_id: uuid.UUID, note_data: NotePatch, response: Response,
+                     expected_version: Optional[int] = Depends(if_match_version),
+                     db=Depends(get_async_db)):
+    """Update only the fields sent, in a single UPDATE ... RETURNING statement"""
+    try:
+        note = await note_service.update_note(db, note_id, note_data, expected_version)
+        if isinstance(note, dict):
+            raise HTTPException(status_code=update_error_status(note), detail=note["error"])
+        response.headers["ETag"] = etag(note.version)
+        logger.info(f"Note patched: {note_id}")
+        return note
+    except HTTPException as e:
+        logger.error(f"Error patching note: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error patching note: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
@@ -0,0 +1,42 @@
+from fastapi import status, APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from loguru import logger
+from andromeda_ng.service.schema import SearchPage
+from andromeda_ng.service.crud import search_service
+from andromeda_ng.service.database import get_async_read_db
+
+router = APIRouter(prefix="/api/v1/search", tags=["search"])
+
+_ERROR_STATUS = {
+    "No search terms": status.HTTP_400_BAD_REQUEST,
+    "Invalid cursor": status.HTTP_400_BAD_REQUEST,
+    "Search timed out": status.HTTP_504_GATEWAY_TIMEOUT,
+}
+
+
+@router.get("", response_model=SearchPage, status_code=status.HTTP_200_OK)
+async def search(q: str = Query(..., min_length=1, max_length=200),
+                 types: Optional[List[str]] = Query(
+                     None, description=f"Restrict to some of: {', '.join(search_service.SEARCH_TYPES)}"),
+                 limit: int = Query(20, ge=1, le=100),
+                 cursor: Optional[str] = None,
+                 db=Depends(get_async_read_db)):
+    """Ranked hits across leads, customers, contacts and notes. Pass next_cursor back as cursor for more."""
+    try:
+        unknown = set(types or ()) - set(search_service.SEARCH_TYPES)
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Unknown types: {', '.join(sorted(unknown))}")
+        page = await search_service.search(db, q, types, limit, cursor)
+        if "error" in page:
+            raise HTTPException(
+                status_code=_ERROR_STATUS.get(page["error"], status.HTTP_500_INTERNAL_SERVER_ERROR),
+                detail=page["error"])
+        return page
+    except HTTPException as e:
+        logger.error(f"Error searching: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error searching: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
@@ -1,16 +1,17 @@
-from fastapi import status, APIRouter, Depends, HTTPException
+from fastapi import status, APIRouter, Depends, HTTPException, Response
 from typing import List, Optional
 from loguru import logger
 import uuid
-from andromeda_ng.service.schema import UserOutput, UserSchema
+from andromeda_ng.service.schema import UserOutput, UserPatch, UserSchema
 from andromeda_ng.service.crud import user_service
-from andromeda_ng.service.database import get_db
+from andromeda_ng.service.database import get_async_db, get_async_read_db
 from andromeda_ng.service.utils import passwords
+from andromeda_ng.service.utils.update import etag, if_match_version, update_error_status
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
 
 
 @router.post("/", response_model=UserOutput, status_code=status.HTTP_201_CREATED)
-async def create_user(user_data: UserSchema, db=Depends(get_db)):
+async def create_user(user_data: UserSchema, db=Depends(get_async_db)):
     try:
         username = user_data.username.lower()
         check_user = await user_service.get_user_by_username(db, username)
@@ -26,6 +27,14 @@ async def create_user(user_data: UserSchema, db=Depends(get_db)):
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Password does not meet policy requirements")
         user = await user_service.create_user(db, user_data)
         return user
+    except HTTPException as e:
+        raise e
+    except passwords.PasswordHasherBusy as e:
+        logger.warning("Password hashing pool saturated, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password requests, try again shortly",
+            headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(f"Error creating user: {e}")
         raise HTTPException(
@@ -33,7 +42,7 @@ async def create_user(user_data: UserSchema, db=Depends(get_db)):
 
 
 @router.get("/", response_model=List[UserOutput], status_code=status.HTTP_200_OK)
-async def get_users(db=Depends(get_db)):
+async def get_users(db=Depends(get_async_read_db)):
     try:
         logger.info("Getting all users")
         users = await user_service.get_all_users(db)
@@ -45,7 +54,7 @@ async def get_users(db=Depends(get_db)):
 
 
 @router.get("/{user_id}", response_model=UserOutput, status_code=status.HTTP_200_OK)
-async def get_user_by_id(user_id: uuid.UUID, db=Depends(get_db)):
+async def get_user_by_id(user_id: uuid.UUID, db=Depends(get_async_read_db)):
     try:
 
         user = await user_service.get_user_by_id(db, user_id)
@@ -61,35 +70,77 @@ async def get_user_by_id(user_id: uuid.UUID, db=Depends(get_db)):
 
 
 @router.put("/{user_id}", response_model=UserOutput, status_code=status.HTTP_200_OK)
-async def update_user(user_id: uuid.UUID, user_data: UserSchema, db=Depends(get_db)):
+async def update_user(user_id: uuid.UUID, user_data: UserSchema, response: Response,
+                      expected_version: Optional[int] = Depends(if_match_version),
+                      db=Depends(get_async_db)):
+    """Replace a user; If-Match makes it fail with 412 if the user changed since it was read"""
     try:
-        # check if user exists
-        user = await user_service.get_user_by_id(db, user_id)
-        if not user:
+        if user_data.password and not passwords.verify_password_policy(user_data.password):
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        # update user
-        updated_user = await user_service.update_user(db, user_id, user_data)
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Password does not meet policy requirements")
+        user = await user_service.update_user(db, user_id, user_data, expected_version)
+        if isinstance(user, dict):
+            raise HTTPException(status_code=update_error_status(user), detail=user["error"])
+        response.headers["ETag"] = etag(user.version)
         logger.info(f"User updated: {user_id}")
-        return updated_user
-    except Exception as e:
+        return user
+    except HTTPException as e:
         logger.error(f"Error updating user: {e}")
+        raise e
+    except passwords.PasswordHasherBusy as e:
+        logger.warning("Password hashing pool saturated, rejecting request")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Error updating user")
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password requests, try again shortly",
+            headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        logger.error(f"Unexpected error updating user: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
+
+
+@router.patch("/{user_id}", response_model=UserOutput, status_code=status.HTTP_200_OK)
+async def patch_user(user_id: uuid.UUID, user_data: UserPatch, response: Response,
+                     expected_version: Optional[int] = Depends(if_match_version),
+                     db=Depends(get_async_db)):
+    """Update only the fields sent, in a single UPDATE ... RETURNING statement"""
+    try:
+        if user_data.password and not passwords.verify_password_policy(user_data.password):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Password does not meet policy requirements")
+        user = await user_service.update_user(db, user_id, user_data, expected_version)
+        if isinstance(user, dict):
+            raise HTTPException(status_code=update_error_status(user), detail=user["error"])
+        response.headers["ETag"] = etag(user.version)
+        logger.info(f"User patched: {user_id}")
+        return user
+    except HTTPException as e:
+        logger.error(f"Error patching user: {e}")
+        raise e
+    except passwords.PasswordHasherBusy as e:
+        logger.warning("Password hashing pool saturated, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password requests, try again shortly",
+            headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        logger.error(f"Unexpected error patching user: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                            detail="An unexpected error occurred")
 
 
 @router.delete("/{user_id}")
-async def delete_user(user_id: uuid.UUID, db=Depends(get_db), status_code=status.HTTP_204_NO_CONTENT):
+async def delete_user(user_id: uuid.UUID, db=Depends(get_async_db), status_code=status.HTTP_204_NO_CONTENT):
     try:
-        # check if user exists
-        user = await user_service.get_user_by_id(db, user_id)
-        if not user:
+        result = await user_service.delete_user(db, user_id)
+        if isinstance(result, dict):
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-        # delete user
-        await user_service.delete_user(db, user_id)
+                status_code=status.HTTP_404_NOT_FOUND if result["error"] == "User not found"
+                else status.HTTP_500_INTERNAL_SERVER_ERROR, detail=result["error"])
         logger.info(f"User deleted: {user_id}")
         return {"message": "User deleted"}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Error deleting user: {e}")
         raise HTTPException(
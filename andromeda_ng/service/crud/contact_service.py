@@ -1,35 +1,55 @@
 from loguru import logger
 from andromeda_ng.service.models import Contact, Customer
-from andromeda_ng.service.database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
-from andromeda_ng.service.schema import ContactSchema, ContactOutput
+from andromeda_ng.service.schema import ContactPatch, ContactSchema, ContactOutput
+from andromeda_ng.service.utils.export import EXPORT_BATCH_SIZE
+from andromeda_ng.service.utils.upsert import ConflictPolicy, insert_unique
+from andromeda_ng.service.utils.update import DUPLICATE, null_violations, update_error, update_returning
+from andromeda_ng.service.settings import config
+from datetime import datetime
+from typing import Optional, Union
 import uuid
 
 
-async def create_contact(db: Session, contact_data: ContactSchema):
+async def _reload_contact(db: AsyncSession, contact_id: uuid.UUID):
+    # ContactOutput serializes the customer relationship, which an
+    # AsyncSession can't lazy load
+    result = await db.execute(select(Contact).where(
+        Contact.id == contact_id).options(joinedload(Contact.customer))
+        .execution_options(populate_existing=True))
+    return result.scalars().first()
+
+
+async def create_contact(db: AsyncSession, contact_data: ContactSchema,
+                         policy: Optional[ConflictPolicy] = None):
+    """Insert a contact in one statement against the lower(contact_email) unique index"""
     try:
-        contact_data.contact_email = contact_data.contact_email.lower()
-        check_contact = db.query(Contact).filter(
-            Contact.contact_email == contact_data.contact_email).first()
-        if check_contact:
+        values = contact_data.model_dump()
+        values["id"] = uuid.uuid4()
+        values["contact_email"] = values["contact_email"].lower()
+        contact = await insert_unique(
+            db, Contact, values, [func.lower(Contact.contact_email)],
+            policy or ConflictPolicy(config.CONTACT_CONFLICT_POLICY),
+            existing_where=func.lower(Contact.contact_email) == values["contact_email"])
+        await db.commit()
+        if contact is None:
             logger.error("Contact already exists")
             return {"error": "Contact already exists"}
-        new_contact = Contact(**contact_data.dict())
-        db.add(new_contact)
-        db.commit()
-        db.refresh(new_contact)
-        return new_contact
+        return await _reload_contact(db, contact.id)
     except Exception as e:
         logger.error(f"Error creating contact: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error creating contact"}
 
 
-async def read_contacts(db: Session):
+async def read_contacts(db: AsyncSession):
     try:
-        contacts = db.query(Contact).options(
-            joinedload(Contact.customer)).all()
+        result = await db.execute(select(Contact).options(
+            joinedload(Contact.customer)))
+        contacts = result.scalars().all()
         logger.info(f"Returning all contacts: {len(contacts)}")
         return contacts
     except Exception as e:  # pragma: no cover
@@ -37,52 +57,71 @@ async def read_contacts(db: Session):
         return {"error": "Error reading contacts"}
 
 
-async def read_contact_by_id(db: Session, contact_id: uuid.UUID):
+async def read_contact_by_id(db: AsyncSession, contact_id: uuid.UUID):
     try:
-        contact = db.query(Contact).filter(Contact.id == contact_id).first()
+        result = await db.execute(select(Contact).where(
+            Contact.id == contact_id).options(joinedload(Contact.customer)))
+        contact = result.scalars().first()
         return contact
     except Exception as e:
         logger.error(f"Error reading contact: {e}")
         return {"error": "Error reading contact"}
 
 
-async def update_contact(db: Session, contact_id: uuid.UUID, contact_data: ContactSchema):
+async def update_contact(db: AsyncSession, contact_id: uuid.UUID,
+                         contact_data: Union[ContactSchema, ContactPatch],
+                         expected_version: Optional[int] = None, reload: bool = True):
+    """Write the fields set on contact_data in one UPDATE ... RETURNING,
+    reload joins in the customer ContactOutput embeds"""
     try:
-        contact = db.query(Contact).filter(Contact.id == contact_id).first()
-        if not contact:
-            logger.error(f"Contact not found with id: {contact_id}")
-            return {"error": "Contact not found"}
-        contact.update(contact_data.dict(exclude_unset=True))
-        db.commit()
+        values = contact_data.model_dump(exclude_unset=True)
+        if values.get("contact_email"):
+            values["contact_email"] = values["contact_email"].lower()
+        contact, reason = await update_returning(
+            db, Contact, contact_id, values, expected_version)
+        if contact is None:
+            logger.error(f"Contact not updated ({reason}): {contact_id}")
+            await db.rollback()
+            return update_error("Contact", reason, null_violations(Contact, values))
+        await db.commit()
         logger.info(f"Contact updated: {contact_id}")
+        if reload:
+            return await _reload_contact(db, contact_id)
         return contact
+    except IntegrityError as e:
+        logger.error(f"Contact update violates a unique key: {e}")
+        await db.rollback()
+        return update_error("Contact", DUPLICATE)
     except Exception as e:
         logger.error(f"Error updating contact: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error updating contact"}
 
 
-async def delete_contact(db: Session, contact_id: uuid.UUID):
+async def delete_contact(db: AsyncSession, contact_id: uuid.UUID):
+    """DELETE ... RETURNING id, nothing returned means there was no such contact"""
     try:
-        contact = db.query(Contact).filter(Contact.id == contact_id).first()
-        if not contact:
+        result = await db.execute(
+            delete(Contact).where(Contact.id == contact_id).returning(Contact.id))
+        deleted = result.scalar_one_or_none()
+        await db.commit()
+        if deleted is None:
             logger.error(f"Contact not found with id: {contact_id}")
             return {"error": "Contact not found"}
-        db.delete(contact)
-        db.commit()
         logger.info(f"Contact deleted: {contact_id}")
-        return contact
+        return deleted
     except Exception as e:
         logger.error(f"Error deleting contact: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error deleting contact"}
 
 
-async def read_contact_by_email(db: Session, contact_email: str):
+async def read_contact_by_email(db: AsyncSession, contact_email: str):
     try:
         contact_email = contact_email.lower()
-        contact = db.query(Contact).filter(
-            Contact.contact_email == contact_email).first()
+        result = await db.execute(select(Contact).where(
+            func.lower(Contact.contact_email) == contact_email))
+        contact = result.scalars().first()
         if not contact:
             logger.error(f"Contact not found with email: {contact_email}")
             return False
@@ -92,3 +131,14 @@ async def read_contact_by_email(db: Session, contact_email: str):
     except Exception as e:
         logger.error(f"Error reading contact: {e}")
         return {"error": "Error reading contact"}
+
+
+async def stream_contacts(db: AsyncSession, since: Optional[datetime] = None):
+    """Yield every contact created or updated since `since` through a server-side cursor"""
+    query = select(Contact)
+    if since is not None:
+        query = query.where(func.coalesce(Contact.updated_at, Contact.created_at) >= since)
+    result = await db.stream_scalars(
+        query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for contact in result:
+        yield contact
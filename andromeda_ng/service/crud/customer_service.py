@@ -1,66 +1,143 @@
 from loguru import logger
-from andromeda_ng.service.models import Contact, Customer
-from andromeda_ng.service.database import get_db
-from sqlalchemy.orm import Session
-from andromeda_ng.service.schema import CustomerSchema, CustomerOutput
+from andromeda_ng.service.models import Contact, Customer, Note
+from sqlalchemy import delete, select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from andromeda_ng.service.schema import CustomerPatch, CustomerSchema, CustomerOutput
 from andromeda_ng.service.libs import zammad
+from andromeda_ng.service.crud import ticket_service
+from andromeda_ng.service.settings import config
+from andromeda_ng.service.utils.export import EXPORT_BATCH_SIZE, column_values
+from andromeda_ng.service.utils.cache import TTLCache
+from andromeda_ng.service.utils.upsert import ConflictPolicy, insert_unique
+from andromeda_ng.service.utils.update import DUPLICATE, null_violations, update_error, update_returning
+from datetime import datetime
+from typing import AbstractSet, Optional, Union
+import asyncio
 import uuid
 
+# dashboard stats; dropped on customer writes, contact and note counts may
+# lag by up to the TTL
+stats_cache = TTLCache(
+    "customer_stats", ttl=config.CUSTOMER_STATS_CACHE_TTL, max_entries=1)
 
-async def create_customer(db: Session, customer_data: CustomerSchema):
-    check_customer = db.query(Customer).filter(
-        Customer.customer_name == customer_data.customer_name).first()
-    if check_customer:
-        logger.error("Customer already exists")
-        return {"error": "Customer already exists"}
+# autocomplete results by (prefix, limit); dropped on customer writes
+autocomplete_cache = TTLCache(
+    "customer_autocomplete", ttl=config.AUTOCOMPLETE_CACHE_TTL,
+    max_entries=config.AUTOCOMPLETE_CACHE_SIZE)
+
+# what read_customers can embed on request, besides the customer columns
+CUSTOMER_INCLUDES = ("contacts", "notes", "tickets")
+_INCLUDE_RELATIONSHIPS = {"contacts": (Customer.children, "children"),
+                          "notes": (Customer.notes, "notes")}
+
+
+def _customer_query():
+    """Select customers with the collections CustomerOutput serializes,
+    an AsyncSession can't lazy load them during response validation."""
+    return select(Customer).options(
+        selectinload(Customer.children), selectinload(Customer.notes))
+
+
+async def _reload_customer(db: AsyncSession, customer_id: uuid.UUID):
+    result = await db.execute(_customer_query().where(
+        Customer.id == customer_id).execution_options(populate_existing=True))
+    return result.scalars().first()
+
+
+async def create_customer(db: AsyncSession, customer_data: CustomerSchema,
+                          policy: Optional[ConflictPolicy] = None):
+    """Insert a customer in one statement against the lower(customer_name) unique index"""
     try:
-        new_customer = Customer(**customer_data.dict())
-        db.add(new_customer)
-        db.commit()
-        db.refresh(new_customer)
-        return new_customer
+        values = customer_data.model_dump()
+        values["id"] = uuid.uuid4()
+        customer = await insert_unique(
+            db, Customer, values, [func.lower(Customer.customer_name)],
+            policy or ConflictPolicy(config.CUSTOMER_CONFLICT_POLICY),
+            existing_where=func.lower(Customer.customer_name) == values["customer_name"].lower())
+        await db.commit()
+        if customer is None:
+            logger.error("Customer already exists")
+            return {"error": "Customer already exists"}
+        stats_cache.invalidate()
+        autocomplete_cache.invalidate()
+        return customer
     except Exception as e:
         logger.error(f"Error creating customer: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error creating customer"}
 
 
-async def read_customers(db: Session):
+async def _ticket_counts(db: AsyncSession, zammad_ids: list) -> dict:
+    """Ticket counts per zammad_id for a page of customers, one grouped
+    query against the mirror or cached summaries fetched concurrently"""
+    if config.ZAMMAD_TICKET_MIRROR:
+        return await ticket_service.read_ticket_counts(db, zammad_ids)
+    summaries = await asyncio.gather(
+        *[zammad.get_cached_company_tickets(zammad_id) for zammad_id in zammad_ids])
+    return {zammad_id: {"ticket_count": summary["total_count"],
+                        "open_tickets": summary["open_count"],
+                        "ticket_url": summary["ticket_url"]}
+            for zammad_id, summary in zip(zammad_ids, summaries) if summary}
+
+
+async def read_customers(db: AsyncSession, include: AbstractSet[str] = frozenset()):
+    """List customers with only their own columns, plus the collections
+    named in include. Each included relationship is fetched with one
+    selectinload query for the whole page, never per customer."""
     try:
-        customers = db.query(Customer).all()
-        return customers
+        query = select(Customer)
+        for name in include & _INCLUDE_RELATIONSHIPS.keys():
+            query = query.options(selectinload(_INCLUDE_RELATIONSHIPS[name][0]))
+        result = await db.execute(query)
+        customers = result.scalars().all()
+
+        tickets = {}
+        if "tickets" in include:
+            zammad_ids = list({c.zammad_id for c in customers if c.zammad_id is not None})
+            tickets = await _ticket_counts(db, zammad_ids)
+
+        output = []
+        for customer in customers:
+            customer_data = column_values(customer)
+            for name in include & _INCLUDE_RELATIONSHIPS.keys():
+                attribute = _INCLUDE_RELATIONSHIPS[name][1]
+                customer_data[attribute] = getattr(customer, attribute)
+            customer_data.update(tickets.get(customer.zammad_id, {}))
+            output.append(CustomerOutput.model_validate(customer_data, from_attributes=True))
+        return output
     except Exception as e:
         logger.error(f"Error reading customers: {e}")
         return {"error": "Error reading customers"}
 
 
-async def read_customer_by_id(db: Session, customer_id: uuid.UUID):
+async def customer_exists(db: AsyncSession, customer_id: uuid.UUID) -> bool:
+    """Primary key probe, without the relationships or Zammad tickets read_customer_by_id fetches"""
+    result = await db.execute(select(Customer.id).where(Customer.id == customer_id))
+    return result.first() is not None
+
+
+async def read_customer_by_id(db: AsyncSession, customer_id: uuid.UUID):
     try:
-        customer = db.query(Customer).filter(
-            Customer.id == customer_id).first()
+        result = await db.execute(_customer_query().where(
+            Customer.id == customer_id))
+        customer = result.scalars().first()
         if not customer:
-            return {"error": "Customer not found"}
+            return None
 
-        # Get tickets if customer exists
-        ticket_info = await zammad.get_company_tickets(customer.zammad_id)
+        # Get tickets if customer exists and is linked to Zammad
+        ticket_info = None
+        if customer.zammad_id is not None and config.ZAMMAD_TICKET_MIRROR:
+            ticket_info = await ticket_service.read_ticket_summary(db, customer.zammad_id)
+        elif customer.zammad_id is not None:
+            ticket_info = await zammad.get_cached_company_tickets(customer.zammad_id)
 
         # Prepare customer output with ticket information
-        customer_data = customer.__dict__
-        if ticket_info and ticket_info["all_tickets"]:
-            tickets_list = []
-            for ticket in ticket_info["all_tickets"]:
-                tickets_list.append({
-                    "id": ticket.get("id"),
-                    "title": ticket.get("title"),
-                    "number": ticket.get("number"),
-                    "state": ticket.get("state"),
-                    "priority": ticket.get("priority"),
-                    "created_at": ticket.get("created_at"),
-                    "updated_at": ticket.get("updated_at")
-                })
-
+        customer_data = dict(customer.__dict__)
+        if ticket_info:
             customer_data.update({
-                "customer_tickets": tickets_list,
+                "customer_tickets": ticket_info["all_tickets"],
                 "ticket_count": ticket_info["total_count"],
                 "open_tickets": ticket_info["open_count"],
                 "ticket_url": ticket_info["ticket_url"]
@@ -80,62 +157,138 @@ async def read_customer_by_id(db: Session, customer_id: uuid.UUID):
         return {"error": f"Error reading customer: {str(e)}"}
 
 
-async def update_customer(db: Session, customer_id: uuid.UUID, customer_data: CustomerSchema):
+async def update_customer(db: AsyncSession, customer_id: uuid.UUID,
+                          customer_data: Union[CustomerSchema, CustomerPatch],
+                          expected_version: Optional[int] = None, reload: bool = True):
+    """Write the fields set on customer_data in one UPDATE ... RETURNING.
+
+    With reload the contacts and notes CustomerOutput embeds are loaded
+    afterwards; without it only the customer's columns are populated.
+    """
     try:
-        customer = db.query(Customer).filter(
-            Customer.id == customer_id).first()
-        if not customer:
-            logger.error(f"Customer not found with id: {customer_id}")
-            return {"error": "Customer not found"}
-        customer.update(customer_data.dict(exclude_unset=True))
-        db.commit()
+        values = customer_data.model_dump(exclude_unset=True)
+        customer, reason = await update_returning(
+            db, Customer, customer_id, values, expected_version)
+        if customer is None:
+            logger.error(f"Customer not updated ({reason}): {customer_id}")
+            await db.rollback()
+            return update_error("Customer", reason, null_violations(Customer, values))
+        await db.commit()
+        stats_cache.invalidate()
+        autocomplete_cache.invalidate()
         logger.info(f"Customer updated: {customer_id}")
+        if reload:
+            return await _reload_customer(db, customer_id)
         return customer
+    except IntegrityError as e:
+        logger.error(f"Customer update violates a unique key: {e}")
+        await db.rollback()
+        return update_error("Customer", DUPLICATE)
     except Exception as e:
         logger.error(f"Error updating customer: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error updating customer"}
 
 
-async def delete_customer(db: Session, customer_id: uuid.UUID):
+async def delete_customer(db: AsyncSession, customer_id: uuid.UUID):
+    """DELETE ... RETURNING id; the customer's contacts and notes go with it
+    through ON DELETE CASCADE without being loaded"""
     try:
-        customer = db.query(Customer).filter(
-            Customer.id == customer_id).first()
-        if not customer:
+        result = await db.execute(
+            delete(Customer).where(Customer.id == customer_id).returning(Customer.id))
+        deleted = result.scalar_one_or_none()
+        await db.commit()
+        if deleted is None:
             logger.error(f"Customer not found with id: {customer_id}")
             return {"error": "Customer not found"}
-        db.delete(customer)
-        db.commit()
+        stats_cache.invalidate()
+        autocomplete_cache.invalidate()
         logger.info(f"Customer deleted: {customer_id}")
-        return customer
+        return deleted
     except Exception as e:
         logger.error(f"Error deleting customer: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error deleting customer"}
 
 
-async def read_customer_by_name(db: Session, customer_name: str):
+async def read_customer_by_name(db: AsyncSession, customer_name: str):
+    """Case-insensitive exact match, served by the lower(customer_name) unique index"""
     try:
-        customer = db.query(Customer).filter(
-            Customer.customer_name == customer_name).first()
+        result = await db.execute(_customer_query().where(
+            func.lower(Customer.customer_name) == customer_name.lower()))
+        customer = result.scalars().first()
         return customer
     except Exception as e:
         logger.error(f"Error reading customer: {e}")
         return {"error": "Error reading customer"}
 
 
-async def get_customer_stats(db: Session):
+def _like_prefix(prefix: str) -> str:
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+async def _load_autocomplete(db: AsyncSession, prefix: str, limit: int) -> list:
+    name = func.lower(Customer.customer_name)
+    result = await db.execute(
+        select(Customer.id, Customer.customer_name)
+        .where(name.like(_like_prefix(prefix), escape="\\"))
+        .order_by(name).limit(limit))
+    return [{"id": row.id, "customer_name": row.customer_name} for row in result]
+
+
+async def autocomplete_customers(db: AsyncSession, prefix: str, limit: int = 10):
+    """Up to limit customers whose name starts with prefix, any case, as id
+    and name only. Hot prefixes come from autocomplete_cache."""
+    prefix = prefix.lower()
     try:
-        total_customers = db.query(Customer).count()
-        active_customers = db.query(Customer).filter(
-            Customer.is_active == True).count()
-        inactive_customers = db.query(Customer).filter(
-            Customer.is_active == False).count()
-        return {
-            "total_customers": total_customers,
-            "active_customers": active_customers,
-            "inactive_customers": inactive_customers
-        }
+        return await autocomplete_cache.get_or_load(
+            (prefix, limit), lambda: _load_autocomplete(db, prefix, limit))
+    except Exception as e:
+        logger.error(f"Error autocompleting customers: {e}")
+        return {"error": "Error autocompleting customers"}
+
+
+async def _load_customer_stats(db: AsyncSession) -> dict:
+    total_contacts = select(func.count()).select_from(Contact).where(
+        Contact.customer_id.is_not(None)).scalar_subquery()
+    total_notes = select(func.count()).select_from(Note).where(
+        Note.customer_id.is_not(None)).scalar_subquery()
+    # one round trip: FILTER for the customer breakdown, scalar subqueries for the children
+    result = await db.execute(select(
+        func.count(),
+        func.count().filter(Customer.is_active == True),
+        func.count().filter(Customer.is_active == False),
+        total_contacts,
+        total_notes,
+    ).select_from(Customer))
+    total, active, inactive, contacts, notes = result.one()
+    return {
+        "total_customers": total,
+        "active_customers": active,
+        "inactive_customers": inactive,
+        "total_contacts": contacts,
+        "total_notes": notes,
+        "contacts_per_customer": round(contacts / total, 2) if total else 0.0,
+        "notes_per_customer": round(notes / total, 2) if total else 0.0,
+    }
+
+
+async def get_customer_stats(db: AsyncSession):
+    try:
+        return await stats_cache.get_or_load(
+            "stats", lambda: _load_customer_stats(db))
     except Exception as e:
         logger.error(f"Error getting customer stats: {e}")
         return {"error": "Error getting customer stats"}
+
+
+async def stream_customers(db: AsyncSession, since: Optional[datetime] = None):
+    """Yield every customer created or updated since `since` through a server-side cursor"""
+    query = select(Customer)
+    if since is not None:
+        query = query.where(func.coalesce(Customer.updated_at, Customer.created_at) >= since)
+    result = await db.stream_scalars(
+        query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for customer in result:
+        yield customer
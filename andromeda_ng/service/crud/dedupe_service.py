@@ -0,0 +1,218 @@
+import asyncio
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, exists, func, literal_column, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from andromeda_ng.service.models import Contact, Customer, DedupeKey, Lead
+from andromeda_ng.service.settings import config
+from andromeda_ng.service.utils.dialect import insert_for
+from andromeda_ng.service.utils.normalize import (
+    company_domain, normalize_company, normalize_domain, normalize_email, normalize_phone)
+
+""" Blocking-key duplicate detection across leads, customers and contacts """
+
+# how much one shared key says about two records being the same; several
+# shared keys combine as independent evidence
+KEY_WEIGHTS = {"email": 0.95, "phone": 0.8, "domain": 0.6, "company": 0.5}
+
+
+def _keys(*pairs: Tuple[str, Optional[str]]) -> Set[Tuple[str, str]]:
+    return {(kind, value) for kind, value in pairs if value}
+
+
+def lead_keys(lead) -> Set[Tuple[str, str]]:
+    return _keys(("email", normalize_email(lead.lead_email)),
+                 ("domain", company_domain(lead.lead_email)),
+                 ("domain", normalize_domain(lead.lead_website)),
+                 ("phone", normalize_phone(lead.lead_phone)),
+                 ("company", normalize_company(lead.lead_company)))
+
+
+def customer_keys(customer) -> Set[Tuple[str, str]]:
+    return _keys(("company", normalize_company(customer.customer_name)),
+                 ("domain", normalize_domain(customer.customer_website)),
+                 ("phone", normalize_phone(customer.customer_phone)))
+
+
+def contact_keys(contact) -> Set[Tuple[str, str]]:
+    return _keys(("email", normalize_email(contact.contact_email)),
+                 ("domain", company_domain(contact.contact_email)))
+
+
+DEDUPE_ENTITIES: Dict[str, Tuple[type, Callable]] = {
+    "lead": (Lead, lead_keys),
+    "customer": (Customer, customer_keys),
+    "contact": (Contact, contact_keys),
+}
+
+
+def score(kinds: Iterable[str]) -> float:
+    """Noisy-or of the weights of the shared key kinds"""
+    miss = 1.0
+    for kind in set(kinds):
+        miss *= 1.0 - KEY_WEIGHTS[kind]
+    return round(1.0 - miss, 4)
+
+
+async def index_entities(db: AsyncSession, entity_type: str, rows: list) -> int:
+    """Replace the blocking keys of rows; the caller commits"""
+    if not rows:
+        return 0
+    model, make_keys = DEDUPE_ENTITIES[entity_type]
+    await db.execute(delete(DedupeKey).where(
+        DedupeKey.entity_type == entity_type,
+        DedupeKey.entity_id.in_([row.id for row in rows])))
+    values = [{"entity_type": entity_type, "entity_id": row.id, "kind": kind, "value": value}
+              for row in rows for kind, value in make_keys(row)]
+    if values:
+        await db.execute(insert_for(db, DedupeKey).values(values))
+    return len(values)
+
+
+def _stale(entity_type: str, model):
+    """Rows changed since their keys were built, or never indexed"""
+    fresh = exists().where(
+        DedupeKey.entity_type == entity_type,
+        DedupeKey.entity_id == model.id,
+        DedupeKey.indexed_at >= func.coalesce(model.updated_at, model.created_at))
+    return ~fresh
+
+
+async def run_dedupe_index(db: AsyncSession, batch_size: Optional[int] = None) -> dict:
+    """Bring dedupe_keys up to date, batch_size rows per transaction.
+
+    Only new and changed rows are rekeyed, walking each table once in id
+    order, and keys of deleted rows are dropped. Returns the number of rows
+    indexed per entity type.
+    """
+    batch_size = batch_size or config.DEDUPE_BATCH_SIZE
+    indexed = {}
+    for entity_type, (model, _) in DEDUPE_ENTITIES.items():
+        indexed[entity_type] = 0
+        last_id = None
+        while True:
+            query = select(model).where(_stale(entity_type, model))
+            if last_id is not None:
+                query = query.where(model.id > last_id)
+            rows = (await db.scalars(query.order_by(model.id).limit(batch_size))).all()
+            if not rows:
+                break
+            await index_entities(db, entity_type, rows)
+            await db.commit()
+            indexed[entity_type] += len(rows)
+            last_id = rows[-1].id
+        await db.execute(delete(DedupeKey).where(
+            DedupeKey.entity_type == entity_type,
+            ~exists().where(model.id == DedupeKey.entity_id)))
+        await db.commit()
+    logger.info(f"Dedupe index updated: {indexed}")
+    return indexed
+
+
+async def index_periodically(session_factory, interval: float):
+    """Run run_dedupe_index every interval seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await run_dedupe_index(db)
+        except Exception as e:
+            logger.error(f"Error updating dedupe index: {e}")
+
+
+async def _candidates(db: AsyncSession, keys: Set[Tuple[str, str]]) -> Dict[tuple, Set[str]]:
+    """Entities sharing a key, with the kinds they share.
+
+    Each key's block is read with a LIMIT of DEDUPE_MAX_BLOCK_SIZE + 1 in
+    a single UNION ALL; a key shared by more rows than that (a big
+    company's domain, a switchboard number) tells nothing and is skipped,
+    which bounds the work per lead however large the tables grow.
+    """
+    max_block = config.DEDUPE_MAX_BLOCK_SIZE
+    branches = [
+        select(select(DedupeKey.entity_type, DedupeKey.entity_id,
+                      literal_column(str(position)).label("key"))
+               .where(DedupeKey.kind == kind, DedupeKey.value == value)
+               .limit(max_block + 1).subquery())
+        for position, (kind, value) in enumerate(sorted(keys))]
+    rows = (await db.execute(union_all(*branches))).all()
+    blocks = defaultdict(list)
+    for entity_type, entity_id, position in rows:
+        blocks[int(position)].append((entity_type, entity_id))
+    kinds = [kind for kind, _ in sorted(keys)]
+    matches = defaultdict(set)
+    for position, members in blocks.items():
+        if len(members) > max_block:
+            logger.debug(f"Skipping oversized dedupe block {sorted(keys)[position]}")
+            continue
+        for member in members:
+            matches[member].add(kinds[position])
+    return matches
+
+
+async def _describe(db: AsyncSession, ids_by_type: Dict[str, List[uuid.UUID]]) -> dict:
+    """Display name and email of each candidate, one query per type"""
+    described = {}
+    if ids_by_type.get("lead"):
+        result = await db.execute(select(
+            Lead.id, Lead.lead_first_name, Lead.lead_last_name, Lead.lead_company, Lead.lead_email
+        ).where(Lead.id.in_(ids_by_type["lead"])))
+        for row in result:
+            described[("lead", row.id)] = (
+                f"{row.lead_first_name} {row.lead_last_name} ({row.lead_company})", row.lead_email)
+    if ids_by_type.get("customer"):
+        result = await db.execute(select(Customer.id, Customer.customer_name).where(
+            Customer.id.in_(ids_by_type["customer"])))
+        for row in result:
+            described[("customer", row.id)] = (row.customer_name, None)
+    if ids_by_type.get("contact"):
+        result = await db.execute(select(
+            Contact.id, Contact.contact_first_name, Contact.contact_last_name, Contact.contact_email
+        ).where(Contact.id.in_(ids_by_type["contact"])))
+        for row in result:
+            described[("contact", row.id)] = (
+                f"{row.contact_first_name} {row.contact_last_name}", row.contact_email)
+    return described
+
+
+async def find_lead_duplicates(db: AsyncSession, lead_id: uuid.UUID, limit: int = 20,
+                               min_score: Optional[float] = None):
+    """Leads, customers and contacts that look like the same person or company as lead_id.
+
+    The lead's keys are computed from the row itself, so it needn't be
+    indexed yet; the records it is compared against are found through
+    dedupe_keys and so are as current as the last run_dedupe_index.
+    """
+    try:
+        lead = await db.get(Lead, lead_id)
+        if not lead:
+            return {"error": "Lead not found"}
+        keys = lead_keys(lead)
+        if not keys:
+            return []
+        min_score = config.DEDUPE_MIN_SCORE if min_score is None else min_score
+        matches = await _candidates(db, keys)
+        matches.pop(("lead", lead_id), None)
+        scored = sorted(((score(kinds), entity, kinds) for entity, kinds in matches.items()),
+                        key=lambda item: (-item[0], item[1][0], str(item[1][1])))
+        scored = [item for item in scored if item[0] >= min_score][:limit]
+        ids_by_type = defaultdict(list)
+        for _, (entity_type, entity_id), _ in scored:
+            ids_by_type[entity_type].append(entity_id)
+        described = await _describe(db, ids_by_type)
+        duplicates = []
+        for candidate_score, entity, kinds in scored:
+            if entity not in described:
+                # deleted since it was indexed
+                continue
+            name, email = described[entity]
+            duplicates.append({"type": entity[0], "id": entity[1], "score": candidate_score,
+                               "matched": sorted(kinds), "name": name, "email": email})
+        return duplicates
+    except Exception as e:
+        logger.error(f"Error finding duplicates: {e}")
+        return {"error": "Error finding duplicates"}
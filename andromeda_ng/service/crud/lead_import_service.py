@@ -0,0 +1,328 @@
+import asyncio
+import csv
+import itertools
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+from loguru import logger
+from pydantic import ValidationError
+from sqlalchemy import column, func, select, table, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from andromeda_ng.service.models import Lead, LeadImportError, LeadImportJob
+from andromeda_ng.service.schema import LeadImportRow, LeadSchema
+from andromeda_ng.service.settings import config
+from andromeda_ng.service.utils.dialect import insert_for
+from andromeda_ng.service.utils.upsert import ConflictPolicy, on_conflict
+
+""" Bulk lead import from CSV and NDJSON uploads """
+
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson",
+                  "text/csv": "csv", "application/x-ndjson": "ndjson"}
+# what an import writes per lead, the other columns take their defaults
+IMPORT_COLUMNS = ("id", *LeadSchema.model_fields, "created_at")
+# rows per multi-row INSERT where there's no COPY, under SQLite's bind limit
+INSERT_ROWS = 1000
+UPLOAD_READ_SIZE = 1024 * 1024
+
+_STAGING = table("lead_import_staging", *(column(name) for name in IMPORT_COLUMNS))
+# typed like the leads columns it feeds, dropped with the chunk's transaction
+_CREATE_STAGING = text("CREATE TEMP TABLE lead_import_staging ({}) ON COMMIT DROP".format(", ".join(
+    f"{name} {Lead.__table__.c[name].type.compile(dialect=postgresql.dialect())}"
+    for name in IMPORT_COLUMNS)))
+_LEAD_EMAIL_KEY = [func.lower(Lead.lead_email)]
+
+_running = set()
+_slots = asyncio.Semaphore(config.IMPORT_MAX_CONCURRENT)
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """csv or ndjson from the upload's extension or content type"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    return IMPORT_FORMATS.get(extension) or IMPORT_FORMATS.get((content_type or "").split(";")[0].strip())
+
+
+async def save_upload(file: UploadFile) -> Tuple[Optional[str], int]:
+    """Copy an upload to a temp file a block at a time, returns (path, size).
+
+    The path is None when the upload is over IMPORT_MAX_BYTES, in which
+    case nothing is kept.
+    """
+    fd, path = tempfile.mkstemp(suffix=".import", dir=config.IMPORT_TMP_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while block := await file.read(UPLOAD_READ_SIZE):
+                size += len(block)
+                if size > config.IMPORT_MAX_BYTES:
+                    os.unlink(path)
+                    return None, size
+                out.write(block)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, size
+
+
+async def create_import_job(db: AsyncSession, format: str, filename: Optional[str],
+                            policy: ConflictPolicy, bytes_total: int):
+    try:
+        job = LeadImportJob(id=uuid.uuid4(), status="queued", format=format, filename=filename,
+                            on_conflict=policy.value, bytes_total=bytes_total, bytes_read=0,
+                            rows_read=0, inserted=0, updated=0, duplicates=0, invalid=0, errors=0)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        return job
+    except Exception as e:
+        logger.error(f"Error creating import job: {e}")
+        await db.rollback()
+        return {"error": "Error creating import job"}
+
+
+async def read_import_job(db: AsyncSession, job_id: uuid.UUID):
+    try:
+        return await db.get(LeadImportJob, job_id)
+    except Exception as e:
+        logger.error(f"Error reading import job: {e}")
+        return {"error": "Error reading import job"}
+
+
+async def read_import_errors(db: AsyncSession, job_id: uuid.UUID, after_row: int = 0, limit: int = 100):
+    """A job's row errors in row order, starting after after_row"""
+    try:
+        result = await db.scalars(select(LeadImportError).where(
+            LeadImportError.job_id == job_id, LeadImportError.row > after_row
+        ).order_by(LeadImportError.row).limit(limit))
+        return result.all()
+    except Exception as e:
+        logger.error(f"Error reading import errors: {e}")
+        return {"error": "Error reading import errors"}
+
+
+class _CountingLines:
+    """A binary file's lines decoded as UTF-8, counting the bytes behind them"""
+
+    def __init__(self, file):
+        self.file = file
+        self.bytes_read = 0
+
+    def __iter__(self):
+        for number, line in enumerate(self.file):
+            self.bytes_read += len(line)
+            decoded = line.decode("utf-8")
+            yield decoded.lstrip("\ufeff") if number == 0 else decoded
+
+
+def _records(lines: _CountingLines, format: str) -> Iterator[Tuple[int, object]]:
+    """(record number, field dict or why it can't be read) for each record"""
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for number, record in enumerate(reader, 1):
+            # empty cells are missing values; columns LeadSchema doesn't know are ignored by it
+            yield number, {key.strip(): value for key, value in record.items()
+                           if key and value not in ("", None)}
+        return
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, "Invalid JSON"
+            continue
+        yield number, record if isinstance(record, dict) else "Expected a JSON object"
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+                     for detail in error.errors())
+
+
+def _prepare_chunk(records: Iterator, size: int) -> Tuple[int, list, list]:
+    """Read and validate up to size records.
+
+    Returns (records read, [(row, column values)], [(row, error)]). Runs in
+    a worker thread, so the event loop keeps serving requests meanwhile.
+    """
+    valid, errors = [], []
+    created_at = datetime.now(timezone.utc)
+    read = 0
+    for number, record in itertools.islice(records, size):
+        read += 1
+        if isinstance(record, str):
+            errors.append((number, record))
+            continue
+        try:
+            values = LeadImportRow.model_validate(record).model_dump()
+        except ValidationError as e:
+            errors.append((number, _validation_message(e)))
+            continue
+        values["id"] = uuid.uuid4()
+        values["lead_email"] = values["lead_email"].lower()
+        values["created_at"] = created_at
+        valid.append((number, values))
+    return read, valid, errors
+
+
+def _dedupe(valid: list, keep_last: bool) -> Tuple[list, list]:
+    """One row per email, the first or with keep_last the last; returns
+    (kept rows, [(dropped row, row kept instead)])"""
+    kept = {}
+    repeats = []
+    for number, values in valid:
+        email = values["lead_email"]
+        if email in kept:
+            if keep_last:
+                repeats.append((kept[email][0], number))
+                kept[email] = (number, values)
+            else:
+                repeats.append((number, kept[email][0]))
+        else:
+            kept[email] = (number, values)
+    return sorted(kept.values(), key=lambda item: item[0]), repeats
+
+
+async def _copy_and_merge(db: AsyncSession, rows: List[dict], policy: ConflictPolicy) -> list:
+    """COPY rows into a temp staging table, then one INSERT ... SELECT ... ON
+    CONFLICT into leads; returns the ids of the leads written"""
+    conn = await db.connection()
+    await conn.execute(_CREATE_STAGING)
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        "lead_import_staging", columns=IMPORT_COLUMNS,
+        records=[tuple(values[name] for name in IMPORT_COLUMNS) for values in rows])
+    statement = on_conflict(
+        postgresql.insert(Lead).from_select(IMPORT_COLUMNS, select(_STAGING)),
+        Lead, IMPORT_COLUMNS, _LEAD_EMAIL_KEY, policy)
+    return (await conn.execute(statement.returning(Lead.id))).scalars().all()
+
+
+async def _insert_rows(db: AsyncSession, rows: List[dict], policy: ConflictPolicy) -> list:
+    """Multi-row INSERT ... ON CONFLICT, for databases without COPY"""
+    ids = []
+    for start in range(0, len(rows), INSERT_ROWS):
+        statement = on_conflict(insert_for(db, Lead).values(rows[start:start + INSERT_ROWS]),
+                                Lead, IMPORT_COLUMNS, _LEAD_EMAIL_KEY, policy)
+        ids += (await db.execute(statement.returning(Lead.id))).scalars().all()
+    return ids
+
+
+async def _load_chunk(db: AsyncSession, job_id: uuid.UUID, policy: ConflictPolicy, postgres: bool,
+                      read: int, valid: list, errors: list, bytes_read: int, error_budget: int) -> int:
+    """Write one validated chunk, its row errors and the job's counters in
+    one transaction; returns how many row errors were stored"""
+    kept, repeats = _dedupe(valid, keep_last=policy == ConflictPolicy.merge)
+    rows = [values for _, values in kept]
+    written = set(await (_copy_and_merge if postgres else _insert_rows)(db, rows, policy)) if rows else set()
+    inserted = sum(values["id"] in written for values in rows)
+    # with merge every kept row is written, as a new lead or over an existing one
+    existing = [] if policy == ConflictPolicy.merge else [
+        number for number, values in kept if values["id"] not in written]
+    row_errors = list(errors)
+    if policy == ConflictPolicy.reject:
+        row_errors += [(number, "Lead already exists") for number in existing]
+        row_errors += [(number, f"Duplicate of row {first}") for number, first in repeats]
+    stored = sorted(row_errors)[:error_budget]
+    if stored:
+        await db.execute(insert_for(db, LeadImportError).values(
+            [{"job_id": job_id, "row": number, "error": error} for number, error in stored]))
+    await db.execute(update(LeadImportJob).where(LeadImportJob.id == job_id).values(
+        bytes_read=bytes_read,
+        rows_read=LeadImportJob.rows_read + read,
+        inserted=LeadImportJob.inserted + inserted,
+        updated=LeadImportJob.updated + len(written) - inserted,
+        duplicates=LeadImportJob.duplicates + len(repeats) + len(existing),
+        invalid=LeadImportJob.invalid + len(errors),
+        errors=LeadImportJob.errors + len(row_errors)))
+    await db.commit()
+    return len(stored)
+
+
+async def _finish(session_factory, job_id: uuid.UUID, **values):
+    async with session_factory() as db:
+        await db.execute(update(LeadImportJob).where(LeadImportJob.id == job_id).values(
+            finished_at=datetime.now(timezone.utc), **values))
+        await db.commit()
+
+
+async def run_import(session_factory, job_id: uuid.UUID, path: str):
+    """Load the uploaded file at path into leads and delete it.
+
+    Records are read and validated IMPORT_CHUNK_SIZE at a time in a worker
+    thread, a chunk ahead of the one being written; each chunk is deduplicated on email, loaded (COPY into a staging
+    table and a merge on Postgres) and committed together with the job's
+    counters and row errors, so progress is visible as it goes and a job
+    that fails keeps the chunks before the failure. At most
+    IMPORT_MAX_CONCURRENT imports run at once per worker.
+    """
+    try:
+        async with _slots:
+            async with session_factory() as db:
+                job = await db.get(LeadImportJob, job_id)
+                policy = ConflictPolicy(job.on_conflict)
+                job.status = "running"
+                job.started_at = datetime.now(timezone.utc)
+                await db.commit()
+                postgres = db.get_bind().dialect.name == "postgresql"
+                error_budget = config.IMPORT_MAX_ROW_ERRORS
+                with open(path, "rb") as file:
+                    lines = _CountingLines(file)
+                    records = _records(lines, job.format)
+
+                    def prepare():
+                        return (*_prepare_chunk(records, config.IMPORT_CHUNK_SIZE), lines.bytes_read)
+
+                    # the next chunk is parsed while this one is written
+                    upcoming = asyncio.ensure_future(asyncio.to_thread(prepare))
+                    try:
+                        while True:
+                            read, valid, errors, bytes_read = await upcoming
+                            if not read:
+                                break
+                            upcoming = asyncio.ensure_future(asyncio.to_thread(prepare))
+                            error_budget -= await _load_chunk(
+                                db, job_id, policy, postgres, read, valid, errors,
+                                bytes_read, error_budget)
+                    finally:
+                        # let the thread finish with the file before it is closed
+                        await asyncio.gather(upcoming, return_exceptions=True)
+            await _finish(session_factory, job_id, status="succeeded")
+            logger.info(f"Lead import {job_id} finished")
+    except asyncio.CancelledError:
+        await _finish(session_factory, job_id, status="failed", error="Interrupted by a shutdown")
+        raise
+    except (UnicodeDecodeError, csv.Error) as e:
+        logger.error(f"Lead import {job_id} can't read its file: {e}")
+        await _finish(session_factory, job_id, status="failed", error=f"Unreadable file: {e}")
+    except Exception as e:
+        logger.error(f"Lead import {job_id} failed: {e}")
+        await _finish(session_factory, job_id, status="failed", error="Error importing leads")
+    finally:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def start_import(session_factory, job_id: uuid.UUID, path: str):
+    """Run an import in the background of this worker"""
+    task = asyncio.create_task(run_import(session_factory, job_id, path))
+    # keep a reference so the task isn't garbage collected mid-flight
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+
+
+async def cancel_imports():
+    """Stop running imports at shutdown, marking their jobs failed"""
+    for task in list(_running):
+        task.cancel()
+    await asyncio.gather(*_running, return_exceptions=True)
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import UUID, Float, bindparam, cast, column, exists, extract, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from andromeda_ng.service.models import Customer, Lead
+from andromeda_ng.service.settings import config
+from andromeda_ng.service.utils.normalize import FREE_EMAIL_DOMAINS, normalize_domain
+
+""" Conversion likelihood scores for leads, computed a batch of columns at a time """
+
+# share of the 0-100 score each feature contributes; every feature is 0..1
+SCORE_WEIGHTS = {"domain": 0.25, "message": 0.15, "status": 0.25, "recency": 0.15, "customer": 0.20}
+# lead_status is all the status history leads keep; converted leads score as 1
+STATUS_WEIGHTS = {"Qualified": 1.0, "New": 0.5, "Archived": 0.0}
+DEFAULT_STATUS_WEIGHT = 0.5
+# message length (characters) past which a longer message adds nothing
+MESSAGE_SATURATION = 500
+# days for the recency feature to halve
+RECENCY_HALF_LIFE_DAYS = 30.0
+
+_FREE_EMAIL_DOMAINS = np.array(sorted(FREE_EMAIL_DOMAINS))
+
+
+def _feature_columns(postgres: bool) -> tuple:
+    """What compute_scores needs per lead, reduced to scalars in SQL so
+    message bodies and timestamps never leave the database"""
+    if postgres:
+        age_days = extract("epoch", func.now() - Lead.created_at) / 86400
+        email_domain = func.split_part(Lead.lead_email, "@", 2)
+    else:
+        age_days = func.julianday("now") - func.julianday(Lead.created_at)
+        email_domain = func.substr(Lead.lead_email, func.instr(Lead.lead_email, "@") + 1)
+    # served by the lower(customer_name) index, planned as one semi-join per batch
+    customer_match = exists().where(func.lower(Customer.customer_name) == func.lower(Lead.lead_company))
+    return (Lead.id,
+            Lead.lead_status,
+            Lead.lead_converted,
+            func.length(func.coalesce(Lead.lead_message, "")),
+            cast(age_days, Float),
+            func.lower(email_domain),
+            func.coalesce(Lead.lead_website, "") != "",
+            customer_match)
+
+
+def _columnar(rows: list) -> Tuple[list, Dict[str, np.ndarray]]:
+    """Lead ids and one array per feature column of a batch of rows"""
+    ids, status, converted, message_length, age_days, email_domain, has_website, customer_match = zip(*rows)
+    return list(ids), {
+        "status": np.array(status, dtype=str),
+        "converted": np.array(converted, dtype=bool),
+        "message_length": np.array(message_length, dtype=float),
+        "age_days": np.array(age_days, dtype=float),
+        "email_domain": np.array(email_domain, dtype=str),
+        "has_website": np.array(has_website, dtype=bool),
+        "customer_match": np.array(customer_match, dtype=bool),
+    }
+
+
+def compute_scores(batch: Dict[str, np.ndarray], customer_domains: np.ndarray) -> np.ndarray:
+    """Scores 0-100 for a batch of leads, one array operation per feature"""
+    domain = batch["email_domain"]
+    company_email = (domain != "") & ~np.isin(domain, _FREE_EMAIL_DOMAINS)
+    features = {
+        "domain": company_email | batch["has_website"],
+        "message": np.minimum(np.log1p(batch["message_length"]) / np.log1p(MESSAGE_SATURATION), 1.0),
+        "recency": 0.5 ** (np.maximum(batch["age_days"], 0.0) / RECENCY_HALF_LIFE_DAYS),
+        "customer": batch["customer_match"] | (company_email & np.isin(domain, customer_domains)),
+    }
+    # weigh the few distinct statuses once and broadcast back
+    labels, inverse = np.unique(batch["status"], return_inverse=True)
+    status = np.array([STATUS_WEIGHTS.get(label, DEFAULT_STATUS_WEIGHT) for label in labels])
+    features["status"] = np.where(batch["converted"], 1.0, status[inverse.reshape(-1)])
+    score = sum(weight * features[name] for name, weight in SCORE_WEIGHTS.items())
+    return np.round(100.0 * score, 2)
+
+
+async def _customer_domains(db: AsyncSession) -> np.ndarray:
+    websites = (await db.scalars(select(Customer.customer_website).where(
+        Customer.customer_website.is_not(None)))).all()
+    return np.array(sorted({domain for domain in map(normalize_domain, websites) if domain}), dtype=str)
+
+
+async def _write_scores(db: AsyncSession, ids: List, scores: np.ndarray, postgres: bool) -> int:
+    """Store scores that changed, LEAD_SCORE_WRITE_SIZE rows per statement.
+
+    A rescore isn't an edit, so updated_at (which drives exports and the
+    dedupe index) and version are left as they were.
+    """
+    table = Lead.__table__
+    size = config.LEAD_SCORE_WRITE_SIZE
+    changed = 0
+    for start in range(0, len(ids), size):
+        rows = list(zip(ids[start:start + size], scores[start:start + size].tolist()))
+        if postgres:
+            # UPDATE leads SET ... FROM (VALUES ($1::UUID, $2::FLOAT), ...) AS scored (id, score)
+            scored = values(column("id", UUID(as_uuid=True)), column("score", Float),
+                            name="scored").data(rows)
+            result = await db.execute(
+                update(table).where(table.c.id == scored.c.id, table.c.lead_score != scored.c.score)
+                .values(lead_score=scored.c.score, updated_at=table.c.updated_at))
+        else:
+            result = await db.execute(
+                update(table).where(table.c.id == bindparam("b_id"),
+                                    table.c.lead_score != bindparam("b_score"))
+                .values(lead_score=bindparam("b_score"), updated_at=table.c.updated_at),
+                [{"b_id": lead_id, "b_score": score} for lead_id, score in rows])
+        changed += max(result.rowcount, 0)
+    return changed
+
+
+async def rescore_leads(db: AsyncSession, batch_size: Optional[int] = None):
+    """Recompute every lead's score, batch_size leads per transaction.
+
+    Leads are read in id order as columns of precomputed features, scored
+    with vectorized numpy and written back with bulk UPDATE ... FROM
+    (VALUES ...). Returns how many leads were scored and changed.
+    """
+    try:
+        batch_size = batch_size or config.LEAD_SCORE_BATCH_SIZE
+        postgres = db.get_bind().dialect.name == "postgresql"
+        started = time.perf_counter()
+        customer_domains = await _customer_domains(db)
+        query = select(*_feature_columns(postgres)).order_by(Lead.id).limit(batch_size)
+        scored = changed = 0
+        last_id = None
+        while True:
+            batch_query = query if last_id is None else query.where(Lead.id > last_id)
+            rows = (await db.execute(batch_query)).all()
+            if not rows:
+                break
+            ids, batch = _columnar(rows)
+            changed += await _write_scores(db, ids, compute_scores(batch, customer_domains), postgres)
+            await db.commit()
+            scored += len(ids)
+            last_id = ids[-1]
+        seconds = round(time.perf_counter() - started, 3)
+        logger.info(f"Rescored {scored} leads ({changed} changed) in {seconds} s")
+        return {"scored": scored, "changed": changed, "seconds": seconds}
+    except Exception as e:
+        logger.error(f"Error scoring leads: {e}")
+        await db.rollback()
+        return {"error": "Error scoring leads"}
+
+
+async def rescore_periodically(session_factory, interval: float):
+    """Run rescore_leads every interval seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        async with session_factory() as db:
+            await rescore_leads(db)
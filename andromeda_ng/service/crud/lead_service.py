@@ -1,96 +1,219 @@
 from loguru import logger
 from andromeda_ng.service.models import Lead, Customer, Contact
-from andromeda_ng.service.database import get_db
-from sqlalchemy.orm import Session
-from andromeda_ng.service.schema import LeadSchema
+from sqlalchemy import delete, select, tuple_, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from andromeda_ng.service.schema import LeadPatch, LeadSchema
 from andromeda_ng.service.libs import zammad
+from andromeda_ng.service.utils.pagination import encode_cursor, decode_cursor
+from datetime import datetime
+from typing import List, Optional, Union
+from andromeda_ng.service.utils.export import EXPORT_BATCH_SIZE
+from andromeda_ng.service.utils.dialect import insert_for
+from andromeda_ng.service.utils.upsert import ConflictPolicy, insert_unique
+from andromeda_ng.service.utils.update import DUPLICATE, null_violations, update_error, update_returning
+from andromeda_ng.service.settings import config
 import uuid
 
 
-async def create_lead(db: Session, lead_data: LeadSchema):
-    check_lead = db.query(Lead).filter(
-        Lead.lead_email == lead_data.lead_email).first()
-    if check_lead:
-        logger.error("Lead already exists")
-        return {"error": "Lead already exists"}
+async def create_lead(db: AsyncSession, lead_data: LeadSchema,
+                      policy: Optional[ConflictPolicy] = None):
+    """Insert a lead in one statement against the lower(lead_email) unique index"""
     try:
-        new_lead = Lead(**lead_data.dict())
-        db.add(new_lead)
-        db.commit()
-        db.refresh(new_lead)
-        return new_lead
+        values = lead_data.model_dump()
+        values["id"] = uuid.uuid4()
+        values["lead_email"] = values["lead_email"].lower()
+        lead = await insert_unique(
+            db, Lead, values, [func.lower(Lead.lead_email)],
+            policy or ConflictPolicy(config.LEAD_CONFLICT_POLICY),
+            existing_where=func.lower(Lead.lead_email) == values["lead_email"])
+        await db.commit()
+        if lead is None:
+            logger.error("Lead already exists")
+            return {"error": "Lead already exists"}
+        return lead
     except Exception as e:
         logger.error(f"Error creating lead: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error creating lead"}
 
 
-async def read_leads(db: Session):
+async def insert_leads(db: AsyncSession, rows: List[dict]) -> int:
+    """Multi-row INSERT ... ON CONFLICT DO NOTHING, returns how many leads were new.
+
+    Rows that hit any unique key (the id or lower(lead_email)) are skipped,
+    so inserting the same rows twice is harmless. The caller commits.
+    """
+    if not rows:
+        return 0
+    result = await db.execute(
+        insert_for(db, Lead).values(rows).on_conflict_do_nothing().returning(Lead.id))
+    return len(result.all())
+
+
+# read_leads sort -> (column paged on, parser for its value in a cursor)
+LEAD_SORTS = {
+    "created_at": (Lead.created_at, datetime.fromisoformat),
+    "score": (Lead.lead_score, float),
+}
+
+
+def _lead_cursor_key(sort: str, order: str) -> str:
+    # created_at cursors carry the bare order, as they did before sort existed
+    return order if sort == "created_at" else f"{sort}:{order}"
+
+
+def _decode_lead_cursor(cursor: str, order: str, sort: str = "created_at"):
+    """Parse a read_leads cursor into (sort value, id), raises ValueError if it is
+    malformed or was issued for another sort or direction."""
+    cursor_key, value, lead_id = decode_cursor(cursor, 3)
+    if cursor_key != _lead_cursor_key(sort, order):
+        raise ValueError(f"Cursor was issued for {cursor_key}")
+    parse = LEAD_SORTS[sort][1]
+    return (parse(value) if value else None), uuid.UUID(lead_id)
+
+
+async def read_leads(db: AsyncSession, limit: int = 50, cursor: Optional[str] = None,
+                     lead_status: Optional[str] = None, lead_converted: Optional[bool] = None,
+                     lead_company: Optional[str] = None, created_after: Optional[datetime] = None,
+                     created_before: Optional[datetime] = None, order: str = "desc",
+                     sort: str = "created_at"):
+    """Return one page of leads ordered by (created_at, id), or (lead_score, id)
+    for sort="score", and the cursor for the next page."""
     try:
-        leads = db.query(Lead).all()
-        return leads
+        query = select(Lead)
+        if lead_status is not None:
+            query = query.where(Lead.lead_status == lead_status)
+        if lead_converted is not None:
+            query = query.where(Lead.lead_converted == lead_converted)
+        if lead_company is not None:
+            query = query.where(Lead.lead_company == lead_company)
+        if created_after is not None:
+            query = query.where(Lead.created_at >= created_after)
+        if created_before is not None:
+            query = query.where(Lead.created_at < created_before)
+
+        sort_column = LEAD_SORTS[sort][0]
+        if cursor:
+            try:
+                value, lead_id = _decode_lead_cursor(cursor, order, sort)
+            except ValueError as e:
+                logger.error(f"Invalid lead cursor: {e}")
+                return {"error": "Invalid cursor"}
+            # compare against the stored value of the cursor row rather than the
+            # round-tripped one, so ties are always decided by id whatever
+            # precision the backend keeps; the cursor's copy is only a fallback
+            # for when that row has been deleted
+            stored_value = select(sort_column).where(
+                Lead.id == lead_id).scalar_subquery()
+            after = tuple_(func.coalesce(stored_value, value), lead_id)
+            sort_key = tuple_(sort_column, Lead.id)
+            query = query.where(sort_key < after if order == "desc" else sort_key > after)
+        if order == "desc":
+            query = query.order_by(sort_column.desc(), Lead.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), Lead.id.asc())
+
+        # fetch one extra row to know whether another page exists
+        result = await db.execute(query.limit(limit + 1))
+        leads = result.scalars().all()
+        next_cursor = None
+        if len(leads) > limit:
+            leads = leads[:limit]
+            last = leads[-1]
+            value = getattr(last, sort_column.key)
+            value = value.isoformat() if isinstance(value, datetime) else ("" if value is None else repr(value))
+            next_cursor = encode_cursor(_lead_cursor_key(sort, order), value, last.id)
+        return {"items": leads, "next_cursor": next_cursor}
     except Exception as e:
         logger.error(f"Error reading leads: {e}")
         return {"error": "Error reading leads"}
 
 
-async def read_lead_by_id(db: Session, lead_id: uuid.UUID):
+async def read_lead_by_id(db: AsyncSession, lead_id: uuid.UUID):
     try:
-        lead = db.query(Lead).filter(Lead.id == lead_id).first()
+        lead = await db.get(Lead, lead_id)
         return lead
     except Exception as e:
         logger.error(f"Error reading lead: {e}")
         return {"error": "Error reading lead"}
 
 
-async def read_lead_by_email(db: Session, lead_email: str):
+async def read_lead_by_email(db: AsyncSession, lead_email: str):
     try:
-        lead = db.query(Lead).filter(Lead.lead_email == lead_email).first()
+        # matches the lower(lead_email) unique index
+        result = await db.execute(select(Lead).where(
+            func.lower(Lead.lead_email) == lead_email.lower()))
+        lead = result.scalars().first()
         return lead
     except Exception as e:
         logger.error(f"Error reading lead: {e}")
         return {"error": "Error reading lead"}
 
 
-async def update_lead(db: Session, lead_id: uuid.UUID, lead_data: LeadSchema):
+async def update_lead(db: AsyncSession, lead_id: uuid.UUID, lead_data: Union[LeadSchema, LeadPatch],
+                      expected_version: Optional[int] = None):
+    """Write the fields set on lead_data in one UPDATE ... RETURNING,
+    optionally only if the lead is still at expected_version"""
     try:
-        lead = db.query(Lead).filter(Lead.id == lead_id).first()
-        if not lead:
-            return {"error": "Lead not found"}
-        update_lead = lead.update(lead_data.dict())
-        db.commit()
-        db.refresh(update_lead)
-        if not update_lead:
-            return {"error": "Error updating lead"}
+        values = lead_data.model_dump(exclude_unset=True)
+        if values.get("lead_email"):
+            values["lead_email"] = values["lead_email"].lower()
+        lead, reason = await update_returning(db, Lead, lead_id, values, expected_version)
+        if lead is None:
+            await db.rollback()
+            return update_error("Lead", reason, null_violations(Lead, values))
+        await db.commit()
         logger.info(f"Lead updated: {lead_id}")
-        return update_lead
+        return lead
+    except IntegrityError as e:
+        logger.error(f"Lead update violates a unique key: {e}")
+        await db.rollback()
+        return update_error("Lead", DUPLICATE)
     except Exception as e:
         logger.error(f"Error updating lead: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error updating lead"}
 
 
-async def delete_lead(db: Session, lead_id: uuid.UUID):
+async def delete_lead(db: AsyncSession, lead_id: uuid.UUID):
+    """DELETE ... RETURNING id, nothing returned means there was no such lead"""
     try:
-        lead = db.query(Lead).filter(Lead.id == lead_id).first()
-        if not lead:
+        result = await db.execute(
+            delete(Lead).where(Lead.id == lead_id).returning(Lead.id))
+        deleted = result.scalar_one_or_none()
+        await db.commit()
+        if deleted is None:
             return {"error": "Lead not found"}
-        db.delete(lead)
-        db.commit()
         logger.info(f"Lead deleted: {lead_id}")
         return {"message": "Lead deleted successfully"}
     except Exception as e:
         logger.error(f"Error deleting lead: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error deleting lead"}
 
+
+async def delete_leads(db: AsyncSession, lead_ids: List[uuid.UUID]):
+    """Delete many leads in one statement, returns the ids that existed"""
+    try:
+        result = await db.execute(
+            delete(Lead).where(Lead.id.in_(lead_ids)).returning(Lead.id))
+        deleted = result.scalars().all()
+        await db.commit()
+        logger.info(f"Deleted {len(deleted)} of {len(lead_ids)} leads")
+        return deleted
+    except Exception as e:
+        logger.error(f"Error deleting leads: {e}")
+        await db.rollback()
+        return {"error": "Error deleting leads"}
+
 # take the lead id then convert the lead to a customerin zammad
 
 
-async def convert_lead_to_customer(db: Session, lead_id: uuid.UUID):
+async def convert_lead_to_customer(db: AsyncSession, lead_id: uuid.UUID):
     try:
         # Get lead from database
-        lead = db.query(Lead).filter(Lead.id == lead_id).first()
+        lead = await db.get(Lead, lead_id)
         if not lead:
             return {"error": "Lead not found"}
 
@@ -122,8 +245,8 @@ async def convert_lead_to_customer(db: Session, lead_id: uuid.UUID):
             return {"error": "Error creating user in Zammad"}
         # Update lead status
         lead.lead_converted = True
-        db.commit()
-        db.refresh(lead)
+        await db.commit()
+        await db.refresh(lead)
 
         # Create local customer record
         new_customer = {
@@ -139,8 +262,8 @@ async def convert_lead_to_customer(db: Session, lead_id: uuid.UUID):
         }
         create_customer = Customer(**new_customer)
         db.add(create_customer)
-        db.commit()
-        db.refresh(create_customer)
+        await db.commit()
+        await db.refresh(create_customer)
 
         # Create contact record
         new_contact = {
@@ -151,8 +274,8 @@ async def convert_lead_to_customer(db: Session, lead_id: uuid.UUID):
         }
         create_contact = Contact(**new_contact)
         db.add(create_contact)
-        db.commit()
-        db.refresh(create_contact)
+        await db.commit()
+        await db.refresh(create_contact)
 
         logger.info(
             f"Converted Lead Contact {lead.lead_first_name} "
@@ -163,5 +286,16 @@ async def convert_lead_to_customer(db: Session, lead_id: uuid.UUID):
 
     except Exception as e:
         logger.error(f"Error converting lead to customer: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": f"Error converting lead to customer: {str(e)}"}
+
+
+async def stream_leads(db: AsyncSession, since: Optional[datetime] = None):
+    """Yield every lead created or updated since `since` through a server-side cursor"""
+    query = select(Lead)
+    if since is not None:
+        query = query.where(func.coalesce(Lead.updated_at, Lead.created_at) >= since)
+    result = await db.stream_scalars(
+        query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for lead in result:
+        yield lead
@@ -1,53 +1,73 @@
 from loguru import logger
 from andromeda_ng.service.models import Note
-from andromeda_ng.service.database import get_db
-from sqlalchemy.orm import Session
-from andromeda_ng.service.schema import NoteOutput, NoteSchema
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from andromeda_ng.service.schema import NoteOutput, NotePatch, NoteSchema
+from andromeda_ng.service.utils.export import EXPORT_BATCH_SIZE
+from andromeda_ng.service.utils.update import null_violations, update_error, update_returning
+from datetime import datetime
+from typing import Optional, Union
 import uuid
 
 
-async def create_note(db: Session, note_data: NoteSchema):
+async def create_note(db: AsyncSession, note_data: NoteSchema):
     try:
         new_note = Note(**note_data.dict())
         db.add(new_note)
-        db.commit()
-        db.refresh(new_note)
+        await db.commit()
+        await db.refresh(new_note)
         logger.info(f"Note created: {new_note.id}")
         return new_note
     except Exception as e:
         logger.error(f"Error creating note: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error creating note"}
 
 
-async def read_notes(db: Session):
+async def read_notes(db: AsyncSession):
     try:
-        notes = db.query(Note).all()
+        result = await db.execute(select(Note))
+        notes = result.scalars().all()
         return notes
     except Exception as e:
         logger.error(f"Error reading notes: {e}")
         return {"error": "Error reading notes"}
 
 
-async def read_note_by_id(db: Session, note_id: uuid.UUID):
+async def read_note_by_id(db: AsyncSession, note_id: uuid.UUID):
     try:
-        note = db.query(Note).filter(Note.id == note_id).first()
+        note = await db.get(Note, note_id)
         return note
     except Exception as e:
         logger.error(f"Error reading note: {e}")
         return {"error": "Error reading note"}
 
 
-async def update_note(db: Session, note_id: uuid.UUID, note_data: NoteSchema):
+async def update_note(db: AsyncSession, note_id: uuid.UUID, note_data: Union[NoteSchema, NotePatch],
+                      expected_version: Optional[int] = None):
+    """Write the fields set on note_data in one UPDATE ... RETURNING"""
     try:
-        note = db.query(Note).filter(Note.id == note_id).first()
-        if not note:
-            logger.error(f"Note not found with id: {note_id}")
-            return {"error": "Note not found"}
-        note.update(note_data.dict(exclude_unset=True))
-        db.commit()
+        values = note_data.model_dump(exclude_unset=True)
+        note, reason = await update_returning(db, Note, note_id, values, expected_version)
+        if note is None:
+            logger.error(f"Note not updated ({reason}): {note_id}")
+            await db.rollback()
+            return update_error("Note", reason, null_violations(Note, values))
+        await db.commit()
         logger.info(f"Note updated: {note_id}")
         return note
     except Exception as e:
         logger.error(f"Error updating note: {e}")
+        await db.rollback()
         return {"error": "Error updating note"}
+
+
+async def stream_notes(db: AsyncSession, since: Optional[datetime] = None):
+    """Yield every note created since `since` through a server-side cursor"""
+    query = select(Note)
+    if since is not None:
+        query = query.where(Note.created_at >= since)
+    result = await db.stream_scalars(
+        query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for note in result:
+        yield note
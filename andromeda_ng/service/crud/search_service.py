@@ -0,0 +1,146 @@
+import re
+import uuid
+from typing import List, NamedTuple, Optional
+
+from loguru import logger
+from sqlalchemy import Float, String, and_, cast, func, literal_column, or_, select, text, union_all
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from andromeda_ng.service.models import Contact, Customer, Lead, Note
+from andromeda_ng.service.settings import config
+from andromeda_ng.service.utils.pagination import decode_cursor, encode_cursor
+
+""" Ranked full-text search over leads, customers, contacts and notes """
+
+
+class SearchTarget(NamedTuple):
+    model: type
+    title: object
+    subtitle: object
+    # what the search_vector generated column is built from (see migration
+    # e7c1f4a9b302); matched with LIKE on databases without full-text search
+    columns: tuple
+
+
+SEARCH_TARGETS = {
+    "lead": SearchTarget(
+        Lead, Lead.lead_first_name + " " + Lead.lead_last_name, Lead.lead_company,
+        (Lead.lead_first_name, Lead.lead_last_name, Lead.lead_company, Lead.lead_email)),
+    "customer": SearchTarget(
+        Customer, Customer.customer_name, Customer.customer_city,
+        (Customer.customer_name, Customer.customer_city, Customer.customer_website)),
+    "contact": SearchTarget(
+        Contact, Contact.contact_first_name + " " + Contact.contact_last_name, Contact.contact_email,
+        (Contact.contact_first_name, Contact.contact_last_name, Contact.contact_email)),
+    "note": SearchTarget(
+        Note, Note.note_title, func.substr(Note.note_content, 1, 120),
+        (Note.note_title, Note.note_content)),
+}
+SEARCH_TYPES = tuple(SEARCH_TARGETS)
+
+MAX_TERMS = 8
+_TERM = re.compile(r"[^\W_]+")
+# the generated columns use the 'simple' configuration: no stemming or stop
+# words, so names and email fragments match as typed
+_TS_CONFIG = literal_column("'simple'::regconfig")
+_QUERY_CANCELED = "57014"
+
+
+def search_terms(q: str) -> List[str]:
+    """Lowercased words of a search string, at most MAX_TERMS"""
+    return _TERM.findall(q.lower())[:MAX_TERMS]
+
+
+def _decode_search_cursor(cursor: str):
+    rank, search_type, row_id = decode_cursor(cursor, 3)
+    if search_type not in SEARCH_TARGETS:
+        raise ValueError(f"Unknown type {search_type}")
+    return float(rank), search_type, uuid.UUID(row_id)
+
+
+def _branch(search_type: str, terms: List[str], postgres: bool, limit: int, after):
+    """One table's best `limit` hits after the cursor, ordered like the merged page"""
+    target = SEARCH_TARGETS[search_type]
+    model = target.model
+    if postgres:
+        # every term is a prefix so the last, half-typed word still matches
+        tsquery = func.to_tsquery(_TS_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        vector = literal_column("search_vector")
+        matches = vector.op("@@")(tsquery)
+        rank = cast(func.ts_rank_cd(vector, tsquery), Float)
+    else:
+        matches = and_(*(or_(*(func.lower(column).contains(term) for column in target.columns))
+                         for term in terms))
+        rank = cast(literal_column("1.0"), Float)
+    query = select(
+        literal_column(f"'{search_type}'", String).label("type"),
+        model.id.label("id"),
+        target.title.label("title"),
+        target.subtitle.label("subtitle"),
+        rank.label("rank"),
+    ).where(matches)
+    if after is not None:
+        # pages are ordered by (rank desc, type, id); within one table the
+        # type is fixed, so the cursor reduces to a condition on rank and id
+        after_rank, after_type, after_id = after
+        if search_type < after_type:
+            query = query.where(rank < after_rank)
+        elif search_type == after_type:
+            query = query.where(or_(rank < after_rank, and_(rank == after_rank, model.id > after_id)))
+        else:
+            query = query.where(rank <= after_rank)
+    return select(query.order_by(rank.desc(), model.id).limit(limit).subquery())
+
+
+async def search(db: AsyncSession, q: str, types: Optional[List[str]] = None,
+                 limit: int = 20, cursor: Optional[str] = None):
+    """One page of hits across the searchable tables, best first.
+
+    Each table contributes at most limit + 1 rows from its GIN-indexed
+    search_vector, the UNION ALL is merged on (rank desc, type, id) and the
+    next_cursor continues after the last hit. On Postgres the statement
+    runs under SEARCH_TIMEOUT_MS; going over returns a timeout error
+    rather than holding the connection.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return {"error": "No search terms"}
+    after = None
+    if cursor:
+        try:
+            after = _decode_search_cursor(cursor)
+        except ValueError as e:
+            logger.error(f"Invalid search cursor: {e}")
+            return {"error": "Invalid cursor"}
+    postgres = db.get_bind().dialect.name == "postgresql"
+    try:
+        merged = union_all(*(_branch(search_type, terms, postgres, limit + 1, after)
+                             for search_type in (types or SEARCH_TYPES))).subquery()
+        query = select(merged).order_by(
+            merged.c.rank.desc(), merged.c.type, merged.c.id).limit(limit + 1)
+        # SET LOCAL only lasts for the transaction, so run both on one
+        # connection and end the transaction once the rows are read
+        conn = await db.connection()
+        if postgres:
+            await conn.execute(text(f"SET LOCAL statement_timeout = {int(config.SEARCH_TIMEOUT_MS)}"))
+        rows = (await conn.execute(query)).mappings().all()
+        await db.commit()
+    except DBAPIError as e:
+        await db.rollback()
+        if getattr(e.orig, "sqlstate", None) == _QUERY_CANCELED:
+            logger.warning(f"Search for {q!r} exceeded {config.SEARCH_TIMEOUT_MS} ms")
+            return {"error": "Search timed out"}
+        logger.error(f"Error searching: {e}")
+        return {"error": "Error searching"}
+    except Exception as e:
+        logger.error(f"Error searching: {e}")
+        await db.rollback()
+        return {"error": "Error searching"}
+
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(repr(last["rank"]), last["type"], last["id"])
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,115 @@
+from loguru import logger
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from andromeda_ng.service.models import Ticket
+from andromeda_ng.service.libs import zammad
+from andromeda_ng.service.settings import config
+from andromeda_ng.service.utils.dialect import insert_for
+from datetime import datetime
+from typing import Optional
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _name(value) -> Optional[str]:
+    # webhook payloads carry state/priority as names, sometimes as {"name": ...}
+    if isinstance(value, dict):
+        value = value.get("name")
+    return str(value) if value is not None else None
+
+
+def ticket_values(ticket: dict) -> dict:
+    """Map a Zammad ticket payload onto tickets columns"""
+    state = _name(ticket.get("state"))
+    return {
+        "id": int(ticket["id"]),
+        "organization_id": ticket.get("organization_id"),
+        "number": _name(ticket.get("number")),
+        "title": ticket.get("title"),
+        "state": state.lower() if state else None,
+        "priority": _name(ticket.get("priority")),
+        "created_at": _parse_time(ticket.get("created_at")),
+        "updated_at": _parse_time(ticket.get("updated_at")),
+    }
+
+
+async def upsert_ticket(db: AsyncSession, ticket: dict):
+    """Insert or update a mirrored ticket.
+
+    Webhooks can arrive out of order, so an existing row is only replaced
+    by a payload at least as new as the one already stored.
+    """
+    try:
+        values = ticket_values(ticket)
+        insert = insert_for(db, Ticket)
+        statement = insert.values(**values)
+        update_columns = {name: statement.excluded[name]
+                          for name in values if name != "id"}
+        update_columns["synced_at"] = func.now()
+        statement = statement.on_conflict_do_update(
+            index_elements=[Ticket.id],
+            set_=update_columns,
+            where=(Ticket.updated_at.is_(None)
+                   | statement.excluded.updated_at.is_(None)
+                   | (statement.excluded.updated_at >= Ticket.updated_at)))
+        await db.execute(statement)
+        await db.commit()
+        if values["organization_id"] is not None:
+            zammad.ticket_cache.invalidate(values["organization_id"])
+        return values
+    except Exception as e:
+        logger.error(f"Error saving ticket: {e}")
+        await db.rollback()
+        return {"error": "Error saving ticket"}
+
+
+async def read_ticket_summary(db: AsyncSession, organization_id: int, limit: int = 20):
+    """Ticket summary for an organization from the local mirror, in the
+    same shape as zammad.get_company_tickets"""
+    try:
+        open_states = [state.lower() for state in config.ZAMMAD_OPEN_STATES]
+        result = await db.execute(
+            select(func.count(),
+                   func.count().filter(Ticket.state.in_(open_states)))
+            .where(Ticket.organization_id == organization_id))
+        total_count, open_count = result.one()
+
+        result = await db.execute(
+            select(*[getattr(Ticket, field) for field in zammad.TICKET_FIELDS])
+            .where(Ticket.organization_id == organization_id)
+            .order_by(Ticket.updated_at.desc(), Ticket.id.desc())
+            .limit(limit))
+        tickets = [dict(row._mapping) for row in result]
+        return {
+            "all_tickets": tickets,
+            "open_count": open_count,
+            "total_count": total_count,
+            "ticket_url": f"{zammad.url}/api/v1/tickets?expand=true&organization_id={organization_id}"
+        }
+    except Exception as e:
+        logger.error(f"Error reading tickets: {e}")
+        return None
+
+
+async def read_ticket_counts(db: AsyncSession, organization_ids: list) -> dict:
+    """Total and open ticket counts for many organizations in one grouped query"""
+    if not organization_ids:
+        return {}
+    open_states = [state.lower() for state in config.ZAMMAD_OPEN_STATES]
+    result = await db.execute(
+        select(Ticket.organization_id, func.count(),
+               func.count().filter(Ticket.state.in_(open_states)))
+        .where(Ticket.organization_id.in_(organization_ids))
+        .group_by(Ticket.organization_id))
+    return {organization_id: {
+                "ticket_count": total_count,
+                "open_tickets": open_count,
+                "ticket_url": f"{zammad.url}/api/v1/tickets?expand=true&organization_id={organization_id}"}
+            for organization_id, total_count, open_count in result}
@@ -1,118 +1,142 @@
 from loguru import logger
-from andromeda_ng.service.database import get_db
-from sqlalchemy.orm import Session
-from sqlalchemy.orm import joinedload
-from andromeda_ng.service.schema import UserOutput, UserSchema
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
+from andromeda_ng.service.schema import UserOutput, UserPatch, UserSchema
 from andromeda_ng.service.models.user import User
 import uuid
-from andromeda_ng.service.utils.passwords import hash_password
+from andromeda_ng.service.utils.passwords import hash_password_async, PasswordHasherBusy
+from andromeda_ng.service.utils.update import DUPLICATE, null_violations, update_error, update_returning
 
 
-async def create_user(db: Session, user_data: UserSchema):
+async def create_user(db: AsyncSession, user_data: UserSchema):
     try:
         user_dict = user_data.model_dump()
 
         # Change password to hashed_password
         password = user_dict.pop("password")
-        user_dict["hashed_password"] = hash_password(password)
+        user_dict["hashed_password"] = await hash_password_async(password)
 
         db_user = User(**user_dict)
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         logger.info(f"User created: {db_user.id}")
         return db_user
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         logger.error(f"Error creating user: {e}")
-        db.rollback()
+        await db.rollback()
         return None
 
 
-async def get_user_by_username(db: Session, username: str):
+async def get_user_by_username(db: AsyncSession, username: str):
     try:
-        user = db.query(User).filter(User.username == username).first()
+        result = await db.execute(select(User).where(User.username == username))
+        user = result.scalars().first()
         return user
     except Exception as e:
         logger.error(f"Error getting user: {e}")
         return None
 
 
-async def get_user_by_id(db: Session, user_id: uuid.UUID):
+async def get_user_by_id(db: AsyncSession, user_id: uuid.UUID):
     try:
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         return user
     except Exception as e:
         logger.error(f"Error getting user: {e}")
         return None
 
 
-async def update_user(db: Session, user_id: uuid.UUID, user_data: UserSchema):
+async def update_user(db: AsyncSession, user_id: uuid.UUID, user_data: Union[UserSchema, UserPatch],
+                      expected_version: Optional[int] = None):
+    """Write the fields set on user_data in one UPDATE ... RETURNING,
+    a password is hashed into hashed_password first"""
     try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return {"error": "User not found"}
-        update_user = user.update(user_data.dict())
-        db.commit()
-        db.refresh(update_user)
-        return user_data
+        values = user_data.model_dump(exclude_unset=True)
+        if "password" in values:
+            password = values.pop("password")
+            if password:
+                values["hashed_password"] = await hash_password_async(password)
+        if values.get("username"):
+            values["username"] = values["username"].lower()
+        user, reason = await update_returning(db, User, user_id, values, expected_version)
+        if user is None:
+            await db.rollback()
+            return update_error("User", reason, null_violations(User, values))
+        await db.commit()
+        logger.info(f"User updated: {user_id}")
+        return user
+    except PasswordHasherBusy:
+        raise
+    except IntegrityError as e:
+        logger.error(f"User update violates a unique key: {e}")
+        await db.rollback()
+        return update_error("User", DUPLICATE)
     except Exception as e:
         logger.error(f"Error updating user: {e}")
-        db.rollback()
-        return None
+        await db.rollback()
+        return {"error": "Error updating user"}
 
 
-async def delete_user(db: Session, user_id: uuid.UUID):
+async def delete_user(db: AsyncSession, user_id: uuid.UUID):
     try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
+        result = await db.execute(
+            delete(User).where(User.id == user_id).returning(User.id))
+        deleted = result.scalar_one_or_none()
+        await db.commit()
+        if deleted is None:
             return {"error": "User not found"}
-        db.delete(user)
-        db.commit()
         logger.info(f"User deleted: {user_id}")
         return True
     except Exception as e:
         logger.error(f"Error deleting user: {e}")
-        db.rollback()
+        await db.rollback()
         return {"error": "Error deleting user"}
 
 
-async def get_all_users(db: Session):
+async def get_all_users(db: AsyncSession):
     try:
-        users = db.query(User).all()
+        result = await db.execute(select(User))
+        users = result.scalars().all()
         return users
     except Exception as e:
         logger.error(f"Error getting users: {e}")
         return None
 
 
-async def get_user_by_email(db: Session, email: str):
+async def get_user_by_email(db: AsyncSession, email: str):
     try:
-        user = db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
         return user
     except Exception as e:
         logger.error(f"Error getting user: {e}")
         return None
 
 
-async def get_user_by_id_(db: Session, user_id: uuid.UUID):
+async def get_user_by_id_(db: AsyncSession, user_id: uuid.UUID):
     try:
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         return user
     except Exception as e:
         logger.error(f"Error getting user: {e}")
         return None
 
 
-async def update_user_password(db: Session, user_id: uuid.UUID, password: str) -> bool:
+async def update_user_password(db: AsyncSession, user_id: uuid.UUID, password: str) -> bool:
     try:
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             return {"error": "User not found"}
         user.hashed_password = password
-        db.commit()
+        await db.commit()
         logger.info(f"User password updated: {user_id}")
         return True
     except Exception as e:
         logger.error(f"Error updating user password: {e}")
-        db.rollback()
+        await db.rollback()
         return None
@@ -1,21 +1,193 @@
-from sqlalchemy import create_engine
+import asyncio
+import time
+from fastapi import Request, Response
+from loguru import logger
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from andromeda_ng.service.settings import config
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
 from sqlalchemy.orm import Session
 from andromeda_ng.service.base import Base
+from andromeda_ng.service.libs.pool_stats import InstrumentedAsyncQueuePool
+# registers the engine-wide slow query listeners
+from andromeda_ng.service.libs import slow_queries  # noqa: F401
 
 SQLALCHEMY_DATABASE_URL = f"postgresql+psycopg2://{config.DB_USER}:{config.DB_PASS.get_secret_value()}@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{config.DB_USER}:{config.DB_PASS.get_secret_value()}@{config.DB_HOST}:{config.DB_PORT}/{config.DB_NAME}"
+
+
+POOL_OPTIONS = {
+    "pool_size": config.DB_POOL_SIZE,
+    "max_overflow": config.DB_MAX_OVERFLOW,
+    "pool_timeout": config.DB_POOL_TIMEOUT,
+    "pool_recycle": config.DB_POOL_RECYCLE,
+    "pool_pre_ping": config.DB_POOL_PRE_PING,
+}
 
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, future=True, echo=True
+    SQLALCHEMY_DATABASE_URL, future=True, echo=config.DB_ECHO, **POOL_OPTIONS
 )
 SessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+# Request handlers use the asyncpg engine so queries never block the event loop.
+# expire_on_commit is off because attributes can't be lazily reloaded from an
+# AsyncSession once a commit has expired them.
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, echo=config.DB_ECHO,
+    poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+class ReadOnlyAsyncSession(AsyncSession):
+    """Session for handlers that only read.
+
+    Each statement runs in its own short transaction that is ended as soon
+    as the rows are buffered, so the connection goes back to the pool
+    before the response is serialized rather than after. On Postgres the
+    transactions are BEGIN READ ONLY (see read_only_sessionmaker), so an
+    accidental write fails instead of being committed. Streaming results
+    are not supported; exports use get_async_sessionmaker.
+    """
+
+    async def _release(self):
+        if self.in_transaction():
+            await self.commit()
+
+    async def execute(self, *args, **kwargs):
+        try:
+            return await super().execute(*args, **kwargs)
+        finally:
+            await self._release()
+
+    async def scalar(self, *args, **kwargs):
+        try:
+            return await super().scalar(*args, **kwargs)
+        finally:
+            await self._release()
+
+    async def scalars(self, *args, **kwargs):
+        try:
+            return await super().scalars(*args, **kwargs)
+        finally:
+            await self._release()
+
+    async def get(self, *args, **kwargs):
+        try:
+            return await super().get(*args, **kwargs)
+        finally:
+            await self._release()
+
+
+def read_only_sessionmaker(bind) -> async_sessionmaker:
+    # postgresql_readonly makes asyncpg open its transactions as READ ONLY
+    return async_sessionmaker(
+        bind=bind.execution_options(postgresql_readonly=True),
+        class_=ReadOnlyAsyncSession, autoflush=False, expire_on_commit=False)
+
+
+AsyncReadSessionLocal = read_only_sessionmaker(async_engine)
+
+# Optional read replica. GET requests read from it unless the client wrote
+# recently (read-your-writes) or the replica failed its health check.
+if config.DB_REPLICA_HOST:
+    ASYNC_REPLICA_DATABASE_URL = (
+        f"postgresql+asyncpg://{config.DB_REPLICA_USER or config.DB_USER}:"
+        f"{(config.DB_REPLICA_PASS or config.DB_PASS).get_secret_value()}@"
+        f"{config.DB_REPLICA_HOST}:{config.DB_REPLICA_PORT or config.DB_PORT}/{config.DB_NAME}")
+    replica_engine = create_async_engine(
+        ASYNC_REPLICA_DATABASE_URL, echo=config.DB_ECHO, **POOL_OPTIONS)
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_engine, autoflush=False, expire_on_commit=False)
+    ReplicaReadSessionLocal = read_only_sessionmaker(replica_engine)
+else:
+    replica_engine = None
+    ReplicaSessionLocal = None
+    ReplicaReadSessionLocal = None
+
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+# unix time until which the client's reads go to the primary
+PRIMARY_COOKIE = "db_primary_until"
+
+
+class ReplicaHealth:
+    """Whether the replica should take reads.
+
+    The replica is checked with SELECT 1 at most every
+    DB_REPLICA_CHECK_SECONDS; a failed check or a connection error on the
+    replica takes it out of rotation for DB_REPLICA_RETRY_SECONDS.
+    """
+
+    def __init__(self, engine, check_timeout: float = 2.0):
+        self.engine = engine
+        self.check_timeout = check_timeout
+        self.down_until = 0.0
+        self.checked_at = 0.0
+        if engine is not None:
+            event.listen(engine.sync_engine, "handle_error", self._on_error)
+
+    def mark_down(self, reason: str):
+        self.down_until = time.monotonic() + config.DB_REPLICA_RETRY_SECONDS
+        logger.warning(f"Read replica unavailable, reading from primary: {reason}")
+
+    def _on_error(self, context):
+        if context.is_disconnect or isinstance(context.original_exception, OSError):
+            self.mark_down(str(context.original_exception))
+
+    async def available(self) -> bool:
+        if self.engine is None:
+            return False
+        now = time.monotonic()
+        if now < self.down_until:
+            return False
+        if now - self.checked_at >= config.DB_REPLICA_CHECK_SECONDS:
+            # set first so concurrent requests don't all run the check
+            self.checked_at = now
+            try:
+                async with self.engine.connect() as conn:
+                    await asyncio.wait_for(
+                        conn.execute(text("SELECT 1")), self.check_timeout)
+            except Exception as e:
+                self.mark_down(str(e) or type(e).__name__)
+                return False
+        return True
+
+
+replica_health = ReplicaHealth(replica_engine)
+
+
+def _wrote_recently(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def session_factory_for(request: Request, response: Response,
+                              read_only: bool = False) -> async_sessionmaker:
+    """Pick the primary or the replica for a request.
+
+    Anything that isn't a GET/HEAD/OPTIONS goes to the primary and sets a
+    short-lived cookie so the same client's reads follow it there until the
+    replica has caught up.
+    """
+    primary, replica = ((AsyncReadSessionLocal, ReplicaReadSessionLocal) if read_only
+                        else (AsyncSessionLocal, ReplicaSessionLocal))
+    if request.method not in READ_ONLY_METHODS:
+        if replica is not None:
+            response.set_cookie(
+                PRIMARY_COOKIE, str(int(time.time()) + config.DB_READ_YOUR_WRITES_SECONDS),
+                max_age=config.DB_READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax")
+        return primary
+    if replica is None or _wrote_recently(request):
+        return primary
+    if not await replica_health.available():
+        return primary
+    return replica
 
 
 def get_db()  -> Generator[Session, None, None]:
@@ -23,4 +195,23 @@ def get_db()  -> Generator[Session, None, None]:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db(request: Request, response: Response) -> AsyncGenerator[AsyncSession, None]:
+    session_factory = await session_factory_for(request, response)
+    async with session_factory() as db:
+        yield db
+
+
+async def get_async_read_db(request: Request, response: Response) -> AsyncGenerator[AsyncSession, None]:
+    """ReadOnlyAsyncSession for GET handlers that don't write"""
+    session_factory = await session_factory_for(request, response, read_only=True)
+    async with session_factory() as db:
+        yield db
+
+
+async def get_async_sessionmaker(request: Request, response: Response) -> async_sessionmaker:
+    """For handlers that manage session lifetime themselves, like streaming
+    responses that keep reading after the handler has returned."""
+    return await session_factory_for(request, response)
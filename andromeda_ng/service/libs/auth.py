@@ -86,6 +86,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
     return verify_access_token(token, credentials_exception)
 
 
+async def get_current_admin(current_user: TokenData = Depends(get_current_user)) -> TokenData:
+    if not current_user.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
+
+
 def create_password_reset_token(user_id: str) -> str:
     """
     Create a password reset token with longer expiration
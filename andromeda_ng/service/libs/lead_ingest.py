@@ -0,0 +1,259 @@
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from loguru import logger
+
+from andromeda_ng.service.crud import lead_service
+from andromeda_ng.service.settings import config
+
+""" Write-behind buffer for high-volume lead ingest """
+
+
+class IngestBufferFull(Exception):
+    """ Raised instead of buffering when the ingest buffer is full """
+
+    def __init__(self, retry_after: int):
+        super().__init__("Lead ingest buffer is full")
+        self.retry_after = retry_after
+
+
+def _encode(values: dict) -> str:
+    return json.dumps(values, default=str, separators=(",", ":"))
+
+
+def _decode(line: str) -> dict:
+    values = json.loads(line)
+    values["id"] = uuid.UUID(values["id"])
+    values["created_at"] = datetime.fromisoformat(values["created_at"])
+    return values
+
+
+class _Segment:
+    """One spill file, locked by the process writing it so another worker's
+    replay leaves it alone"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a+", encoding="utf-8")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.close()
+            raise
+        self.written = 0
+        self.synced = 0
+        self._lock = asyncio.Lock()
+
+    def append(self, values: dict) -> int:
+        self.file.write(_encode(values) + "\n")
+        self.file.flush()
+        self.written += 1
+        return self.written
+
+    def read(self) -> List[dict]:
+        self.file.seek(0)
+        leads = []
+        for number, line in enumerate(self.file, 1):
+            try:
+                leads.append(_decode(line))
+            except (ValueError, KeyError, TypeError) as e:
+                # a line cut short by the crash that left this segment behind
+                logger.warning(f"Skipping unreadable line {number} of {self.path}: {e}")
+        return leads
+
+    async def sync(self, upto: int):
+        """fsync until line `upto` is on disk; one fsync covers every line
+        written before it started, so concurrent requests share it"""
+        async with self._lock:
+            if self.synced >= upto or self.file.closed:
+                return
+            target = self.written
+            await asyncio.to_thread(os.fsync, self.file.fileno())
+            self.synced = target
+
+    async def remove(self):
+        async with self._lock:
+            self.file.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class LeadIngestBuffer:
+    """Accepts leads now and inserts them in batches shortly after.
+
+    submit() appends the lead to this process's spill segment (fsynced,
+    with concurrent requests sharing one fsync) and to an in-memory buffer;
+    once it returns the lead survives a crash. A flush runs every
+    flush_seconds, or as soon as batch_size leads are waiting, and writes
+    them as multi-row INSERT ... ON CONFLICT DO NOTHING of batch_size rows.
+    Each flush starts a new segment and deletes the old ones only once
+    everything in them is committed; a failed flush puts its leads back.
+    replay() at startup inserts whatever segments a stopped process left,
+    which is safe to repeat because every lead carries its id and
+    conflicts are skipped.
+
+    At most max_size leads are buffered or being flushed; beyond that
+    submit raises IngestBufferFull rather than letting memory grow while
+    the database is slow or down.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_seconds: float,
+                 spill_dir: Optional[str], fsync: bool = True, retry_after: int = 1):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.spill_dir = spill_dir
+        self.fsync = fsync
+        self.retry_after = retry_after
+        self._buffer: List[dict] = []
+        self._flushing = 0
+        self._segment: Optional[_Segment] = None
+        # rotated segments whose leads aren't all committed yet
+        self._retained: List[_Segment] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.accepted = 0
+        self.rejected = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.replayed = 0
+
+    def _open_segment(self) -> _Segment:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        return _Segment(os.path.join(
+            self.spill_dir, f"leads-{os.getpid()}-{time.time_ns()}.jsonl"))
+
+    async def submit(self, values: dict):
+        """Buffer one lead's column values, durably when a spill_dir is set"""
+        if len(self._buffer) + self._flushing >= self.max_size:
+            self.rejected += 1
+            raise IngestBufferFull(self.retry_after)
+        segment = None
+        if self.spill_dir:
+            if self._segment is None:
+                self._segment = self._open_segment()
+            segment = self._segment
+            line = segment.append(values)
+        # nothing awaits between the spill write and this append, so a
+        # flush's rotation always sees both or neither
+        self._buffer.append(values)
+        self.accepted += 1
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        if segment is not None and self.fsync:
+            await segment.sync(line)
+
+    async def flush(self, session_factory) -> int:
+        """Insert everything buffered, returns how many leads were new"""
+        async with self._flush_lock:
+            if not self._buffer:
+                # replayed segments with nothing readable left in them
+                for segment in self._retained:
+                    await segment.remove()
+                self._retained = []
+                return 0
+            leads, self._buffer = self._buffer, []
+            self._flushing = len(leads)
+            segments = self._retained + ([self._segment] if self._segment else [])
+            self._retained, self._segment = [], None
+            committed = inserted = 0
+            try:
+                async with session_factory() as db:
+                    for start in range(0, len(leads), self.batch_size):
+                        batch = leads[start:start + self.batch_size]
+                        inserted += await lead_service.insert_leads(db, batch)
+                        await db.commit()
+                        committed += len(batch)
+            except Exception as e:
+                logger.error(f"Error flushing {len(leads) - committed} ingested leads: {e}")
+                self.failed_flushes += 1
+                self._buffer[:0] = leads[committed:]
+                self._retained = segments
+                return inserted
+            finally:
+                self._flushing = 0
+                self.inserted += inserted
+                self.duplicates += committed - inserted
+            self.flushes += 1
+            for segment in segments:
+                await segment.remove()
+            logger.debug(f"Flushed {committed} ingested leads, {inserted} new")
+            return inserted
+
+    async def replay(self, session_factory) -> int:
+        """Insert the leads in segments left behind by stopped processes"""
+        if not self.spill_dir:
+            return 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "leads-*.jsonl"))):
+            if self._segment is not None and path == self._segment.path:
+                continue
+            try:
+                segment = _Segment(path)
+            except BlockingIOError:
+                # a live worker's segment
+                continue
+            leads = segment.read()
+            logger.info(f"Replaying {len(leads)} ingested leads from {path}")
+            self._buffer[:0] = leads
+            self._retained.append(segment)
+            self.replayed += len(leads)
+        return await self.flush(session_factory)
+
+    async def _run(self, session_factory):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush(session_factory)
+
+    async def start(self, session_factory):
+        """Replay leftovers and start flushing in the background"""
+        await self.replay(session_factory)
+        self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self, session_factory):
+        """Stop the background flush and flush what's left; anything that
+        can't be written stays in the spill segments for the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(session_factory)
+
+    def snapshot(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "flushing": self._flushing,
+            "max_size": self.max_size,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "replayed": self.replayed,
+            "spill_segments": len(self._retained) + (self._segment is not None),
+        }
+
+
+lead_ingest = LeadIngestBuffer(
+    config.LEAD_INGEST_MAX_BUFFER, config.LEAD_INGEST_BATCH_SIZE,
+    config.LEAD_INGEST_FLUSH_SECONDS, config.LEAD_INGEST_SPILL_DIR,
+    config.LEAD_INGEST_FSYNC, config.LEAD_INGEST_RETRY_AFTER)
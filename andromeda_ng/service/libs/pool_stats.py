@@ -0,0 +1,110 @@
+import time
+from threading import Lock
+
+from loguru import logger
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolStats:
+    """Counters for pool checkouts.
+
+    Waits only cover checkouts that found the pool at capacity and had to
+    queue for a connection; the time spent opening new connections is kept
+    separately so slow connects don't look like pool starvation.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.waits = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.connects = 0
+            self.total_connect = 0.0
+            self.max_connect = 0.0
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def record_connect(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.connects += 1
+            self.total_connect += seconds
+            self.max_connect = max(self.max_connect, seconds)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            avg_wait = self.total_wait / self.waits if self.waits else 0.0
+            avg_connect = self.total_connect / self.connects if self.connects else 0.0
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(avg_wait * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "connects": self.connects,
+                "avg_connect_ms": round(avg_connect * 1000, 3),
+                "max_connect_ms": round(self.max_connect * 1000, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkouts in pool_stats.
+
+    _do_get is QueuePool's internal checkout hook and not public API; this is
+    written against SQLAlchemy 2.0.x (QueuePool._pool, _overflow and
+    _max_overflow), re-check it when upgrading SQLAlchemy.
+    """
+
+    def _at_capacity(self) -> bool:
+        if self.checkedin() > 0 or self._max_overflow < 0:
+            return False
+        return self._overflow >= self._max_overflow
+
+    def _do_get(self):
+        if self.checkedin() > 0:
+            pool_stats.record_checkout()
+            return super()._do_get()
+
+        start = time.perf_counter()
+        if not self._at_capacity():
+            # room left in the pool, so this opens a new connection
+            connection = super()._do_get()
+            pool_stats.record_connect(time.perf_counter() - start)
+            return connection
+
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            logger.warning(
+                f"Connection pool exhausted: {self.checkedout()} checked out, overflow {self.overflow()}")
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        return connection
@@ -0,0 +1,133 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from andromeda_ng.service.settings import config
+
+
+class RequestQueryStats:
+    """SQL statements run while handling one request"""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_time += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        """METHOD and route template, once routing has matched one"""
+        if self.scope is None:
+            return None
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', self.scope['path'])}"
+
+    def repeated(self, threshold: int) -> list:
+        """Fingerprints run at least threshold times, most frequent first"""
+        return [(statement, count) for statement, count in self.fingerprints.most_common()
+                if count >= threshold]
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar(
+    "request_query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# placeholder lists from expanded IN clauses and multi-row VALUES
+_PLACEHOLDER_LISTS = re.compile(
+    r"\(\s*(\?|%\(\w+\)s)(\s*,\s*(\?|%\(\w+\)s))*\s*\)")
+_POSITIONAL = re.compile(r"\$\d+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement with literals and placeholder lists collapsed, so the same
+    query issued for different rows gets the same fingerprint"""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _POSITIONAL.sub("?", statement)
+    statement = _LITERALS.sub("?", statement)
+    return _PLACEHOLDER_LISTS.sub("(?)", statement)
+
+
+def current() -> Optional[RequestQueryStats]:
+    return _current.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    starts = conn.info.get("query_stats_start")
+    if stats is not None and starts:
+        stats.record(statement, time.perf_counter() - starts.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    starts = context.connection.info.get("query_stats_start") if context.connection else None
+    if starts:
+        starts.pop()
+
+
+class QueryStatsMiddleware:
+    """Counts the SQL each request runs.
+
+    Adds a Server-Timing `db` entry and X-DB-Query-Count to the response,
+    logs the totals as structured fields and warns when one statement
+    fingerprint repeats QUERY_REPEAT_WARN_THRESHOLD times or more, which is
+    what an N+1 lazy load looks like. Queries run while a streaming body is
+    being sent land in the log line but not in the headers.
+    """
+
+    def __init__(self, app, threshold: Optional[int] = None):
+        self.app = app
+        self.threshold = threshold or config.QUERY_REPEAT_WARN_THRESHOLD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestQueryStats(scope)
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", (
+                    f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries"').encode()))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            self._log(stats, time.perf_counter() - started)
+
+    def _log(self, stats: RequestQueryStats, elapsed: float):
+        endpoint = stats.endpoint
+        log = logger.bind(endpoint=endpoint, db_queries=stats.count,
+                          db_time_ms=round(stats.total_time * 1000, 3),
+                          request_time_ms=round(elapsed * 1000, 3))
+        log.debug(f"{endpoint}: {stats.count} queries in {stats.total_time * 1000:.1f} ms")
+        for statement, count in stats.repeated(self.threshold):
+            log.bind(repeated_statement=statement, repeats=count).warning(
+                f"Possible N+1 in {endpoint}: statement ran {count} times: {statement[:200]}")
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timezone
+from threading import Lock
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.util import greenlet_spawn
+
+from andromeda_ng.service.libs import query_stats
+from andromeda_ng.service.settings import config
+
+# statements EXPLAIN is run for; others could have side effects or no plan
+_EXPLAINABLE = ("select", "with")
+
+
+def parameter_shape(parameters):
+    """Types of the bind parameters, never their values"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one shape plus the number of parameter sets
+            return {"rows": len(parameters), "shape": parameter_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+class SlowQueryLog:
+    """Statements slower than SLOW_QUERY_THRESHOLD_MS.
+
+    The most recent `size` entries are kept in a ring buffer. With
+    SLOW_QUERY_EXPLAIN on, the plan of slow SELECTs is captured afterwards
+    on a separate connection and attached to the entry.
+    """
+
+    def __init__(self, size: int, threshold_ms: float, explain: bool = False):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self._entries = deque(maxlen=size)
+        self._lock = Lock()
+        self._explains = set()
+
+    def record(self, conn, statement: str, parameters, duration_ms: float) -> dict:
+        stats = query_stats.current()
+        entry = {
+            "sql": query_stats.fingerprint(statement),
+            "duration_ms": round(duration_ms, 3),
+            "parameters": parameter_shape(parameters),
+            "endpoint": stats.endpoint if stats else None,
+            "at": datetime.now(timezone.utc).isoformat(),
+            "plan": None,
+        }
+        with self._lock:
+            self._entries.append(entry)
+        logger.bind(slow_query=entry["sql"], db_time_ms=entry["duration_ms"],
+                    endpoint=entry["endpoint"], parameters=entry["parameters"]).warning(
+            f"Slow query ({entry['duration_ms']:.1f} ms) from {entry['endpoint']}: {entry['sql'][:200]}")
+        if self.explain and statement.lstrip().lower().startswith(_EXPLAINABLE):
+            self._schedule_explain(conn.engine, entry, statement, parameters)
+        return entry
+
+    def _schedule_explain(self, engine: Engine, entry: dict, statement: str, parameters):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # the blocking engine outside any event loop, e.g. migrations
+            return
+        task = loop.create_task(greenlet_spawn(
+            self._explain, engine, entry, statement, parameters))
+        # keep a reference so the task isn't garbage collected mid-flight
+        self._explains.add(task)
+        task.add_done_callback(self._explains.discard)
+
+    def _explain(self, engine: Engine, entry: dict, statement: str, parameters):
+        if engine.dialect.name == "postgresql":
+            prefix = "EXPLAIN (ANALYZE off) "
+        elif engine.dialect.name == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        else:
+            return
+        try:
+            with engine.connect() as conn:
+                rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+            entry["plan"] = "\n".join(
+                str(row[-1]) for row in rows)
+        except Exception as e:
+            logger.error(f"Error explaining slow query: {e}")
+
+    def entries(self, limit: int = 20, order: str = "duration") -> list:
+        with self._lock:
+            entries = list(self._entries)
+        if order == "duration":
+            entries.sort(key=lambda entry: entry["duration_ms"], reverse=True)
+        else:
+            entries.reverse()
+        return entries[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(
+    config.SLOW_QUERY_BUFFER_SIZE, config.SLOW_QUERY_THRESHOLD_MS,
+    config.SLOW_QUERY_EXPLAIN)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("slow_query_start")
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    # our own EXPLAINs are not worth logging
+    if duration_ms >= slow_query_log.threshold_ms and not statement.startswith("EXPLAIN "):
+        slow_query_log.record(conn, statement, parameters, duration_ms)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    starts = context.connection.info.get("slow_query_start") if context.connection else None
+    if starts:
+        starts.pop()
@@ -1,30 +1,85 @@
-from zammad_py import ZammadAPI
+import importlib.util
+from typing import List, Optional, Union
+
 import httpx
-import json
 from loguru import logger
 from andromeda_ng.service.settings import config
 from andromeda_ng.service.schema import ZammadCompany
+from andromeda_ng.service.utils.cache import TTLCache
 
 url = config.ZAMMAD_URL
 oath_token = config.ZAMMAD_TOKEN
 headers = {
-    "Authorization": f"Bearer {oath_token}",
+    "Authorization": f"Bearer {oath_token.get_secret_value() if oath_token else ''}",
     "Content-Type": "application/json"}
-client = ZammadAPI(url, oath_token)
+
+# One AsyncClient per worker so calls share keep-alive connections. HTTP/2 is
+# only negotiated when the optional h2 package (httpx[http2]) is installed.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_client: Optional[httpx.AsyncClient] = None
+
+# ticket summaries by organization id, served stale while they refresh
+ticket_cache = TTLCache(
+    "zammad_tickets",
+    ttl=config.ZAMMAD_TICKET_CACHE_TTL,
+    stale_ttl=config.ZAMMAD_TICKET_CACHE_STALE_TTL,
+    max_entries=config.ZAMMAD_TICKET_CACHE_SIZE)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared Zammad client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        configure_client()
+    return _client
+
+
+def configure_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """(Re)create the shared client; tests pass a transport to talk to a stand-in server"""
+    global _client
+    _client = httpx.AsyncClient(
+        base_url=f"{url}/api/v1",
+        headers=headers,
+        timeout=httpx.Timeout(config.ZAMMAD_TIMEOUT),
+        limits=httpx.Limits(max_connections=config.ZAMMAD_MAX_CONNECTIONS,
+                            max_keepalive_connections=config.ZAMMAD_MAX_CONNECTIONS),
+        http2=HTTP2_AVAILABLE and transport is None,
+        transport=transport,
+    )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client's connections, called on app shutdown"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _search_tickets(query: str, timeout: Optional[float] = None) -> List[dict]:
+    response = await get_client().get(
+        "/tickets/search",
+        params={"query": query, "expand": "true"},
+        timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+    response.raise_for_status()
+    return response.json()
 
 
-async def create_organization(company: ZammadCompany) -> dict:
+async def create_organization(company: Union[ZammadCompany, dict], timeout: Optional[float] = None) -> dict:
     """Create a new customer in Zammad"""
     try:
-        logger.info(f"Creating customer {company.name}")
         # Convert Pydantic model to dict for Zammad API
-        company_data = company.model_dump()
-        # Use ZammadAPI client to create organization
-        result = client.organization.create(
-            params=company_data
-        )
+        company_data = company.model_dump() if isinstance(
+            company, ZammadCompany) else company
+        logger.info(f"Creating customer {company_data['name']}")
+        response = await get_client().post(
+            "/organizations", json=company_data,
+            timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+        response.raise_for_status()
+        result = response.json()
         if result:
-            logger.info(f"Customer {company.name} created successfully")
+            logger.info(f"Customer {company_data['name']} created successfully")
             return result
         return None
     except Exception as e:  # pragma: no cover
@@ -32,39 +87,53 @@ async def create_organization(company: ZammadCompany) -> dict:
         return None
 
 
-async def get_company_tickets(company_id: int) -> dict:
-    """Get all tickets for a company using Zammad API"""
+# the ticket fields the customer page shows
+TICKET_FIELDS = ("id", "title", "number", "state",
+                 "priority", "created_at", "updated_at")
+_open_states = {state.lower() for state in config.ZAMMAD_OPEN_STATES}
+
+
+def _is_open(ticket: dict) -> bool:
+    state = ticket.get("state")
+    return isinstance(state, str) and state.lower() in _open_states
+
+
+async def get_company_tickets(company_id: int, timeout: Optional[float] = None) -> dict:
+    """Get a ticket summary for a company in a single Zammad search.
+
+    The open count is worked out locally from ZAMMAD_OPEN_STATES and only
+    TICKET_FIELDS are kept from each ticket. A company without tickets gets
+    an empty summary; None means Zammad could not be reached.
+    """
     try:
         logger.info(f"Getting tickets for company {company_id}")
-        # Get all tickets
-        tickets = client.ticket.search({
-            "organization_id": company_id
-        })
-
-        # Get open tickets (state not 'closed' or 'resolved')
-        open_tickets = client.ticket.search({
-            "organization_id": company_id,
-            "state_id": [1, 2, 3]  # Typically open, pending states
-        })
-
-        if tickets:
-            logger.info(
-                f"Found {len(tickets)} tickets for company {company_id}")
-            return {
-                "all_tickets": tickets,
-                "open_count": len(open_tickets) if open_tickets else 0,
-                "total_count": len(tickets),
-                "ticket_url": f"{url}/api/v1/tickets?expand=true&organization_id={company_id}"
-            }
-        else:
-            logger.error("No tickets found")
-            return None
+        # expand=true returns state and priority as names rather than ids
+        tickets = await _search_tickets(
+            f"organization_id:{company_id}", timeout) or []
+        logger.info(f"Found {len(tickets)} tickets for company {company_id}")
+        return {
+            "all_tickets": [{field: ticket.get(field) for field in TICKET_FIELDS}
+                            for ticket in tickets],
+            "open_count": sum(1 for ticket in tickets if _is_open(ticket)),
+            "total_count": len(tickets),
+            "ticket_url": f"{url}/api/v1/tickets?expand=true&organization_id={company_id}"
+        }
     except Exception as e:
         logger.error(f"Error getting tickets: {e}")
         return None
 
 
-async def create_user(user: dict, zammad_id: int) -> dict:
+async def get_cached_company_tickets(company_id: int) -> dict:
+    """get_company_tickets through ticket_cache, only waits on Zammad for cold entries"""
+    try:
+        return await ticket_cache.get_or_load(
+            company_id, lambda: get_company_tickets(company_id))
+    except Exception as e:
+        logger.error(f"Error getting cached tickets: {e}")
+        return None
+
+
+async def create_user(user: dict, zammad_id: int, timeout: Optional[float] = None) -> dict:
     """Create a new user in Zammad
     Parameters for user creation:
     - login: str(email address)
@@ -79,11 +148,10 @@ async def create_user(user: dict, zammad_id: int) -> dict:
 """
     try:
         logger.info(f"Creating user {user['email']}")
-        # Use ZammadAPI client to create user
-
-        result = client.user.create(
-            params=user
-        )
+        response = await get_client().post(
+            "/users", json=user, timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+        response.raise_for_status()
+        result = response.json()
         if result:
             logger.info(f"User {user['email']} created successfully")
             return result
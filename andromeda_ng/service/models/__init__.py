@@ -2,3 +2,6 @@ from .leads import Lead
 from .customer import Customer, Contact
 from .note import Note
 from .user import User
+from .ticket import Ticket
+from .dedupe import DedupeKey
+from .lead_import import LeadImportJob, LeadImportError
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, UUID, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, UUID, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from andromeda_ng.service.base import Base
@@ -8,35 +8,54 @@ import uuid
 class Customer(Base):
     __tablename__ = "customers"
 
-    id = Column(UUID(as_uuid=True), primary_key=True,
-                index=True, default=uuid.uuid4)
-    customer_name = Column(String, nullable=False, index=True)
-    customer_phone = Column(String, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    customer_name = Column(String, nullable=False)
+    customer_phone = Column(String, nullable=False)
     customer_street = Column(String, nullable=False)
     customer_city = Column(String, nullable=False)
     customer_state = Column(String, nullable=False)
     customer_postal = Column(String, nullable=False)
-    customer_website = Column(String, index=True)
+    customer_website = Column(String)
     is_active = Column(Boolean, default=True)
-    children = relationship("Contact", back_populates="customer")
-    notes = relationship("Note", back_populates="customer")
+    # contacts and notes are removed by ON DELETE CASCADE in the database,
+    # passive_deletes keeps the ORM from loading them first
+    children = relationship("Contact", back_populates="customer", passive_deletes=True)
+    notes = relationship("Note", back_populates="customer", passive_deletes=True)
     zammad_id = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # names are unique regardless of case; create_customer upserts against it
+    __table_args__ = (
+        Index("ux_customers_lower_customer_name", func.lower(customer_name), unique=True),
+        # the unique index can't serve LIKE 'prefix%' under a non-C collation,
+        # text_pattern_ops can; used by the autocomplete
+        Index("ix_customers_lower_customer_name_pattern",
+              func.lower(customer_name).label("lower_customer_name"),
+              postgresql_ops={"lower_customer_name": "text_pattern_ops"}),
+    )
 
 
 class Contact(Base):
     __tablename__ = "contacts"
 
-    id = Column(UUID(as_uuid=True), primary_key=True,
-                index=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     contact_first_name = Column(String, nullable=False)
     contact_last_name = Column(String, nullable=False)
-    contact_email = Column(String, nullable=False, index=True)
-    customer_id = Column(UUID(as_uuid=True), ForeignKey('customers.id'))
+    contact_email = Column(String, nullable=False)
+    # postgres doesn't index foreign keys by itself; customer detail loads
+    # and the cascade delete both look contacts up by customer
+    customer_id = Column(UUID(as_uuid=True), ForeignKey('customers.id', ondelete="CASCADE"),
+                         index=True)
     customer = relationship("Customer", back_populates="children")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        Index("ux_contacts_lower_contact_email", func.lower(contact_email), unique=True),
+    )
 
     def customer_name(self):
         return self.customer.customer_name if self.customer else None
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, UUID, String, DateTime, Index
+from sqlalchemy.sql import func
+from andromeda_ng.service.base import Base
+
+
+class DedupeKey(Base):
+    """Blocking keys for duplicate detection.
+
+    One row per normalized email, domain, phone or company name of a lead,
+    customer or contact (see utils/normalize.py). Only rows sharing a
+    (kind, value) are ever compared, so finding the candidates for a lead
+    is a few index lookups however many leads there are. indexed_at is
+    when the entity's keys were last rebuilt.
+    """
+    __tablename__ = "dedupe_keys"
+    __table_args__ = (
+        Index("ix_dedupe_keys_kind_value", "kind", "value"),
+    )
+
+    entity_type = Column(String, primary_key=True)
+    entity_id = Column(UUID(as_uuid=True), primary_key=True)
+    kind = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, UUID, BigInteger, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from andromeda_ng.service.base import Base
+import uuid
+
+
+class LeadImportJob(Base):
+    """One POST /leads/import upload and how far loading it has got.
+
+    The counters are written in the same transaction as each chunk of
+    leads, so they always agree with what is in the leads table.
+    """
+    __tablename__ = "lead_import_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # queued, running, succeeded or failed
+    status = Column(String, nullable=False, default="queued")
+    format = Column(String, nullable=False)
+    filename = Column(String)
+    on_conflict = Column(String, nullable=False)
+    bytes_total = Column(BigInteger, nullable=False, default=0)
+    bytes_read = Column(BigInteger, nullable=False, default=0)
+    rows_read = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    duplicates = Column(Integer, nullable=False, default=0)
+    invalid = Column(Integer, nullable=False, default=0)
+    # row errors found, the first IMPORT_MAX_ROW_ERRORS are in lead_import_errors
+    errors = Column(Integer, nullable=False, default=0)
+    # why a failed job stopped
+    error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    @property
+    def progress(self) -> float:
+        if self.status == "succeeded":
+            return 1.0
+        return round(self.bytes_read / self.bytes_total, 4) if self.bytes_total else 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        if not self.started_at:
+            return 0.0
+        finished_at = self.finished_at or datetime.now(timezone.utc)
+        started_at = self.started_at
+        if started_at.tzinfo is None:
+            # sqlite hands timestamps back naive
+            started_at = started_at.replace(tzinfo=timezone.utc)
+            finished_at = finished_at.replace(tzinfo=timezone.utc)
+        seconds = (finished_at - started_at).total_seconds()
+        return round(self.rows_read / seconds, 1) if seconds > 0 else 0.0
+
+
+class LeadImportError(Base):
+    """A row of an import that wasn't loaded, by its 1-based record number"""
+    __tablename__ = "lead_import_errors"
+
+    job_id = Column(UUID(as_uuid=True), ForeignKey("lead_import_jobs.id", ondelete="CASCADE"),
+                    primary_key=True)
+    row = Column(Integer, primary_key=True)
+    error = Column(String, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, UUID, String, Boolean, DateTime
+from sqlalchemy import Column, UUID, Float, Integer, String, Boolean, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy import Enum as SQLAlchemyEnum
 from andromeda_ng.service.base import Base
@@ -16,16 +16,38 @@ import uuid
 class Lead(Base):
     __tablename__ = "leads"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
-    lead_first_name = Column(String, nullable=False, index=True)
-    lead_last_name = Column(String, nullable=False, index=True)
-    lead_email = Column(String, nullable=False, index=True)
-    lead_phone = Column(String, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    lead_first_name = Column(String, nullable=False)
+    lead_last_name = Column(String, nullable=False)
+    lead_email = Column(String, nullable=False)
+    lead_phone = Column(String, nullable=False)
     lead_message = Column(String)
-    lead_company = Column(String, nullable=False, index=True)
-    lead_website = Column(String, index=True)
-    lead_status = Column(String, default="New", index=True)
+    lead_company = Column(String, nullable=False)
+    lead_website = Column(String)
+    lead_status = Column(String, default="New")
     lead_converted = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True),
+                        server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    
\ No newline at end of file
+    # bumped by every update, checked against If-Match
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # conversion likelihood 0-100 written by lead_scoring_service; 0 until
+    # the lead is first scored
+    lead_score = Column(Float, nullable=False, default=0.0, server_default="0")
+
+    # keyset pagination walks leads by (created_at, id), optionally within one
+    # value of a read_leads equality filter; every index costs lead ingest, so
+    # columns nothing filters or sorts on have none
+    __table_args__ = (
+        Index("ix_leads_created_at_id", "created_at", "id"),
+        Index("ix_leads_lead_status_created_at_id",
+              "lead_status", "created_at", "id"),
+        Index("ix_leads_lead_converted_created_at_id",
+              "lead_converted", "created_at", "id"),
+        Index("ix_leads_lead_company_created_at_id",
+              "lead_company", "created_at", "id"),
+        # read_leads(sort="score") pages by (lead_score, id)
+        Index("ix_leads_lead_score_id", "lead_score", "id"),
+        # one lead per email, whatever the case; create_lead upserts against it
+        Index("ux_leads_lower_lead_email", func.lower(lead_email), unique=True),
+    )
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from andromeda_ng.service.base import Base
+
+
+class Ticket(Base):
+    """Local mirror of Zammad tickets, kept current by the Zammad webhook.
+
+    id is the Zammad ticket id and organization_id the Zammad organization,
+    which is what Customer.zammad_id holds. created_at/updated_at are
+    Zammad's timestamps; synced_at is when the webhook last wrote the row.
+    """
+    __tablename__ = "tickets"
+    __table_args__ = (
+        # open/total counts per organization
+        Index("ix_tickets_organization_id_state", "organization_id", "state"),
+        # most recently updated tickets per organization
+        Index("ix_tickets_organization_id_updated_at",
+              "organization_id", "updated_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    organization_id = Column(Integer, nullable=True)
+    number = Column(String, nullable=True)
+    title = Column(String, nullable=True)
+    state = Column(String, nullable=True)
+    priority = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=True)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(),
+                       onupdate=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, UUID, String, DateTime,  Boolean
+from sqlalchemy import Column, UUID, Integer, String, DateTime,  Boolean
 from sqlalchemy.sql import func
 from andromeda_ng.service.base import Base
 import uuid
@@ -6,8 +6,7 @@ import uuid
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(UUID(as_uuid=True), primary_key=True,
-                index=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     first_name = Column(String)
@@ -18,3 +17,4 @@ class User(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(),
                         onupdate=func.now())
+    version = Column(Integer, nullable=False, default=1, server_default="1")
@@ -1,8 +1,9 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 from enum import Enum
+from andromeda_ng.service.utils.emails import validate_email_cached
 
 
 # 1️⃣ ENUM DEFINITION
@@ -35,6 +36,30 @@ class LeadSchema(BaseModel):
         from_attributes = True
 
 
+class LeadImportRow(LeadSchema):
+    """LeadSchema for a row of a bulk import; the email is checked with
+    validate_email_cached, which accepts and normalizes exactly what EmailStr does"""
+    lead_email: str
+
+    @field_validator("lead_email")
+    @classmethod
+    def check_email(cls, value: str) -> str:
+        return validate_email_cached(value)
+
+
+class LeadPatch(BaseModel):
+    """Partial lead update, only the fields sent are written"""
+    lead_first_name: Optional[str] = None
+    lead_last_name: Optional[str] = None
+    lead_email: Optional[EmailStr] = None
+    lead_phone: Optional[str] = None
+    lead_message: Optional[str] = None
+    lead_company: Optional[str] = None
+    lead_website: Optional[str] = None
+    lead_status: Optional[str] = None
+    lead_converted: Optional[bool] = None
+
+
 class ContactSchema(BaseModel):
     contact_first_name: str
     contact_last_name: str
@@ -45,6 +70,13 @@ class ContactSchema(BaseModel):
         from_attributes = True
 
 
+class ContactPatch(BaseModel):
+    contact_first_name: Optional[str] = None
+    contact_last_name: Optional[str] = None
+    contact_email: Optional[EmailStr] = None
+    customer_id: Optional[UUID] = None
+
+
 class CustomerSchema(BaseModel):
     customer_name: str
     customer_phone: str
@@ -59,6 +91,17 @@ class CustomerSchema(BaseModel):
         from_attributes = True
 
 
+class CustomerPatch(BaseModel):
+    customer_name: Optional[str] = None
+    customer_phone: Optional[str] = None
+    customer_street: Optional[str] = None
+    customer_city: Optional[str] = None
+    customer_state: Optional[str] = None
+    customer_postal: Optional[str] = None
+    customer_website: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
 class CustomerOutput(BaseModel):
     id: UUID
     customer_name: str
@@ -71,9 +114,10 @@ class CustomerOutput(BaseModel):
     is_active: bool
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: Optional[int] = None
     children: Optional[List["ContactOutput"]] = None
     notes: Optional[List["NoteOutput"]] = None
-    customer_tickets: Optional[dict] = None
+    customer_tickets: Optional[List[dict]] = None
     ticket_count: Optional[int] = None
     open_tickets: Optional[int] = None
     ticket_url: Optional[str] = None
@@ -82,6 +126,16 @@ class CustomerOutput(BaseModel):
         from_attributes = True
 
 
+class CustomerStats(BaseModel):
+    total_customers: int
+    active_customers: int
+    inactive_customers: int
+    total_contacts: int
+    total_notes: int
+    contacts_per_customer: float
+    notes_per_customer: float
+
+
 class ContactOutput(BaseModel):
     id: UUID
     contact_first_name: str
@@ -91,6 +145,7 @@ class ContactOutput(BaseModel):
     customer: Optional[CustomerBasic] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -109,11 +164,73 @@ class LeadOutput(BaseModel):
     lead_converted: bool
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+    lead_score: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DuplicateCandidate(BaseModel):
+    type: str
+    id: UUID
+    score: float
+    matched: List[str]
+    name: str
+    email: Optional[str] = None
+
+
+class LeadImportJobOutput(BaseModel):
+    id: UUID
+    status: str
+    format: str
+    filename: Optional[str] = None
+    on_conflict: str
+    progress: float
+    bytes_total: int
+    bytes_read: int
+    rows_read: int
+    inserted: int
+    updated: int
+    duplicates: int
+    invalid: int
+    errors: int
+    error: Optional[str] = None
+    rows_per_second: float
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class LeadImportRowError(BaseModel):
+    row: int
+    error: str
 
     class Config:
         from_attributes = True
 
 
+class LeadPage(BaseModel):
+    items: List[LeadOutput]
+    next_cursor: Optional[str] = None
+
+
+class SearchHit(BaseModel):
+    type: str
+    id: UUID
+    title: str
+    subtitle: Optional[str] = None
+    rank: float
+
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+
 class NoteSchema(BaseModel):
     note_title: str
     note_content: str
@@ -123,12 +240,19 @@ class NoteSchema(BaseModel):
         from_attributes = True
 
 
+class NotePatch(BaseModel):
+    note_title: Optional[str] = None
+    note_content: Optional[str] = None
+    customer_id: Optional[UUID] = None
+
+
 class NoteOutput(BaseModel):
     id: UUID
     note_title: str
     note_content: str
     customer_id: UUID
     created_at: datetime
+    version: Optional[int] = None
 
 
 ### User Schema ###
@@ -145,6 +269,16 @@ class UserSchema(BaseModel):
         from_attributes = True
 
 
+class UserPatch(BaseModel):
+    username: Optional[str] = None
+    email: Optional[EmailStr] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    password: Optional[str] = None
+    admin: Optional[bool] = None
+    is_active: Optional[bool] = None
+
+
 class UserOutput(BaseModel):
     id: UUID
     username: str
@@ -155,6 +289,7 @@ class UserOutput(BaseModel):
     is_active: bool
     created_at: datetime
     updated_at: datetime
+    version: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import SecretStr
 
@@ -14,11 +14,40 @@ class Settings(BaseSettings):
     DB_PASS: SecretStr
     DB_NAME: str
     DB_PORT: Optional[int] = 5432
+    # optional read replica for GET requests; user, password and port
+    # default to the primary's
+    DB_REPLICA_HOST: Optional[str] = None
+    DB_REPLICA_PORT: Optional[int] = None
+    DB_REPLICA_USER: Optional[str] = None
+    DB_REPLICA_PASS: Optional[SecretStr] = None
+    # GETs from a client that wrote within this many seconds read the primary
+    DB_READ_YOUR_WRITES_SECONDS: int = 5
+    # how often the replica is health checked, and how long it is skipped after failing
+    DB_REPLICA_CHECK_SECONDS: int = 10
+    DB_REPLICA_RETRY_SECONDS: int = 30
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # warn when one statement repeats this often in a request (likely N+1)
+    QUERY_REPEAT_WARN_THRESHOLD: int = 10
+    # statements at least this slow go to the slow query log
+    SLOW_QUERY_THRESHOLD_MS: float = 500.0
+    SLOW_QUERY_BUFFER_SIZE: int = 100
+    # capture EXPLAIN plans of slow SELECTs on a separate connection
+    SLOW_QUERY_EXPLAIN: bool = False
     SECRET_KEY: SecretStr
     ACCESS_TOKEN_EXPIRATION_MINUTES: int = 30
     ALGORITHM: str = "HS256"
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_SECRET_KEY: SecretStr
+    # bcrypt runs in its own thread pool: worker threads, waiting slots beyond
+    # them, and the Retry-After seconds sent when both are full
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE: int = 32
+    PASSWORD_HASH_RETRY_AFTER: int = 1
 
     MAIL_USERNAME: Optional[str] = None
     MAIL_PASSWORD: Optional[SecretStr] = None
@@ -28,10 +57,61 @@ class Settings(BaseSettings):
     MAIL_FROM: Optional[str] = None
     MAIL_CREDENTIALS: Optional[bool] = True
     FRONTEND_URL: Optional[str] = None
+    CUSTOMER_STATS_CACHE_TTL: int = 30
+    # per-worker cache of customer autocomplete results by prefix
+    AUTOCOMPLETE_CACHE_TTL: int = 30
+    AUTOCOMPLETE_CACHE_SIZE: int = 2048
+    # duplicate detection: rows rekeyed per transaction, blocking keys shared
+    # by more rows than DEDUPE_MAX_BLOCK_SIZE are ignored, and
+    # DEDUPE_INTERVAL_SECONDS > 0 rekeys new and changed rows in the background
+    DEDUPE_BATCH_SIZE: int = 1000
+    DEDUPE_MAX_BLOCK_SIZE: int = 1000
+    DEDUPE_MIN_SCORE: float = 0.5
+    DEDUPE_INTERVAL_SECONDS: int = 0
+    # lead scoring: leads read per batch and rows per UPDATE ... FROM (VALUES
+    # ...) statement; LEAD_SCORE_INTERVAL_SECONDS > 0 rescores in the background
+    LEAD_SCORE_BATCH_SIZE: int = 50000
+    LEAD_SCORE_WRITE_SIZE: int = 5000
+    LEAD_SCORE_INTERVAL_SECONDS: int = 0
+    # POST /leads/ingest: leads buffered per worker before 503s, rows per
+    # multi-row insert, seconds between flushes, and where accepted leads
+    # are spilled (None keeps them in memory only) until they're inserted
+    LEAD_INGEST_MAX_BUFFER: int = 10000
+    LEAD_INGEST_BATCH_SIZE: int = 500
+    LEAD_INGEST_FLUSH_SECONDS: float = 1.0
+    LEAD_INGEST_SPILL_DIR: Optional[str] = "spill/lead_ingest"
+    LEAD_INGEST_FSYNC: bool = True
+    LEAD_INGEST_RETRY_AFTER: int = 1
+    # POST /leads/import: largest upload accepted, where it waits while being
+    # loaded (None for the system temp dir), rows validated and copied per
+    # transaction, row errors kept per job and imports run at once per worker
+    IMPORT_MAX_BYTES: int = 1024 * 1024 * 1024
+    IMPORT_TMP_DIR: Optional[str] = None
+    IMPORT_CHUNK_SIZE: int = 20000
+    IMPORT_MAX_ROW_ERRORS: int = 1000
+    IMPORT_MAX_CONCURRENT: int = 2
+    # statement_timeout for GET /search, over it the request fails with 504
+    SEARCH_TIMEOUT_MS: int = 300
+    # what creating a duplicate lead/contact/customer does: reject, ignore or merge
+    LEAD_CONFLICT_POLICY: str = "reject"
+    CONTACT_CONFLICT_POLICY: str = "reject"
+    CUSTOMER_CONFLICT_POLICY: str = "reject"
 
     # Zammad settings
     ZAMMAD_URL: Optional[str] = None
     ZAMMAD_TOKEN: Optional[SecretStr] = None
+    ZAMMAD_TIMEOUT: float = 10.0
+    ZAMMAD_MAX_CONNECTIONS: int = 20
+    ZAMMAD_TICKET_CACHE_TTL: int = 60
+    ZAMMAD_TICKET_CACHE_STALE_TTL: int = 600
+    ZAMMAD_TICKET_CACHE_SIZE: int = 1000
+    # state names counted as open in ticket summaries
+    ZAMMAD_OPEN_STATES: List[str] = [
+        "new", "open", "pending reminder", "pending close"]
+    # HMAC secret configured on the Zammad webhook (X-Hub-Signature)
+    ZAMMAD_WEBHOOK_SECRET: Optional[SecretStr] = None
+    # read customer tickets from the webhook-fed tickets table instead of Zammad
+    ZAMMAD_TICKET_MIRROR: bool = False
 
     # testing settings
     TEST_DB_HOST: Optional[str]
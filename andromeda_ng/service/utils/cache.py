@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from loguru import logger
+
+""" In-process caches, one set per worker """
+
+# every cache by name, for the admin stats endpoint
+caches: Dict[str, "TTLCache"] = {}
+
+
+class _Entry:
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class TTLCache:
+    """LRU cache with a per-entry TTL and stale-while-revalidate.
+
+    Entries are fresh for `ttl` seconds. After that, and for up to
+    `stale_ttl` more seconds, get_or_load still returns the cached value
+    straight away and reloads it in the background. Entries older than
+    that are reloaded before returning. Concurrent loads of the same key
+    share one loader call.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int, stale_ttl: float = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self._refreshing: set = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_errors = 0
+        caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """ Return a fresh cached value or None, without loading """
+        entry = self._entries.get(key)
+        if entry is None or self._clock() >= entry.fresh_until:
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = self._clock()
+        self._entries[key] = _Entry(
+            value, now + self.ttl, now + self.ttl + self.stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """ Drop one key, or everything when no key is given """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """ Return the cached value for key, calling loader when it is missing or too old.
+
+        A loader result of None is returned but not cached.
+        """
+        entry = self._entries.get(key)
+        now = self._clock()
+        if entry is not None and now < entry.fresh_until:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.value
+        if entry is not None and now < entry.stale_until:
+            self.stale_hits += 1
+            self._entries.move_to_end(key)
+            if key not in self._loading:
+                task = asyncio.create_task(self._refresh(key, loader))
+                # keep a reference so the refresh isn't garbage collected mid-flight
+                self._refreshing.add(task)
+                task.add_done_callback(self._refreshing.discard)
+            return entry.value
+        self.misses += 1
+        return await self._load(key, loader)
+
+    async def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await self._load(key, loader)
+        except Exception:
+            # already logged and counted; the stale value stays until it expires
+            pass
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if key in self._loading:
+            return await asyncio.shield(self._loading[key])
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+            if value is not None:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            self.load_errors += 1
+            logger.error(f"Error loading {self.name} cache entry {key}: {e}")
+            future.set_exception(e)
+            # mark the exception retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "load_errors": self.load_errors,
+        }
@@ -0,0 +1,12 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+""" Dialect specific statement builders """
+
+
+def insert_for(db: AsyncSession, table):
+    """insert() for the session's dialect, so ON CONFLICT clauses work on
+    Postgres and on the SQLite test database"""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
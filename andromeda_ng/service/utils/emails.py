@@ -0,0 +1,38 @@
+import re
+
+from pydantic.networks import validate_email
+
+""" Email validation for bulk input """
+
+# a subset of what EmailStr accepts: an ASCII dot-atom local part at an
+# ASCII domain; the domain still has to pass email-validator once
+_SIMPLE_EMAIL = re.compile(
+    r"^[A-Za-z0-9_%+-]+(?:\.[A-Za-z0-9_%+-]+)*@((?:[A-Za-z0-9-]+\.)+[A-Za-z0-9-]+)$")
+MAX_LOCAL_LENGTH = 64
+MAX_EMAIL_LENGTH = 254
+MAX_CACHED_DOMAINS = 100_000
+# domain as written, lowercased -> as EmailStr normalizes it
+_valid_domains = {}
+
+
+def validate_email_cached(value: str) -> str:
+    """The address EmailStr would give for value, checking each domain once.
+
+    email-validator spends nearly all its time on the domain (IDNA rules,
+    reserved names), which is the same for every address at it. Addresses
+    of the simple form at a domain already accepted skip straight through;
+    anything else, including the first address at each domain, goes through
+    the validator EmailStr uses and raises its errors.
+    """
+    match = _SIMPLE_EMAIL.match(value)
+    if match:
+        domain = match.group(1).lower()
+        at = match.start(1) - 1
+        if domain in _valid_domains and at <= MAX_LOCAL_LENGTH and len(value) <= MAX_EMAIL_LENGTH:
+            return f"{value[:at]}@{_valid_domains[domain]}"
+    email = validate_email(value)[1]
+    if match:
+        if len(_valid_domains) >= MAX_CACHED_DOMAINS:
+            _valid_domains.clear()
+        _valid_domains[domain] = email.rpartition("@")[2]
+    return email
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import AsyncIterator, Callable, Optional, Type
+
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+# rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+
+def column_values(obj) -> dict:
+    """ Column attributes of an ORM object, without touching relationships """
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+
+async def ndjson_stream(session_factory: async_sessionmaker, stream_rows: Callable,
+                        schema: Type[BaseModel], since: Optional[datetime] = None) -> AsyncIterator[str]:
+    """ Serialize rows from a crud stream_* function as newline-delimited JSON.
+
+    The session is opened here rather than taken from a request dependency
+    because the response body is produced after the handler has returned.
+    """
+    async with session_factory() as db:
+        count = 0
+        try:
+            async for row in stream_rows(db, since):
+                yield schema.model_validate(column_values(row)).model_dump_json() + "\n"
+                count += 1
+        except Exception as e:
+            logger.error(f"Export failed after {count} rows: {e}")
+            raise
+        logger.info(f"Exported {count} {schema.__name__} rows")
@@ -0,0 +1,82 @@
+import re
+from typing import Optional
+from urllib.parse import urlsplit
+
+""" Canonical forms of contact details, so near-duplicates compare equal """
+
+# mailbox providers; sharing one says nothing about being the same company
+FREE_EMAIL_DOMAINS = frozenset({
+    "gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com",
+    "live.com", "msn.com", "aol.com", "icloud.com", "me.com", "gmx.com",
+    "gmx.de", "web.de", "proton.me", "protonmail.com", "mail.com", "yandex.com",
+})
+
+# legal forms dropped from company names
+_COMPANY_SUFFIXES = frozenset({
+    "inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation",
+    "co", "company", "gmbh", "ag", "sa", "srl", "bv", "plc", "pty", "lp", "llp",
+})
+_NON_WORD = re.compile(r"[^\w]+")
+_NON_DIGIT = re.compile(r"\D+")
+# trailing digits of a phone number compared, which skips country and trunk prefixes
+PHONE_DIGITS = 10
+MIN_PHONE_DIGITS = 7
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Lowercased address without a +tag"""
+    if not email or "@" not in email:
+        return None
+    local, _, domain = email.strip().lower().rpartition("@")
+    local = local.split("+", 1)[0]
+    if not local or not domain:
+        return None
+    return f"{local}@{domain}"
+
+
+def normalize_domain(value: Optional[str]) -> Optional[str]:
+    """Host of a URL, bare domain or email address, lowercased without www."""
+    if not value:
+        return None
+    value = value.strip().lower()
+    if "@" in value and "/" not in value:
+        value = value.rpartition("@")[2]
+    if "://" not in value:
+        value = "//" + value
+    try:
+        host = urlsplit(value).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    return host.rstrip(".") if "." in host else None
+
+
+def company_domain(email: Optional[str]) -> Optional[str]:
+    """Domain of an email address unless it's a free mailbox provider"""
+    domain = normalize_domain(normalize_email(email))
+    return None if domain in FREE_EMAIL_DOMAINS else domain
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """The last PHONE_DIGITS digits, None for anything too short to be a number"""
+    if not phone:
+        return None
+    digits = _NON_DIGIT.sub("", phone)
+    if len(digits) < MIN_PHONE_DIGITS:
+        return None
+    return digits[-PHONE_DIGITS:]
+
+
+def normalize_company(name: Optional[str]) -> Optional[str]:
+    """Lowercased words of a company name without punctuation or legal form"""
+    if not name:
+        return None
+    words = _NON_WORD.sub(" ", name.lower().replace("&", " and ")).split()
+    while len(words) > 1 and words[-1] in _COMPANY_SUFFIXES:
+        words.pop()
+    if words and words[0] == "the" and len(words) > 1:
+        words.pop(0)
+    return " ".join(words) or None
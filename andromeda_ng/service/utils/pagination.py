@@ -0,0 +1,22 @@
+import base64
+import json
+from typing import Any, List
+
+
+def encode_cursor(*values: Any) -> str:
+    """ Pack the sort key of the last row on a page into an opaque cursor """
+    raw = json.dumps([str(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[str]:
+    """ Unpack a cursor of `size` values made by encode_cursor, raises ValueError if it is malformed """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(values, list) or len(values) != size \
+            or not all(isinstance(value, str) for value in values):
+        raise ValueError("Invalid cursor")
+    return values
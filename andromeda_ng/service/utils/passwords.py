@@ -1,6 +1,11 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from passlib.context import CryptContext
 from password_validation import PasswordPolicy
-from typing import Tuple
+from typing import Callable, Tuple
+from andromeda_ng.service.settings import config
 password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 """ Hash and verify passwords """
@@ -16,6 +21,97 @@ def verify_password(password: str, hashed_password: str) -> bool:
     return password_context.verify(password, hashed_password)
 
 
+class PasswordHasherBusy(Exception):
+    """ Raised instead of queueing when the hashing pool is saturated """
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing pool is saturated")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Runs bcrypt in a small dedicated thread pool.
+
+    bcrypt releases the GIL while hashing, so threads are enough to keep it
+    off the event loop. At most `workers` hashes run at once and at most
+    `max_queue` more wait for a thread; anything beyond that is rejected
+    straight away with PasswordHasherBusy rather than piling up latency.
+    """
+
+    def __init__(self, workers: int, max_queue: int, retry_after: int = 1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_hash = 0.0
+        self.max_hash = 0.0
+
+    def _timed(self, submitted: float, func: Callable, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.completed += 1
+                self.total_wait += started - submitted
+                self.max_wait = max(self.max_wait, started - submitted)
+                self.total_hash += finished - started
+                self.max_hash = max(self.max_hash, finished - started)
+
+    async def run(self, func: Callable, *args):
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHasherBusy(self.retry_after)
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self._timed, time.perf_counter(), func, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            completed = self.completed
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": min(self.pending, self.workers),
+                "queued": max(self.pending - self.workers, 0),
+                "completed": completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / completed * 1000, 3) if completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_hash_ms": round(self.total_hash / completed * 1000, 3) if completed else 0.0,
+                "max_hash_ms": round(self.max_hash * 1000, 3),
+            }
+
+
+password_hasher = PasswordHasher(
+    config.PASSWORD_HASH_WORKERS, config.PASSWORD_HASH_QUEUE,
+    config.PASSWORD_HASH_RETRY_AFTER)
+
+
+async def hash_password_async(password: str) -> str:
+    """ Hash password in the hashing pool """
+    return await password_hasher.run(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """ Verify password in the hashing pool """
+    return await password_hasher.run(verify_password, password, hashed_password)
+
+
 def verify_password_policy(password: str) -> Tuple[bool, str]:
     """ Verify password policy """
     policy = PasswordPolicy.from_names(
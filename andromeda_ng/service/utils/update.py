@@ -0,0 +1,99 @@
+import re
+from typing import Optional, Tuple
+
+from fastapi import Header, HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+""" Single statement updates with optimistic version checks """
+
+NOT_FOUND = "not_found"
+VERSION_MISMATCH = "version_mismatch"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+_ERROR_STATUS = {
+    NOT_FOUND: status.HTTP_404_NOT_FOUND,
+    VERSION_MISMATCH: status.HTTP_412_PRECONDITION_FAILED,
+    DUPLICATE: status.HTTP_400_BAD_REQUEST,
+    INVALID: status.HTTP_400_BAD_REQUEST,
+}
+
+# "3", W/"3" or a bare 3; * matches any version
+_ETAG = re.compile(r'^\s*(?:W/)?"?(\d+)"?\s*$')
+
+
+def etag(version: int) -> str:
+    """ETag header value for a row version"""
+    return f'"{version}"'
+
+
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    """Version an If-Match header asks for, None for no header or *.
+
+    Raises ValueError for anything that isn't one of our ETags.
+    """
+    if value is None or value.strip() == "*":
+        return None
+    match = _ETAG.match(value)
+    if not match:
+        raise ValueError(f"Invalid If-Match header: {value}")
+    return int(match.group(1))
+
+
+async def if_match_version(if_match: Optional[str] = Header(
+        None, description='Row version from a previous ETag, e.g. "3"')) -> Optional[int]:
+    """Dependency for update routes: the If-Match version, 400 if unparseable"""
+    try:
+        return parse_if_match(if_match)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def update_error(name: str, reason: str, fields: Optional[list] = None) -> dict:
+    """Service error dict for a failed update of a `name` row"""
+    messages = {NOT_FOUND: f"{name} not found",
+                VERSION_MISMATCH: f"{name} was modified, reload it and retry",
+                DUPLICATE: f"{name} already exists",
+                INVALID: f"{name} fields can't be set to null: {', '.join(fields or ())}"}
+    return {"error": messages.get(reason, f"Error updating {name.lower()}"), "reason": reason}
+
+
+def update_error_status(result: dict) -> int:
+    """HTTP status for an update_error dict"""
+    return _ERROR_STATUS.get(result.get("reason"), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def null_violations(model, values: dict) -> list:
+    """Columns values would set to null that don't allow it"""
+    columns = model.__table__.c
+    return [name for name, value in values.items()
+            if value is None and name in columns and not columns[name].nullable]
+
+
+async def update_returning(db: AsyncSession, model, row_id, values: dict,
+                           expected_version: Optional[int] = None) -> Tuple[Optional[object], Optional[str]]:
+    """UPDATE ... SET ... WHERE id = :id [AND version = :v] RETURNING * in one round trip.
+
+    Only the given values are written and the version is bumped. Returns
+    (row, None) on success, otherwise (None, NOT_FOUND) or
+    (None, VERSION_MISMATCH); telling those two apart takes a second query
+    that only runs when expected_version was given and nothing matched.
+    Nulls for NOT NULL columns give (None, INVALID) without a round trip.
+    The caller commits.
+    """
+    if null_violations(model, values):
+        return None, INVALID
+    statement = update(model).where(model.id == row_id)
+    if expected_version is not None:
+        statement = statement.where(model.version == expected_version)
+    statement = statement.values(**values, version=model.version + 1).returning(model)
+    result = await db.scalars(statement, execution_options={
+        "populate_existing": True, "synchronize_session": False})
+    row = result.first()
+    if row is not None:
+        return row, None
+    if expected_version is None:
+        return None, NOT_FOUND
+    exists = (await db.execute(select(model.id).where(model.id == row_id))).first()
+    return None, VERSION_MISMATCH if exists else NOT_FOUND
@@ -0,0 +1,56 @@
+from enum import Enum
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from andromeda_ng.service.utils.dialect import insert_for
+
+""" Single statement inserts guarded by a unique index """
+
+
+class ConflictPolicy(str, Enum):
+    """What a create does when the unique key already exists"""
+    reject = "reject"  # report the duplicate, change nothing
+    ignore = "ignore"  # keep the existing row and return it
+    merge = "merge"    # overwrite the existing row with the new values
+
+
+def on_conflict(statement, model, columns: Iterable[str], conflict_target: Iterable,
+                policy: ConflictPolicy):
+    """statement, a dialect insert, with the ON CONFLICT clause for policy.
+
+    merge overwrites `columns` of the existing row and bumps its
+    updated_at and version; reject and ignore leave it as it is.
+    """
+    if policy == ConflictPolicy.merge:
+        update_columns = {name: statement.excluded[name] for name in columns
+                          if name not in ("id", "created_at")}
+        if "updated_at" in model.__table__.c:
+            update_columns["updated_at"] = func.now()
+        if "version" in model.__table__.c:
+            update_columns["version"] = model.version + 1
+        return statement.on_conflict_do_update(
+            index_elements=list(conflict_target), set_=update_columns)
+    return statement.on_conflict_do_nothing(index_elements=list(conflict_target))
+
+
+async def insert_unique(db: AsyncSession, model, values: dict, conflict_target: Iterable,
+                        policy: ConflictPolicy = ConflictPolicy.reject,
+                        existing_where=None) -> Optional[object]:
+    """INSERT ... ON CONFLICT ... RETURNING in one round trip.
+
+    conflict_target are the columns or expressions of the unique index.
+    Returns the inserted, merged or (for ignore) existing row, or None when
+    the policy is reject and the key already existed. ignore looks the
+    existing row up with existing_where, a second query that only runs
+    after a conflict. The caller commits.
+    """
+    statement = on_conflict(insert_for(db, model).values(**values), model, values,
+                            conflict_target, policy)
+    result = await db.scalars(statement.returning(model),
+                              execution_options={"populate_existing": True})
+    row = result.first()
+    if row is None and policy == ConflictPolicy.ignore and existing_where is not None:
+        row = (await db.scalars(select(model).where(existing_where))).first()
+    return row
@@ -0,0 +1,62 @@
+"""Compare request throughput of the blocking and asyncpg database paths.
+
+Each simulated request runs a query that takes QUERY_DELAY seconds on the
+server (pg_sleep) so the effect of blocking the event loop is easy to see:
+the sync path serializes, the async path scales with concurrency until the
+connection pool is exhausted.
+
+Needs a reachable Postgres configured through the usual DB_* settings:
+
+    poetry run python benchmarks/bench_async_db.py
+"""
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from andromeda_ng.service.database import SessionLocal, AsyncSessionLocal, async_engine, engine
+
+QUERY_DELAY = 0.05
+REQUESTS = 200
+CONCURRENCY = [1, 4, 16, 32]
+SLOW_QUERY = text("SELECT pg_sleep(:delay)")
+
+
+async def sync_request():
+    # what the crud services used to do: a blocking query inside async def
+    db = SessionLocal()
+    try:
+        db.execute(SLOW_QUERY, {"delay": QUERY_DELAY})
+    finally:
+        db.close()
+
+
+async def async_request():
+    async with AsyncSessionLocal() as db:
+        await db.execute(SLOW_QUERY, {"delay": QUERY_DELAY})
+
+
+async def run(request, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with semaphore:
+            await request()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded() for _ in range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    print(f"{'concurrency':>12} {'sync req/s':>12} {'async req/s':>12}")
+    for concurrency in CONCURRENCY:
+        sync_rps = await run(sync_request, concurrency)
+        async_rps = await run(async_request, concurrency)
+        print(f"{concurrency:>12} {sync_rps:>12.1f} {async_rps:>12.1f}")
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
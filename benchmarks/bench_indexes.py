@@ -0,0 +1,141 @@
+"""Lead ingest throughput and customer-detail latency with the old and new indexes.
+
+Both index sets are built from the current models in a scratch schema:
+
+  before  the single-column indexes the tables used to carry (every id,
+          most lead columns, customer phone/website, contact email) and no
+          index on contacts/notes.customer_id
+  after   the indexes after migration d9a4b3e6c215: foreign-key indexes and
+          filter composites, nothing else
+
+For each, LEADS leads are inserted in batches and CUSTOMERS customers with
+CHILDREN contacts and notes each are loaded, then DETAIL_LOOKUPS random
+customers are fetched the way GET /customers/{id} does (customer plus
+selectin loads of contacts and notes).
+
+Needs a reachable Postgres configured through the usual DB_* settings; the
+scratch schema is dropped afterwards:
+
+    poetry run python benchmarks/bench_indexes.py
+"""
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from andromeda_ng.service.base import Base
+from andromeda_ng.service.crud.customer_service import _customer_query
+from andromeda_ng.service.database import engine
+from andromeda_ng.service.models import Contact, Customer, Lead, Note
+
+SCHEMA = "bench_indexes"
+LEADS = 50_000
+BATCH = 500
+CUSTOMERS = 2_000
+CHILDREN = 10
+DETAIL_LOOKUPS = 1_000
+
+NEW_INDEXES = (
+    "ix_contacts_customer_id", "ix_notes_customer_id",
+    "ix_leads_lead_converted_created_at_id", "ix_leads_lead_company_created_at_id",
+)
+OLD_INDEXES = (
+    ("leads", "id"), ("leads", "lead_first_name"), ("leads", "lead_last_name"),
+    ("leads", "lead_email"), ("leads", "lead_phone"), ("leads", "lead_company"),
+    ("leads", "lead_website"), ("leads", "lead_status"),
+    ("customers", "id"), ("customers", "customer_phone"), ("customers", "customer_website"),
+    ("contacts", "id"), ("contacts", "contact_email"), ("notes", "id"),
+)
+
+
+def create_schema(conn, variant: str):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    tables = [Lead.__table__, Customer.__table__, Contact.__table__, Note.__table__]
+    Base.metadata.create_all(conn, tables=tables)
+    if variant == "before":
+        for name in NEW_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+        for table, column in OLD_INDEXES:
+            conn.execute(text(f"CREATE INDEX ix_{table}_{column} ON {table} ({column})"))
+    conn.commit()
+
+
+def lead_rows(start: int, count: int) -> list:
+    return [{"id": uuid.uuid4(), "lead_first_name": f"First{n}", "lead_last_name": f"Last{n}",
+             "lead_email": f"lead{n}@example.com", "lead_phone": f"555-{n:07d}",
+             "lead_company": f"Company {n % 500}", "lead_website": f"https://c{n % 500}.example.com",
+             "lead_status": random.choice(["New", "Qualified", "Archived"]),
+             "lead_converted": n % 10 == 0}
+            for n in range(start, start + count)]
+
+
+def ingest_leads(conn) -> float:
+    started = time.perf_counter()
+    for start in range(0, LEADS, BATCH):
+        conn.execute(insert(Lead), lead_rows(start, BATCH))
+        conn.commit()
+    return LEADS / (time.perf_counter() - started)
+
+
+def load_customers(conn) -> list:
+    ids = [uuid.uuid4() for _ in range(CUSTOMERS)]
+    conn.execute(insert(Customer), [
+        {"id": customer_id, "customer_name": f"Customer {n}", "customer_phone": "555",
+         "customer_street": "1 Main St", "customer_city": "Springfield",
+         "customer_state": "IL", "customer_postal": "62701"}
+        for n, customer_id in enumerate(ids)])
+    children = [(customer_id, n) for customer_id in ids for n in range(CHILDREN)]
+    conn.execute(insert(Contact), [
+        {"id": uuid.uuid4(), "contact_first_name": "Jane", "contact_last_name": "Doe",
+         "contact_email": f"{customer_id}-{n}@example.com", "customer_id": customer_id}
+        for customer_id, n in children])
+    conn.execute(insert(Note), [
+        {"id": uuid.uuid4(), "note_title": "Call", "note_content": "Call back",
+         "customer_id": customer_id}
+        for customer_id, n in children])
+    conn.commit()
+    conn.execute(text("ANALYZE"))
+    return ids
+
+
+def detail_latencies(conn, ids: list) -> list:
+    latencies = []
+    with Session(bind=conn) as db:
+        for customer_id in random.sample(ids, min(DETAIL_LOOKUPS, len(ids))):
+            started = time.perf_counter()
+            db.execute(_customer_query().where(Customer.id == customer_id)).scalars().first()
+            latencies.append((time.perf_counter() - started) * 1000)
+            db.expunge_all()
+    return latencies
+
+
+def run(variant: str) -> dict:
+    with engine.connect() as conn:
+        conn = conn.execution_options(schema_translate_map={None: SCHEMA})
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        create_schema(conn, variant)
+        leads_per_second = ingest_leads(conn)
+        latencies = detail_latencies(conn, load_customers(conn))
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        conn.commit()
+    latencies.sort()
+    return {"leads/s": leads_per_second,
+            "detail p50 ms": statistics.median(latencies),
+            "detail p95 ms": latencies[int(len(latencies) * 0.95)]}
+
+
+def main():
+    random.seed(1)
+    results = {variant: run(variant) for variant in ("before", "after")}
+    print(f"{'':>14} {'before':>10} {'after':>10}")
+    for metric in results["before"]:
+        print(f"{metric:>14} {results['before'][metric]:>10.2f} {results['after'][metric]:>10.2f}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Bulk lead import of ROWS leads: parsing and validation alone, then a full
+run_import against Postgres.
+
+The first part needs no database: it times reading and validating a
+generated NDJSON and CSV file the way run_import does, with the cached
+email check and with plain LeadSchema (EmailStr), to show what validation
+costs per row.
+
+The second part creates the leads and import tables in a scratch schema,
+with the search_vector column and GIN index the migrations add, and times
+run_import of the CSV file twice: once into an empty table and once more
+with on_conflict=merge, so every row updates an existing lead. Needs a
+reachable Postgres configured through the usual DB_* settings; the scratch
+schema is dropped afterwards. Pass --no-db to skip it:
+
+    poetry run python benchmarks/bench_lead_import.py [--no-db]
+"""
+import asyncio
+import csv
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from andromeda_ng.service.base import Base
+from andromeda_ng.service.crud import lead_import_service
+from andromeda_ng.service.database import ASYNC_SQLALCHEMY_DATABASE_URL
+from andromeda_ng.service.models import Lead, LeadImportError, LeadImportJob
+from andromeda_ng.service.schema import LeadImportRow, LeadSchema
+from andromeda_ng.service.settings import config
+
+SCHEMA = "bench_lead_import"
+ROWS = 500_000
+DOMAINS = [f"c{n}.example.com" for n in range(20_000)] + ["gmail.com", "yahoo.com"]
+
+
+def synthetic_lead(n: int) -> dict:
+    return {"lead_first_name": f"First{n}", "lead_last_name": "Last", "lead_phone": "555-0100",
+            "lead_email": f"Lead{n}@{DOMAINS[n % len(DOMAINS)]}", "lead_company": f"Company {n % 20_000}",
+            "lead_message": "Please send a quote for the premium plan", "lead_website": "https://example.com"}
+
+
+def write_files(directory: str) -> dict:
+    paths = {"ndjson": os.path.join(directory, "leads.ndjson"), "csv": os.path.join(directory, "leads.csv")}
+    with open(paths["ndjson"], "w") as ndjson, open(paths["csv"], "w", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=list(synthetic_lead(0)))
+        writer.writeheader()
+        for n in range(ROWS):
+            lead = synthetic_lead(n)
+            ndjson.write(json.dumps(lead) + "\n")
+            writer.writerow(lead)
+    return paths
+
+
+def bench_validation(paths: dict):
+    for format, path in paths.items():
+        with open(path, "rb") as file:
+            records = lead_import_service._records(lead_import_service._CountingLines(file), format)
+            started = time.perf_counter()
+            read, valid, errors = lead_import_service._prepare_chunk(records, ROWS)
+            seconds = time.perf_counter() - started
+        assert (read, len(valid), errors) == (ROWS, ROWS, [])
+        print(f"{format}: read and validated {ROWS} rows in {seconds:.2f} s ({ROWS / seconds:,.0f} rows/s)")
+
+    # the same rows through LeadSchema, whose EmailStr runs the full email check every time
+    leads = [synthetic_lead(n) for n in range(ROWS // 10)]
+    for schema in (LeadImportRow, LeadSchema):
+        started = time.perf_counter()
+        for lead in leads:
+            schema.model_validate(lead)
+        seconds = time.perf_counter() - started
+        print(f"{schema.__name__}: {len(leads) / seconds:,.0f} rows/s")
+
+
+def search_vectors() -> dict:
+    path = os.path.join(os.path.dirname(__file__), "..", "alembic", "versions",
+                        "e7c1f4a9b302_full_text_search.py")
+    spec = importlib.util.spec_from_file_location("full_text_search", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    return migration.SEARCH_VECTORS
+
+
+async def bench_import(path: str):
+    engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, connect_args={"server_settings": {"search_path": SCHEMA}})
+    session_factory = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    async with engine.connect() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        await conn.run_sync(lambda sync_conn: Base.metadata.create_all(sync_conn, tables=[
+            Lead.__table__, LeadImportJob.__table__, LeadImportError.__table__]))
+        await conn.execute(text(f"ALTER TABLE leads ADD COLUMN search_vector tsvector "
+                                f"GENERATED ALWAYS AS ({search_vectors()['leads']}) STORED"))
+        await conn.execute(text("CREATE INDEX ix_leads_search_vector ON leads USING gin (search_vector)"))
+        await conn.commit()
+
+    try:
+        for policy in ("reject", "merge"):
+            # run_import deletes the file it loads
+            copy = f"{path}.{policy}"
+            os.link(path, copy)
+            job_id = uuid.uuid4()
+            async with session_factory() as db:
+                db.add(LeadImportJob(id=job_id, status="queued", format="csv", on_conflict=policy,
+                                     bytes_total=os.path.getsize(path), bytes_read=0, rows_read=0,
+                                     inserted=0, updated=0, duplicates=0, invalid=0, errors=0))
+                await db.commit()
+            started = time.perf_counter()
+            await lead_import_service.run_import(session_factory, job_id, copy)
+            seconds = time.perf_counter() - started
+            async with session_factory() as db:
+                job = await db.get(LeadImportJob, job_id)
+                print(f"{policy}: {job.status}, {job.inserted} inserted, {job.updated} updated in "
+                      f"{seconds:.2f} s ({job.rows_read / seconds:,.0f} rows/s, "
+                      f"chunks of {config.IMPORT_CHUNK_SIZE})")
+    finally:
+        async with engine.connect() as conn:
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            await conn.commit()
+        await engine.dispose()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(directory)
+        bench_validation(paths)
+        if "--no-db" not in sys.argv:
+            asyncio.run(bench_import(paths["csv"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Latency of an unrelated endpoint while a burst of logins is verified.
+
+A login storm is simulated by LOGINS concurrent bcrypt verifications. They
+run either inline on the event loop, like the login handler used to, or
+through the bounded password hashing pool. Meanwhile /api/v1/ping is
+requested in a loop through the ASGI app and its latency is recorded. Inline
+verification stalls the pings for the whole storm; with the pool they stay
+at their idle latency and excess logins are rejected with 503 instead.
+
+No database is needed:
+
+    poetry run python benchmarks/bench_login_storm.py
+"""
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from andromeda_ng.app import configure_app
+from andromeda_ng.service.utils import passwords
+
+LOGINS = 64
+PASSWORD = "Secret123!"
+
+
+async def inline_login(hashed: str):
+    passwords.verify_password(PASSWORD, hashed)
+
+
+async def pooled_login(hashed: str):
+    try:
+        await passwords.verify_password_async(PASSWORD, hashed)
+    except passwords.PasswordHasherBusy:
+        pass
+
+
+async def ping_latencies(client: httpx.AsyncClient, stop: asyncio.Event) -> list:
+    # measured from when the ping was due, so time spent waiting for a
+    # blocked event loop to get around to it counts too
+    latencies = []
+    due = time.perf_counter()
+    while not stop.is_set():
+        await client.get("/api/v1/ping")
+        latencies.append((time.perf_counter() - due) * 1000)
+        due = time.perf_counter() + 0.005
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def run(login, hashed: str, client: httpx.AsyncClient) -> dict:
+    stop = asyncio.Event()
+    pinger = asyncio.create_task(ping_latencies(client, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(login(hashed) for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    latencies = await pinger
+    return {
+        "storm_s": elapsed,
+        "pings": len(latencies),
+        "p50_ms": statistics.median(latencies),
+        "max_ms": max(latencies),
+    }
+
+
+async def main():
+    hashed = passwords.hash_password(PASSWORD)
+    transport = httpx.ASGITransport(app=configure_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'mode':>8} {'storm s':>8} {'pings':>6} {'p50 ms':>8} {'max ms':>8}")
+        for name, login in (("inline", inline_login), ("pooled", pooled_login)):
+            result = await run(login, hashed, client)
+            print(f"{name:>8} {result['storm_s']:>8.2f} {result['pings']:>6} "
+                  f"{result['p50_ms']:>8.1f} {result['max_ms']:>8.1f}")
+    print(passwords.password_hasher.snapshot())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
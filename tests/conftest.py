@@ -1,54 +1,103 @@
 # conftest.py
+import asyncio
+import httpx
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from andromeda_ng.app import configure_app
-from andromeda_ng.service.database import get_db, Base
+from andromeda_ng.service.database import (
+    get_async_db, get_async_read_db, get_async_sessionmaker, ReadOnlyAsyncSession, Base)
+from andromeda_ng.service.libs import zammad
+from andromeda_ng.service.utils.cache import caches
 
 # Create SQLite in-memory database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
 @pytest.fixture(scope="function")
-def test_db():
+def test_engine():
     # Create the SQLite engine with special configurations for testing
-    engine = create_engine(
+    engine = create_async_engine(
         SQLALCHEMY_DATABASE_URL,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
-    
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_foreign_keys(dbapi_connection, connection_record):
+        # sqlite ignores foreign keys, and so ON DELETE CASCADE, unless asked
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def drop_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
     # Create all tables in the database
-    Base.metadata.create_all(bind=engine)
-    
-    # Create a new session factory
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    
-    # Create a new database session for the test
-    db = TestingSessionLocal()
+    asyncio.run(create_tables())
     try:
-        yield db
+        yield engine
     finally:
-        db.close()
         # Drop all tables after the test
-        Base.metadata.drop_all(bind=engine)
+        asyncio.run(drop_tables())
+
+@pytest.fixture(scope="function")
+def test_db(test_engine):
+    # Create a new session factory
+    return async_sessionmaker(
+        bind=test_engine, autoflush=False, expire_on_commit=False)
+
+@pytest.fixture(scope="function")
+def test_read_db(test_engine):
+    return async_sessionmaker(
+        bind=test_engine, class_=ReadOnlyAsyncSession, autoflush=False, expire_on_commit=False)
 
 @pytest.fixture
-def test_app(test_db):
+def test_app(test_db, test_read_db):
     app = configure_app()
-    
+
     # Override the database dependency
-    def override_get_db():
-        try:
-            yield test_db
-        finally:
-            test_db.close()
-    
-    app.dependency_overrides[get_db] = override_get_db
+    async def override_get_async_db():
+        async with test_db() as db:
+            yield db
+
+    async def override_get_async_read_db():
+        async with test_read_db() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_read_db
+    app.dependency_overrides[get_async_sessionmaker] = lambda: test_db
+
+    # cached values from an earlier test's database
+    for cache in caches.values():
+        cache.invalidate()
+
+    # Zammad answers every ticket search with no tickets
+    zammad.configure_client(transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, json=[])))
     return app
 
 @pytest.fixture
 def test_client(test_app):
-    return TestClient(test_app)
\ No newline at end of file
+    return TestClient(test_app)
+
+@pytest.fixture
+def queries(test_engine):
+    """SQL statements run against the test database while the test runs"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(test_engine.sync_engine, "before_cursor_execute", record)
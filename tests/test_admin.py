@@ -0,0 +1,86 @@
+import asyncio
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.util import greenlet_spawn
+
+from andromeda_ng.service.database import engine, async_engine
+from andromeda_ng.service.libs import auth
+from andromeda_ng.service.libs.pool_stats import PoolStats, InstrumentedAsyncQueuePool
+from andromeda_ng.service.settings import Settings
+
+
+def auth_header(admin: bool) -> dict:
+    token = auth.create_access_token(
+        data={"sub": str(uuid4()), "admin": admin, "username": "tester"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_pool_stats_requires_admin(test_client):
+    response = test_client.get("/api/v1/admin/db/pool")
+    assert response.status_code == 401
+
+    response = test_client.get(
+        "/api/v1/admin/db/pool", headers=auth_header(admin=False))
+    assert response.status_code == 403
+
+
+def test_pool_stats_snapshot(test_client):
+    response = test_client.get(
+        "/api/v1/admin/db/pool", headers=auth_header(admin=True))
+    assert response.status_code == 200
+    assert set(response.json()) == {
+        "pool_size", "checked_out", "idle", "overflow", "checkouts", "waits",
+        "timeouts", "avg_wait_ms", "max_wait_ms", "connects", "avg_connect_ms",
+        "max_connect_ms"}
+
+
+def test_sql_echo_off_by_default():
+    assert Settings.model_fields["DB_ECHO"].default is False
+    assert engine.echo is False
+    assert async_engine.echo is False
+
+
+def test_pool_stats_counters():
+    stats = PoolStats()
+    pool = mock.Mock(**{"size.return_value": 5, "checkedout.return_value": 5,
+                        "checkedin.return_value": 0, "overflow.return_value": -2})
+    stats.record_checkout()
+    stats.record_connect(0.004)
+    stats.record_wait(0.010)
+    stats.record_wait(0.030)
+    stats.record_wait(0.050, timed_out=True)
+
+    snapshot = stats.snapshot(pool)
+    assert snapshot["checkouts"] == 4
+    assert snapshot["waits"] == 3
+    assert snapshot["timeouts"] == 1
+    assert snapshot["avg_wait_ms"] == pytest.approx(30.0)
+    assert snapshot["max_wait_ms"] == pytest.approx(50.0)
+    assert snapshot["connects"] == 1
+    assert snapshot["avg_connect_ms"] == pytest.approx(4.0)
+    assert snapshot["overflow"] == 0
+
+
+def test_instrumented_pool_separates_connects_from_waits():
+    stats = PoolStats()
+    pool = InstrumentedAsyncQueuePool(
+        mock.Mock, pool_size=1, max_overflow=0, timeout=0.01)
+
+    # the async pool only blocks inside a greenlet, like it does under AsyncSession
+    def checkouts():
+        first = pool.connect()
+        with pytest.raises(PoolTimeoutError):
+            pool.connect()
+        first.close()
+        pool.connect().close()
+
+    with mock.patch("andromeda_ng.service.libs.pool_stats.pool_stats", stats):
+        asyncio.run(greenlet_spawn(checkouts))
+
+    assert stats.connects == 1
+    assert stats.timeouts == 1
+    assert stats.waits == 1
+    assert stats.checkouts == 2
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from andromeda_ng.service.utils.cache import TTLCache, caches
+from tests.test_admin import auth_header
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(**kwargs):
+    clock = FakeClock()
+    options = {"ttl": 10, "max_entries": 3, "stale_ttl": 50}
+    options.update(kwargs)
+    return TTLCache("test", clock=clock, **options), clock
+
+
+def counting_loader(value, calls):
+    async def load():
+        calls.append(value)
+        await asyncio.sleep(0)
+        return value
+    return load
+
+
+def test_cache_hit_and_miss():
+    cache, clock = make_cache()
+    calls = []
+
+    async def run():
+        assert await cache.get_or_load("a", counting_loader(1, calls)) == 1
+        assert await cache.get_or_load("a", counting_loader(2, calls)) == 1
+    asyncio.run(run())
+
+    assert calls == [1]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache, clock = make_cache()
+    for key in "abc":
+        cache.set(key, key)
+    assert cache.get("a") == "a"
+    cache.set("d", "d")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    assert len(cache) == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_serves_stale_and_refreshes():
+    cache, clock = make_cache()
+    calls = []
+
+    async def run():
+        await cache.get_or_load("a", counting_loader("old", calls))
+        clock.now = 20
+        # stale value comes back immediately, the reload runs in the background
+        assert await cache.get_or_load("a", counting_loader("new", calls)) == "old"
+        await asyncio.sleep(0.01)
+        assert await cache.get_or_load("a", counting_loader("newer", calls)) == "new"
+        clock.now = 100
+        # past the stale window the caller waits for the loader
+        assert await cache.get_or_load("a", counting_loader("newest", calls)) == "newest"
+    asyncio.run(run())
+
+    assert calls == ["old", "new", "newest"]
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_cache_coalesces_concurrent_loads():
+    cache, clock = make_cache()
+    calls = []
+
+    async def run():
+        return await asyncio.gather(
+            *[cache.get_or_load("a", counting_loader(1, calls)) for _ in range(5)])
+    assert asyncio.run(run()) == [1] * 5
+    assert calls == [1]
+
+
+def test_cache_does_not_keep_errors_or_none():
+    cache, clock = make_cache()
+
+    async def fail():
+        raise RuntimeError("down")
+
+    async def nothing():
+        return None
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("a", fail)
+        assert await cache.get_or_load("a", nothing) is None
+    asyncio.run(run())
+
+    assert len(cache) == 0
+    assert cache.stats()["load_errors"] == 1
+
+
+def test_cache_stats_endpoint(test_client):
+    response = test_client.get("/api/v1/admin/cache", headers=auth_header(admin=True))
+    assert response.status_code == 200
+    assert set(response.json()) == set(caches)
+    assert "zammad_tickets" in response.json()
@@ -0,0 +1,318 @@
+import asyncio
+import json
+from uuid import uuid4
+
+from andromeda_ng.service.models import Contact, Customer, Note
+
+create_customer = {
+    "customer_name": "Acme",
+    "customer_phone": "+1-555-1234",
+    "customer_street": "1 Main St",
+    "customer_city": "Springfield",
+    "customer_state": "IL",
+    "customer_postal": "62701",
+    "customer_website": "https://www.acme.com",
+    "is_active": True
+}
+
+
+def make_customer(test_client, **overrides):
+    response = test_client.post(
+        "/api/v1/customers/", json=dict(create_customer, **overrides))
+    assert response.status_code == 201
+    return test_client.get(
+        f"/api/v1/customers/name/{response.json()['customer_name']}").json()
+
+
+def test_read_customer_by_name_includes_relationships(test_client):
+    make_customer(test_client)
+
+    response = test_client.get("/api/v1/customers/name/Acme")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["customer_name"] == "Acme"
+    assert data["children"] == []
+    assert data["notes"] == []
+
+
+def test_read_customer_by_id(test_client):
+    customer = make_customer(test_client)
+
+    response = test_client.get(f"/api/v1/customers/{customer['id']}")
+    assert response.status_code == 200
+    assert response.json()["id"] == customer["id"]
+
+    response = test_client.get(f"/api/v1/customers/{uuid4()}")
+    assert response.status_code == 404
+
+
+def test_update_customer(test_client):
+    customer = make_customer(test_client)
+
+    response = test_client.put(f"/api/v1/customers/{customer['id']}",
+                               json=dict(create_customer, customer_city="Shelbyville"))
+    assert response.status_code == 200
+    data = response.json()
+    assert data["customer_city"] == "Shelbyville"
+    assert data["children"] == []
+    assert data["version"] == 2
+    assert response.headers["etag"] == '"2"'
+
+    response = test_client.put(f"/api/v1/customers/{uuid4()}", json=create_customer)
+    assert response.status_code == 404
+
+
+def test_patch_customer(test_client):
+    customer = make_customer(test_client)
+
+    response = test_client.patch(f"/api/v1/customers/{customer['id']}",
+                                 json={"is_active": False},
+                                 headers={"If-Match": f'"{customer["version"]}"'})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["is_active"] is False
+    assert data["customer_name"] == "Acme"
+    # the RETURNING row alone, relationships aren't loaded
+    assert data["children"] is None
+
+    response = test_client.patch(f"/api/v1/customers/{customer['id']}",
+                                 json={"is_active": True},
+                                 headers={"If-Match": f'"{customer["version"]}"'})
+    assert response.status_code == 412
+
+
+def test_delete_customer(test_client):
+    customer = make_customer(test_client)
+
+    response = test_client.delete(f"/api/v1/customers/{customer['id']}")
+    assert response.status_code == 204
+    response = test_client.get("/api/v1/customers/name/Acme")
+    assert response.status_code == 404
+
+    response = test_client.delete(f"/api/v1/customers/{customer['id']}")
+    assert response.status_code == 404
+
+
+def test_delete_customer_cascades(test_client, queries):
+    customer = make_customer(test_client)
+    response = test_client.post("/api/v1/contacts/", json={
+        "contact_first_name": "Jane", "contact_last_name": "Doe",
+        "contact_email": "jane@example.com", "customer_id": customer["id"]})
+    assert response.status_code == 201
+    contact_id = response.json()["id"]
+    response = test_client.post("/api/v1/notes/", json={
+        "note_title": "Call", "note_content": "Call back", "customer_id": customer["id"]})
+    assert response.status_code == 201
+
+    queries.clear()
+    response = test_client.delete(f"/api/v1/customers/{customer['id']}")
+    assert response.status_code == 204
+    # the database removes the children, nothing is loaded first
+    assert [q.split()[0] for q in queries] == ["DELETE"]
+
+    assert test_client.get(f"/api/v1/contacts/{contact_id}").status_code == 404
+    assert test_client.get("/api/v1/notes/").json() == []
+
+
+def test_create_and_read_contact(test_client):
+    customer = make_customer(test_client)
+    contact = {
+        "contact_first_name": "Jane",
+        "contact_last_name": "Doe",
+        "contact_email": "Jane.Doe@example.com",
+        "customer_id": customer["id"]
+    }
+
+    response = test_client.post("/api/v1/contacts/", json=contact)
+    assert response.status_code == 201
+    created = response.json()
+    assert created["contact_email"] == "jane.doe@example.com"
+    assert created["customer"]["customer_name"] == "Acme"
+
+    response = test_client.get(f"/api/v1/contacts/{created['id']}")
+    assert response.status_code == 200
+    assert response.json()["customer"]["id"] == customer["id"]
+
+    response = test_client.get("/api/v1/contacts/")
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()] == [created["id"]]
+
+    response = test_client.get(f"/api/v1/customers/{customer['id']}")
+    assert response.status_code == 200
+    assert [c["id"] for c in response.json()["children"]] == [created["id"]]
+
+
+def test_update_contact(test_client):
+    customer = make_customer(test_client)
+    contact = {
+        "contact_first_name": "Jane",
+        "contact_last_name": "Doe",
+        "contact_email": "jane@example.com",
+        "customer_id": customer["id"]
+    }
+    created = test_client.post("/api/v1/contacts/", json=contact).json()
+
+    response = test_client.put(f"/api/v1/contacts/{created['id']}",
+                               json=dict(contact, contact_last_name="Smith"))
+    assert response.status_code == 200
+    data = response.json()
+    assert data["contact_last_name"] == "Smith"
+    assert data["customer"]["customer_name"] == "Acme"
+
+
+def test_export_customers_and_contacts(test_client):
+    customer = make_customer(test_client)
+    test_client.post("/api/v1/contacts/", json={
+        "contact_first_name": "Jane",
+        "contact_last_name": "Doe",
+        "contact_email": "jane@example.com",
+        "customer_id": customer["id"]
+    })
+
+    response = test_client.get("/api/v1/customers/export")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [customer["id"]]
+    assert rows[0]["children"] is None
+
+    response = test_client.get("/api/v1/contacts/export")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["contact_email"] for row in rows] == ["jane@example.com"]
+
+
+def test_customer_stats(test_client, queries):
+    customer = make_customer(test_client)
+    make_customer(test_client, customer_name="Globex", is_active=False)
+    test_client.post("/api/v1/contacts/", json={
+        "contact_first_name": "Jane",
+        "contact_last_name": "Doe",
+        "contact_email": "jane@example.com",
+        "customer_id": customer["id"]
+    })
+
+    queries.clear()
+    response = test_client.get("/api/v1/customers/stats")
+    assert response.status_code == 200
+    assert response.json() == {
+        "total_customers": 2,
+        "active_customers": 1,
+        "inactive_customers": 1,
+        "total_contacts": 1,
+        "total_notes": 0,
+        "contacts_per_customer": 0.5,
+        "notes_per_customer": 0.0,
+    }
+    assert len(queries) == 1
+
+    # served from the cache until a customer changes
+    queries.clear()
+    assert test_client.get("/api/v1/customers/stats").json()["total_customers"] == 2
+    assert queries == []
+
+    make_customer(test_client, customer_name="Initech")
+    assert test_client.get("/api/v1/customers/stats").json()["total_customers"] == 3
+
+
+def add_customers(test_db, count):
+    async def add():
+        async with test_db() as db:
+            for i in range(count):
+                customer = Customer(**dict(create_customer, customer_name=f"Customer {i}"))
+                customer.children = [Contact(
+                    contact_first_name="Jane", contact_last_name="Doe",
+                    contact_email=f"jane{i}@example.com")]
+                customer.notes = [Note(note_title="Call", note_content="Follow up")]
+                db.add(customer)
+            await db.commit()
+    asyncio.run(add())
+
+
+def test_customer_list_is_slim_by_default(test_client, test_db):
+    add_customers(test_db, 2)
+
+    response = test_client.get("/api/v1/customers/")
+    assert response.status_code == 200
+    customers = response.json()
+    assert len(customers) == 2
+    assert all(c["children"] is None and c["notes"] is None for c in customers)
+
+    response = test_client.get("/api/v1/customers/?include=contacts,notes")
+    assert response.status_code == 200
+    customers = response.json()
+    assert all(len(c["children"]) == 1 and len(c["notes"]) == 1 for c in customers)
+
+    response = test_client.get("/api/v1/customers/?include=contacts,invoices")
+    assert response.status_code == 400
+
+
+def test_customer_list_query_count_is_constant(test_client, test_db, queries):
+    add_customers(test_db, 500)
+
+    queries.clear()
+    response = test_client.get("/api/v1/customers/")
+    assert len(response.json()) == 500
+    assert len(queries) == 1
+
+    queries.clear()
+    response = test_client.get("/api/v1/customers/?include=contacts,notes,tickets")
+    assert len(response.json()) == 500
+    # the customers plus one selectinload per collection; none of them are linked to Zammad
+    assert len(queries) == 3
+
+
+def test_duplicate_customer_and_contact_rejected(test_client, queries):
+    customer = make_customer(test_client)
+    response = test_client.post("/api/v1/customers/", json=dict(create_customer, customer_name="ACME"))
+    assert response.status_code == 400
+
+    contact = {
+        "contact_first_name": "Jane",
+        "contact_last_name": "Doe",
+        "contact_email": "jane@example.com",
+        "customer_id": customer["id"]
+    }
+    assert test_client.post("/api/v1/contacts/", json=contact).status_code == 201
+    queries.clear()
+    response = test_client.post("/api/v1/contacts/", json=dict(contact, contact_email="Jane@Example.com"))
+    assert response.status_code == 400
+    # customer probe and the insert; no separate duplicate lookup
+    assert len(queries) == 2
+
+
+def test_read_customer_by_name_ignores_case(test_client):
+    make_customer(test_client)
+    response = test_client.get("/api/v1/customers/name/acme")
+    assert response.status_code == 200
+    assert response.json()["customer_name"] == "Acme"
+
+
+def test_autocomplete_customers(test_client, queries):
+    for name in ("Acme", "Acme Rockets", "ACME_West", "Globex", "100% Widgets"):
+        make_customer(test_client, customer_name=name)
+
+    queries.clear()
+    response = test_client.get("/api/v1/customers/autocomplete", params={"prefix": "acm"})
+    assert response.status_code == 200
+    hits = response.json()
+    assert [hit["customer_name"] for hit in hits] == ["Acme", "Acme Rockets", "ACME_West"]
+    assert set(hits[0]) == {"id", "customer_name"}
+    assert len(queries) == 1
+
+    # a hot prefix is answered from the cache
+    test_client.get("/api/v1/customers/autocomplete", params={"prefix": "ACM"})
+    assert len(queries) == 1
+
+    # LIKE wildcards in the prefix are matched literally
+    response = test_client.get("/api/v1/customers/autocomplete", params={"prefix": "acme_"})
+    assert [hit["customer_name"] for hit in response.json()] == ["ACME_West"]
+    response = test_client.get("/api/v1/customers/autocomplete", params={"prefix": "100%"})
+    assert [hit["customer_name"] for hit in response.json()] == ["100% Widgets"]
+
+    response = test_client.get("/api/v1/customers/autocomplete", params={"prefix": "acm", "limit": 1})
+    assert [hit["customer_name"] for hit in response.json()] == ["Acme"]
+
+    # writes drop cached prefixes
+    make_customer(test_client, customer_name="Acme Zeppelins")
+    response = test_client.get("/api/v1/customers/autocomplete", params={"prefix": "acm"})
+    assert len(response.json()) == 4
@@ -0,0 +1,87 @@
+from uuid import uuid4
+
+from andromeda_ng.service.crud.dedupe_service import score
+from andromeda_ng.service.settings import config
+from andromeda_ng.service.utils.normalize import (
+    company_domain, normalize_company, normalize_domain, normalize_email, normalize_phone)
+from tests.test_admin import auth_header
+
+
+def create_lead(test_client, **fields) -> str:
+    lead = {"lead_first_name": "Road", "lead_last_name": "Runner", "lead_email": "road@acme.com",
+            "lead_phone": "555-0100", "lead_company": "Acme"}
+    lead.update(fields)
+    response = test_client.post("/api/v1/leads/", json=lead)
+    assert response.status_code == 201
+    leads = test_client.get("/api/v1/leads/").json()["items"]
+    return next(lead["id"] for lead in leads if lead["lead_email"] == response.json()["lead_email"])
+
+
+def run_index(test_client) -> dict:
+    response = test_client.post("/api/v1/admin/dedupe/index", headers=auth_header(admin=True))
+    assert response.status_code == 200
+    return response.json()["indexed"]
+
+
+def test_normalize():
+    assert normalize_email(" Road.Runner+crm@ACME.com ") == "road.runner@acme.com"
+    assert normalize_email("not an email") is None
+    assert normalize_domain("https://www.Acme.com/about") == "acme.com"
+    assert normalize_domain("sales@acme.com") == "acme.com"
+    assert normalize_domain("localhost") is None
+    assert company_domain("road@acme.com") == "acme.com"
+    assert company_domain("road@gmail.com") is None
+    assert normalize_phone("+1 (555) 010-0200") == "5550100200"
+    assert normalize_phone("555-0100") == "5550100"
+    assert normalize_phone("555") is None
+    assert normalize_company("The Acme Co., Inc.") == "acme"
+    assert normalize_company("Smith & Sons Ltd") == "smith and sons"
+
+
+def test_score():
+    assert score([]) == 0
+    assert score(["email"]) == 0.95
+    assert score(["domain", "company"]) == 0.8
+    assert score(["domain", "domain"]) == 0.6
+
+
+def test_lead_duplicates(test_client):
+    lead_id = create_lead(test_client)
+    same_person = create_lead(test_client, lead_email="Road+news@acme.com", lead_company="ACME Inc.")
+    same_company = create_lead(test_client, lead_first_name="Wile", lead_email="wile@acme.com",
+                               lead_phone="555-0199")
+    create_lead(test_client, lead_email="other@gmail.com", lead_phone="555-0999", lead_company="Other")
+    assert run_index(test_client) == {"lead": 4, "customer": 0, "contact": 0}
+    # nothing changed, nothing to rekey
+    assert run_index(test_client) == {"lead": 0, "customer": 0, "contact": 0}
+
+    response = test_client.get(f"/api/v1/leads/{lead_id}/duplicates")
+    assert response.status_code == 200
+    duplicates = response.json()
+    assert [(d["id"], d["matched"]) for d in duplicates] == [
+        (same_person, ["company", "domain", "email", "phone"]),
+        (same_company, ["company", "domain"])]
+    assert duplicates[0]["score"] > duplicates[1]["score"] == 0.8
+    assert duplicates[0]["name"] == "Road Runner (ACME Inc.)"
+
+    response = test_client.get(f"/api/v1/leads/{lead_id}/duplicates", params={"min_score": 0.9})
+    assert [d["id"] for d in response.json()] == [same_person]
+
+
+def test_lead_duplicates_skip_oversized_blocks(test_client, monkeypatch):
+    lead_id = create_lead(test_client)
+    for n in range(3):
+        create_lead(test_client, lead_email=f"rep{n}@acme.com", lead_phone=f"555-02{n:02d}",
+                    lead_company=f"Acme {n}")
+    run_index(test_client)
+    monkeypatch.setattr(config, "DEDUPE_MAX_BLOCK_SIZE", 3)
+
+    response = test_client.get(f"/api/v1/leads/{lead_id}/duplicates", params={"min_score": 0})
+    assert response.status_code == 200
+    # four leads share acme.com, more than a block may hold
+    assert response.json() == []
+
+
+def test_lead_duplicates_not_found(test_client):
+    response = test_client.get(f"/api/v1/leads/{uuid4()}/duplicates")
+    assert response.status_code == 404
@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import hmac
+import json
+
+import pytest
+from pydantic import SecretStr
+
+from andromeda_ng.service.models import Customer
+from andromeda_ng.service.settings import config
+
+SECRET = "webhook-secret"
+WEBHOOK = "/api/v1/integrations/zammad/webhook"
+
+
+def ticket_payload(**overrides):
+    ticket = {"id": 501, "organization_id": 42, "number": "31001", "title": "Printer",
+              "state": "open", "priority": "2 normal",
+              "created_at": "2026-10-01T09:00:00.000Z",
+              "updated_at": "2026-10-02T09:00:00.000Z"}
+    ticket.update(overrides)
+    return {"ticket": ticket, "article": {"body": "it jammed"}}
+
+
+def post_webhook(test_client, payload, secret=SECRET):
+    body = json.dumps(payload).encode()
+    signature = "sha1=" + hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+    return test_client.post(WEBHOOK, content=body, headers={
+        "X-Hub-Signature": signature, "Content-Type": "application/json"})
+
+
+@pytest.fixture
+def webhook_secret(monkeypatch):
+    monkeypatch.setattr(config, "ZAMMAD_WEBHOOK_SECRET", SecretStr(SECRET))
+    monkeypatch.setattr(config, "ZAMMAD_TICKET_MIRROR", True)
+
+
+def add_customer(test_db, zammad_id):
+    async def add():
+        async with test_db() as db:
+            customer = Customer(
+                customer_name="Acme", customer_phone="+1-555-1234",
+                customer_street="1 Main St", customer_city="Springfield",
+                customer_state="IL", customer_postal="62701", zammad_id=zammad_id)
+            db.add(customer)
+            await db.commit()
+            return customer.id
+    return asyncio.run(add())
+
+
+def test_webhook_rejects_bad_signature(test_client, webhook_secret):
+    response = post_webhook(test_client, ticket_payload(), secret="wrong")
+    assert response.status_code == 401
+
+    response = test_client.post(WEBHOOK, json=ticket_payload())
+    assert response.status_code == 401
+
+
+def test_webhook_not_configured(test_client):
+    response = post_webhook(test_client, ticket_payload())
+    assert response.status_code == 503
+
+
+def test_webhook_ignores_payload_without_ticket(test_client, webhook_secret):
+    response = post_webhook(test_client, {"event": "ping"})
+    assert response.status_code == 200
+    assert response.json()["status"] == "ignored"
+
+
+def test_webhook_upserts_into_mirror(test_client, test_db, webhook_secret):
+    customer_id = add_customer(test_db, zammad_id=42)
+
+    assert post_webhook(test_client, ticket_payload()).status_code == 200
+    assert post_webhook(test_client, ticket_payload(
+        id=502, title="VPN", state="closed")).status_code == 200
+    # an update for an existing ticket
+    assert post_webhook(test_client, ticket_payload(
+        state="Pending Reminder", updated_at="2026-10-03T09:00:00.000Z")).status_code == 200
+    # a late, older event must not overwrite the newer state
+    assert post_webhook(test_client, ticket_payload(
+        state="new", updated_at="2026-10-01T10:00:00.000Z")).status_code == 200
+
+    response = test_client.get(f"/api/v1/customers/{customer_id}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["ticket_count"] == 2
+    assert data["open_tickets"] == 1
+    tickets = {t["id"]: t for t in data["customer_tickets"]}
+    assert tickets[501]["state"] == "pending reminder"
+    assert tickets[502]["state"] == "closed"
+    assert [t["id"] for t in data["customer_tickets"]] == [501, 502]
+
+
+def test_customer_list_includes_mirrored_ticket_counts(test_client, test_db, webhook_secret, queries):
+    add_customer(test_db, zammad_id=42)
+    post_webhook(test_client, ticket_payload())
+    post_webhook(test_client, ticket_payload(id=502, state="closed"))
+
+    queries.clear()
+    response = test_client.get("/api/v1/customers/?include=tickets")
+    assert response.status_code == 200
+    [customer] = response.json()
+    assert customer["ticket_count"] == 2
+    assert customer["open_tickets"] == 1
+    assert len(queries) == 2
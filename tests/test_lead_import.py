@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+
+import pytest
+from pydantic import TypeAdapter, EmailStr
+
+from andromeda_ng.service.crud import lead_import_service
+from andromeda_ng.service.utils.emails import validate_email_cached
+from tests.test_admin import auth_header
+
+CSV = (
+    "\ufefflead_first_name,lead_last_name,lead_email,lead_phone,lead_company,lead_message,extra\n"
+    "Road,Runner,Road@Acme.com,555-0100,Acme,\"Send a catalogue, please\",x\n"
+    "Wile,Coyote,wile@acme.com,555-0101,Acme,Rockets,\n"
+)
+
+
+@pytest.fixture
+def started(monkeypatch):
+    """The (job id, path) of imports the endpoint starts, left for the test to run"""
+    jobs = []
+    monkeypatch.setattr(lead_import_service, "start_import",
+                        lambda session_factory, job_id, path: jobs.append((job_id, path)))
+    return jobs
+
+
+def upload(test_client, content: str, filename: str, **params):
+    return test_client.post("/api/v1/leads/import", params=params, headers=auth_header(admin=False),
+                            files={"file": (filename, content.encode())})
+
+
+def run_job(test_client, test_db, started) -> dict:
+    job_id, path = started.pop()
+    asyncio.run(lead_import_service.run_import(test_db, job_id, path))
+    return test_client.get(f"/api/v1/leads/import/{job_id}", headers=auth_header(admin=False)).json()
+
+
+def lead_emails(test_client) -> list:
+    return sorted(item["lead_email"] for item in test_client.get("/api/v1/leads/").json()["items"])
+
+
+def ndjson(*leads) -> str:
+    lead = {"lead_first_name": "Road", "lead_last_name": "Runner", "lead_phone": "555-0100",
+            "lead_company": "Acme", "lead_message": "Send a catalogue"}
+    return "".join(line if isinstance(line, str) else json.dumps(dict(lead, **line)) + "\n"
+                   for line in leads)
+
+
+def test_import_csv(test_client, test_db, started):
+    response = upload(test_client, CSV, "leads.csv")
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+    assert response.headers["Location"] == f"/api/v1/leads/import/{response.json()['id']}"
+
+    job = run_job(test_client, test_db, started)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+    assert job["bytes_read"] == job["bytes_total"] == len(CSV.encode())
+    assert (job["rows_read"], job["inserted"], job["invalid"], job["errors"]) == (2, 2, 0, 0)
+    assert lead_emails(test_client) == ["road@acme.com", "wile@acme.com"]
+
+
+def test_import_ndjson_reports_row_errors(test_client, test_db, started):
+    content = ndjson({"lead_email": "a@acme.com"}, "\n", "{not json\n",
+                     {"lead_email": "not-an-email"}, "[1, 2]\n", {"lead_email": "b@acme.com"})
+    assert upload(test_client, content, "leads.ndjson").status_code == 202
+
+    job = run_job(test_client, test_db, started)
+    assert job["status"] == "succeeded"
+    assert (job["rows_read"], job["inserted"], job["invalid"], job["errors"]) == (5, 2, 3, 3)
+    assert lead_emails(test_client) == ["a@acme.com", "b@acme.com"]
+
+    errors = test_client.get(f"/api/v1/leads/import/{job['id']}/errors",
+                             headers=auth_header(admin=False)).json()
+    assert [error["row"] for error in errors] == [2, 3, 4]
+    assert errors[0]["error"] == "Invalid JSON"
+    assert errors[1]["error"].startswith("lead_email:")
+
+    page = test_client.get(f"/api/v1/leads/import/{job['id']}/errors", params={"after_row": 3},
+                           headers=auth_header(admin=False)).json()
+    assert [error["row"] for error in page] == [4]
+
+
+def test_import_duplicates(test_client, test_db, started):
+    upload(test_client, ndjson({"lead_email": "a@acme.com"}), "first.ndjson", on_conflict="reject")
+    run_job(test_client, test_db, started)
+
+    again = ndjson({"lead_email": "A@acme.com", "lead_company": "Acme Corp"},
+                   {"lead_email": "c@acme.com"}, {"lead_email": "C@ACME.com"})
+    upload(test_client, again, "again.ndjson", on_conflict="reject")
+    job = run_job(test_client, test_db, started)
+    assert (job["inserted"], job["updated"], job["duplicates"], job["errors"]) == (1, 0, 2, 2)
+    errors = test_client.get(f"/api/v1/leads/import/{job['id']}/errors",
+                             headers=auth_header(admin=False)).json()
+    assert errors == [{"row": 1, "error": "Lead already exists"},
+                      {"row": 3, "error": "Duplicate of row 2"}]
+
+    upload(test_client, again, "again.ndjson", on_conflict="merge")
+    job = run_job(test_client, test_db, started)
+    # the last of the rows sharing an email is the one merged
+    assert (job["inserted"], job["updated"], job["duplicates"], job["errors"]) == (0, 2, 1, 0)
+    leads = test_client.get("/api/v1/leads/").json()["items"]
+    assert {lead["lead_email"]: lead["lead_company"] for lead in leads}["a@acme.com"] == "Acme Corp"
+    assert len(leads) == 2
+
+
+def test_import_unreadable_file_fails_job(test_client, test_db, started):
+    response = test_client.post("/api/v1/leads/import", headers=auth_header(admin=False),
+                                files={"file": ("leads.csv", CSV.encode() + b"Caf\xe9,Owner,cafe@acme.com\n")})
+    assert response.status_code == 202
+    job = run_job(test_client, test_db, started)
+    assert job["status"] == "failed"
+    assert job["error"].startswith("Unreadable file")
+    assert job["finished_at"] is not None
+    # the chunk with the bad line is never written
+    assert lead_emails(test_client) == []
+
+
+def test_import_requires_login(test_client, started):
+    response = test_client.post("/api/v1/leads/import", files={"file": ("leads.csv", CSV.encode())})
+    assert response.status_code == 401
+    assert started == []
+
+
+def test_import_rejects_bad_uploads(test_client, started):
+    assert upload(test_client, CSV, "leads.txt").status_code == 400
+    assert upload(test_client, "", "leads.csv").status_code == 400
+    assert upload(test_client, CSV, "leads.txt", format="xml").status_code == 422
+    assert upload(test_client, CSV, "leads.txt", format="csv").status_code == 202
+    os.unlink(started.pop()[1])
+
+    missing = "/api/v1/leads/import/00000000-0000-0000-0000-000000000000"
+    assert test_client.get(missing, headers=auth_header(admin=False)).status_code == 404
+    assert test_client.get(f"{missing}/errors", headers=auth_header(admin=False)).status_code == 404
+
+
+@pytest.mark.parametrize("email", [
+    "Road@Acme.com", "road@ACME.COM", "user.name+tag@sub.example.org", "üser@example.com",
+    "user@bücher.de", "user@xn--bcher-kva.de", "not-an-email", "a@b", "two@@at.com",
+    "user@localhost", " space@acme.com", "user@-bad.com"])
+def test_cached_email_validation_matches_email_str(email):
+    adapter = TypeAdapter(EmailStr)
+    try:
+        expected = adapter.validate_python(email)
+    except ValueError:
+        expected = None
+    try:
+        actual = validate_email_cached(email)
+    except ValueError:
+        actual = None
+    assert actual == expected
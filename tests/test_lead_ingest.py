@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import pytest
+
+from andromeda_ng.service.api.routes import admin_controller, leads_controller
+from andromeda_ng.service.libs.lead_ingest import LeadIngestBuffer
+from tests.test_admin import auth_header
+
+lead = {"lead_first_name": "Road", "lead_last_name": "Runner", "lead_phone": "555-0100",
+        "lead_company": "Acme", "lead_message": "Send a catalogue"}
+
+
+@pytest.fixture
+def ingest(monkeypatch, tmp_path):
+    """A fresh buffer spilling to tmp_path in place of the app's"""
+    def make(**options):
+        buffer = LeadIngestBuffer(**{"max_size": 100, "batch_size": 2, "flush_seconds": 60,
+                                     "spill_dir": str(tmp_path), **options})
+        monkeypatch.setattr(leads_controller, "lead_ingest", buffer)
+        monkeypatch.setattr(admin_controller, "lead_ingest", buffer)
+        return buffer
+    return make
+
+
+def spilled_lines(directory) -> int:
+    return sum(len(open(os.path.join(directory, name)).readlines()) for name in os.listdir(directory))
+
+
+def lead_emails(test_client) -> list:
+    return sorted(item["lead_email"] for item in test_client.get("/api/v1/leads/").json()["items"])
+
+
+def test_ingest_accepts_then_flushes(test_client, ingest, tmp_path):
+    buffer = ingest()
+    for email in ("A@acme.com", "b@acme.com", "a@acme.com"):
+        response = test_client.post("/api/v1/leads/ingest", json=dict(lead, lead_email=email))
+        assert response.status_code == 202
+    assert lead_emails(test_client) == []
+    assert buffer.snapshot()["buffered"] == 3
+    assert spilled_lines(tmp_path) == 3
+
+    response = test_client.post("/api/v1/admin/leads/ingest/flush", headers=auth_header(admin=True))
+    assert response.status_code == 200
+    stats = response.json()
+    # the second a@acme.com is dropped by the lower(lead_email) unique index
+    assert (stats["inserted"], stats["duplicates"], stats["buffered"]) == (2, 1, 0)
+    assert lead_emails(test_client) == ["a@acme.com", "b@acme.com"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_ingest_validates_payload(test_client, ingest):
+    ingest()
+    response = test_client.post("/api/v1/leads/ingest", json=dict(lead, lead_email="not-an-email"))
+    assert response.status_code == 422
+
+
+def test_ingest_backpressure(test_client, ingest):
+    buffer = ingest(max_size=2)
+    for n in range(2):
+        response = test_client.post("/api/v1/leads/ingest", json=dict(lead, lead_email=f"{n}@acme.com"))
+        assert response.status_code == 202
+
+    response = test_client.post("/api/v1/leads/ingest", json=dict(lead, lead_email="full@acme.com"))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert buffer.snapshot()["rejected"] == 1
+
+
+def test_ingest_replays_spill_after_crash(test_client, test_db, ingest, tmp_path):
+    crashed = ingest()
+    for n in range(3):
+        test_client.post("/api/v1/leads/ingest", json=dict(lead, lead_email=f"{n}@acme.com"))
+    # the process dies mid-write: its lock goes with it and the last line is cut short
+    crashed._segment.file.write('{"id": "12')
+    crashed._segment.file.close()
+
+    restarted = LeadIngestBuffer(max_size=100, batch_size=2, flush_seconds=60, spill_dir=str(tmp_path))
+    assert asyncio.run(restarted.replay(test_db)) == 3
+    assert restarted.snapshot()["replayed"] == 3
+    assert lead_emails(test_client) == ["0@acme.com", "1@acme.com", "2@acme.com"]
+    assert os.listdir(tmp_path) == []
+
+    # replaying the same leads again changes nothing
+    assert asyncio.run(restarted.replay(test_db)) == 0
+
+
+def test_ingest_failed_flush_keeps_leads(test_client, test_db, ingest, tmp_path):
+    buffer = ingest()
+    test_client.post("/api/v1/leads/ingest", json=dict(lead, lead_email="kept@acme.com"))
+
+    def unavailable():
+        raise ConnectionError("database is down")
+
+    assert asyncio.run(buffer.flush(unavailable)) == 0
+    assert buffer.snapshot()["buffered"] == 1
+    assert buffer.snapshot()["failed_flushes"] == 1
+    assert spilled_lines(tmp_path) == 1
+
+    assert asyncio.run(buffer.flush(test_db)) == 1
+    assert lead_emails(test_client) == ["kept@acme.com"]
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from andromeda_ng.service.crud.lead_scoring_service import compute_scores
+from tests.test_admin import auth_header
+from tests.test_leads import add_leads, page_through
+
+base_lead = {"lead_first_name": "Road", "lead_last_name": "Runner", "lead_phone": "555-0100",
+             "lead_company": "Nobody", "lead_status": "New"}
+
+
+def test_compute_scores():
+    batch = {
+        "status": np.array(["Qualified", "New", "Archived", "New", "Unknown"]),
+        "converted": np.array([False, False, False, True, False]),
+        "message_length": np.array([500.0, 0.0, 5000.0, 0.0, 0.0]),
+        "age_days": np.array([0.0, 30.0, 0.0, 60.0, -1.0]),
+        "email_domain": np.array(["acme.com", "gmail.com", "", "gmail.com", "beta.com"]),
+        "has_website": np.array([False, False, True, False, False]),
+        "customer_match": np.array([False, False, False, False, True]),
+    }
+    scores = compute_scores(batch, np.array(["acme.com"]))
+    # domain 25 + message 15 + status 25 + recency 15 + customer 20
+    assert scores.tolist() == [100.0, 12.5 + 7.5, 25 + 15 + 15, 25 + 3.75, 25 + 12.5 + 15 + 20]
+
+
+def test_rescore_and_sort_by_score(test_client, test_db):
+    response = test_client.post("/api/v1/customers/", json={
+        "customer_name": "Acme Rockets", "customer_phone": "555", "customer_street": "1 Main St",
+        "customer_city": "Springfield", "customer_state": "IL", "customer_postal": "62701",
+        "customer_website": "https://www.acme.com"})
+    assert response.status_code == 201
+    old = datetime.now(timezone.utc) - timedelta(days=60)
+    add_leads(test_db, [
+        dict(base_lead, lead_email="cold@gmail.com", lead_status="Archived", created_at=old),
+        dict(base_lead, lead_email="warm@gmail.com", lead_message="Call me"),
+        dict(base_lead, lead_email="hot@acme.com", lead_status="Qualified",
+             lead_message="Pricing for 500 seats please"),
+        dict(base_lead, lead_email="named@gmail.com", lead_company="acme rockets"),
+    ])
+    before = {lead["lead_email"]: lead for lead in test_client.get("/api/v1/leads/").json()["items"]}
+    assert {lead["lead_score"] for lead in before.values()} == {0}
+
+    response = test_client.post("/api/v1/admin/leads/rescore", headers=auth_header(admin=True))
+    assert response.status_code == 200
+    assert response.json()["scored"] == response.json()["changed"] == 4
+
+    leads = page_through(test_client, {"sort": "score", "limit": 3})
+    assert [lead["lead_email"] for lead in leads] == [
+        "hot@acme.com", "named@gmail.com", "warm@gmail.com", "cold@gmail.com"]
+    scores = [lead["lead_score"] for lead in leads]
+    assert scores == sorted(scores, reverse=True) and scores[-1] > 0
+    # scoring isn't an edit
+    for lead in leads:
+        assert (lead["updated_at"], lead["version"]) == (
+            before[lead["lead_email"]]["updated_at"], before[lead["lead_email"]]["version"])
+
+    ascending = page_through(test_client, {"sort": "score", "order": "asc", "limit": 3})
+    assert ascending == leads[::-1]
+
+
+def test_score_cursor_rejected_for_other_sort(test_client, test_db):
+    add_leads(test_db, [dict(base_lead, lead_email=f"lead{i}@gmail.com") for i in range(3)])
+    page = test_client.get("/api/v1/leads/", params={"sort": "score", "limit": 1}).json()
+    response = test_client.get("/api/v1/leads/", params={"limit": 1, "cursor": page["next_cursor"]})
+    assert response.status_code == 400
+
+    response = test_client.get("/api/v1/leads/", params={"sort": "name"})
+    assert response.status_code == 422
@@ -1,5 +1,8 @@
+import asyncio
+import base64
+import json
 from uuid import uuid4
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from andromeda_ng.service.schema import LeadOutput, LeadSchema
 from andromeda_ng.service.models import Lead
 
@@ -84,4 +87,221 @@ def test_create_lead(test_client, test_db):
 #    
 #    # Verify no lead was created in the database
 #    lead_count = test_db.query(Lead).count()
-#    assert lead_count == 0
\ No newline at end of file
+#    assert lead_count == 0
+
+
+def add_leads(test_db, leads):
+    async def insert():
+        async with test_db() as db:
+            db.add_all([Lead(**lead_data) for lead_data in leads])
+            await db.commit()
+    asyncio.run(insert())
+
+
+def page_through(test_client, params, max_pages=10):
+    seen = []
+    cursor = None
+    for _ in range(max_pages):
+        page_params = dict(params)
+        if cursor:
+            page_params["cursor"] = cursor
+        response = test_client.get("/api/v1/leads/", params=page_params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= params["limit"]
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return seen
+    raise AssertionError(f"lead pages did not end after {max_pages} requests")
+
+
+def test_read_leads_pages_with_cursor(test_client):
+    # created in the same second, so only the id tie-break keeps pages moving
+    for i in range(5):
+        lead_data = dict(create_lead, lead_email=f"lead{i}@example.com")
+        response = test_client.post("/api/v1/leads/", json=lead_data)
+        assert response.status_code == 201
+
+    for order in ("desc", "asc"):
+        seen = page_through(test_client, {"limit": 2, "order": order})
+        ids = [item["id"] for item in seen]
+        assert len(ids) == 5
+        assert len(set(ids)) == 5
+        keys = [(item["created_at"], item["id"]) for item in seen]
+        assert keys == sorted(keys, reverse=order == "desc")
+
+
+def test_read_leads_filters(test_client, test_db):
+    add_leads(test_db, [
+        dict(create_lead, lead_email=f"filter{i}@example.com",
+             lead_company="Acme Inc." if i % 2 else "Beta Co.",
+             lead_status="Qualified" if i < 2 else "New",
+             lead_converted=i == 3)
+        for i in range(4)
+    ])
+
+    def emails(**params):
+        response = test_client.get("/api/v1/leads/", params=params)
+        assert response.status_code == 200
+        return sorted(item["lead_email"] for item in response.json()["items"])
+
+    assert emails(lead_company="Beta Co.") == [
+        "filter0@example.com", "filter2@example.com"]
+    assert emails(lead_status="Qualified") == [
+        "filter0@example.com", "filter1@example.com"]
+    assert emails(lead_converted=True) == ["filter3@example.com"]
+    assert emails(lead_status="New", lead_converted=False) == [
+        "filter2@example.com"]
+
+    now = datetime.now(timezone.utc)
+    assert len(emails(created_before=(now + timedelta(days=1)).isoformat())) == 4
+    assert emails(created_after=(now + timedelta(days=1)).isoformat()) == []
+
+
+def test_read_leads_invalid_cursor(test_client):
+    def cursor(values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    for bad in ["bogus", cursor([1, 2]), cursor(["desc", 1, 2]),
+                cursor(["desc", "yesterday", str(uuid4())]), cursor({"a": 1})]:
+        response = test_client.get("/api/v1/leads/", params={"cursor": bad})
+        assert response.status_code == 400, bad
+
+
+def test_read_leads_cursor_order_mismatch(test_client):
+    for i in range(3):
+        response = test_client.post(
+            "/api/v1/leads/", json=dict(create_lead, lead_email=f"order{i}@example.com"))
+        assert response.status_code == 201
+
+    page = test_client.get("/api/v1/leads/", params={"limit": 1}).json()
+    response = test_client.get(
+        "/api/v1/leads/", params={"limit": 1, "order": "asc", "cursor": page["next_cursor"]})
+    assert response.status_code == 400
+
+
+def test_export_leads_ndjson(test_client, test_db):
+    add_leads(test_db, [
+        dict(create_lead, lead_email=f"export{i}@example.com") for i in range(3)])
+
+    response = test_client.get("/api/v1/leads/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row["lead_email"] for row in rows) == [
+        "export0@example.com", "export1@example.com", "export2@example.com"]
+
+    since = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    response = test_client.get("/api/v1/leads/export", params={"since": since})
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+def test_create_lead_conflict_policies(test_client):
+    lead = {
+        "lead_first_name": "Jane", "lead_last_name": "Doe",
+        "lead_email": "Jane@Example.com", "lead_phone": "555-0100",
+        "lead_company": "Acme",
+    }
+    response = test_client.post("/api/v1/leads/", json=lead)
+    assert response.status_code == 201
+    assert response.json()["lead_email"] == "jane@example.com"
+
+    # the unique index is on lower(lead_email), so case doesn't matter
+    response = test_client.post("/api/v1/leads/", json=dict(lead, lead_email="JANE@example.com"))
+    assert response.status_code == 400
+
+    response = test_client.post("/api/v1/leads/?on_conflict=ignore",
+                                json=dict(lead, lead_company="Globex"))
+    assert response.status_code == 201
+    assert response.json()["lead_company"] == "Acme"
+
+    response = test_client.post("/api/v1/leads/?on_conflict=merge",
+                                json=dict(lead, lead_company="Globex"))
+    assert response.status_code == 201
+    assert response.json()["lead_company"] == "Globex"
+
+    page = test_client.get("/api/v1/leads/").json()
+    assert [item["lead_company"] for item in page["items"]] == ["Globex"]
+
+
+def test_patch_lead(test_client, queries):
+    test_client.post("/api/v1/leads/", json=create_lead)
+    lead = test_client.get("/api/v1/leads/").json()["items"][0]
+    assert lead["version"] == 1
+
+    queries.clear()
+    response = test_client.patch(f"/api/v1/leads/{lead['id']}",
+                                 json={"lead_status": "Qualified"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["lead_status"] == "Qualified"
+    # fields that weren't sent are left alone
+    assert data["lead_company"] == create_lead["lead_company"]
+    assert data["version"] == 2
+    assert response.headers["etag"] == '"2"'
+    # one UPDATE ... RETURNING, no read before it
+    assert [q.split()[0] for q in queries] == ["UPDATE"]
+    assert "RETURNING" in queries[0]
+
+
+def test_patch_lead_if_match(test_client):
+    test_client.post("/api/v1/leads/", json=create_lead)
+    lead_id = test_client.get("/api/v1/leads/").json()["items"][0]["id"]
+
+    response = test_client.patch(f"/api/v1/leads/{lead_id}", json={"lead_status": "Qualified"},
+                                 headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+
+    # a second editor still holding version 1 loses
+    response = test_client.patch(f"/api/v1/leads/{lead_id}", json={"lead_status": "Archived"},
+                                 headers={"If-Match": 'W/"1"'})
+    assert response.status_code == 412
+    assert test_client.get(f"/api/v1/leads/{lead_id}").json()["lead_status"] == "Qualified"
+
+    response = test_client.patch(f"/api/v1/leads/{lead_id}", json={"lead_status": "Archived"},
+                                 headers={"If-Match": "not-an-etag"})
+    assert response.status_code == 400
+
+
+def test_patch_lead_errors(test_client):
+    response = test_client.patch(f"/api/v1/leads/{uuid4()}", json={"lead_status": "Qualified"})
+    assert response.status_code == 404
+    response = test_client.patch(f"/api/v1/leads/{uuid4()}", json={"lead_status": "Qualified"},
+                                 headers={"If-Match": '"1"'})
+    assert response.status_code == 404
+
+    test_client.post("/api/v1/leads/", json=create_lead)
+    test_client.post("/api/v1/leads/", json=dict(create_lead, lead_email="other@example.com"))
+    lead_id = next(item["id"] for item in test_client.get("/api/v1/leads/").json()["items"]
+                   if item["lead_email"] == "other@example.com")
+    response = test_client.patch(f"/api/v1/leads/{lead_id}", json={"lead_company": None})
+    assert response.status_code == 400
+    response = test_client.patch(f"/api/v1/leads/{lead_id}",
+                                 json={"lead_email": create_lead["lead_email"].upper()})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Lead already exists"
+
+
+def test_delete_leads(test_client, queries):
+    for n in range(3):
+        test_client.post("/api/v1/leads/", json=dict(create_lead, lead_email=f"lead{n}@example.com"))
+    ids = [item["id"] for item in test_client.get("/api/v1/leads/").json()["items"]]
+    missing = str(uuid4())
+
+    queries.clear()
+    response = test_client.delete("/api/v1/leads/", params={"ids": ids[:2] + [missing]})
+    assert response.status_code == 200
+    data = response.json()
+    assert sorted(data["deleted"]) == sorted(ids[:2])
+    assert data["not_found"] == [missing]
+    assert [q.split()[0] for q in queries] == ["DELETE"]
+
+    remaining = [item["id"] for item in test_client.get("/api/v1/leads/").json()["items"]]
+    assert remaining == ids[2:]
+
+    assert test_client.delete("/api/v1/leads/").status_code == 422
+    assert test_client.delete(f"/api/v1/leads/{ids[2]}").status_code == 204
+    assert test_client.delete(f"/api/v1/leads/{ids[2]}").status_code == 404
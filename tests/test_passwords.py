@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+
+from andromeda_ng.service.models import User
+from andromeda_ng.service.utils import passwords
+from andromeda_ng.service.utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def test_hash_and_verify_in_pool():
+    async def run():
+        hashed = await passwords.hash_password_async("Secret123!")
+        return (await passwords.verify_password_async("Secret123!", hashed),
+                await passwords.verify_password_async("wrong", hashed))
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_hasher_rejects_when_saturated():
+    hasher = PasswordHasher(workers=1, max_queue=1, retry_after=3)
+    release = threading.Event()
+
+    async def run():
+        blocked = [asyncio.ensure_future(hasher.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PasswordHasherBusy) as busy:
+            await hasher.run(release.wait)
+        assert busy.value.retry_after == 3
+        assert hasher.snapshot()["queued"] == 1
+        release.set()
+        await asyncio.gather(*blocked)
+    asyncio.run(run())
+
+    snapshot = hasher.snapshot()
+    assert snapshot["rejected"] == 1
+    assert snapshot["completed"] == 2
+    assert snapshot["in_flight"] == 0
+    assert snapshot["max_wait_ms"] > 0
+
+
+def add_user(test_db, username, password):
+    async def add():
+        async with test_db() as db:
+            db.add(User(username=username, email=f"{username}@example.com",
+                        hashed_password=passwords.hash_password(password)))
+            await db.commit()
+    asyncio.run(add())
+
+
+def test_login_verifies_in_pool(test_client, test_db):
+    add_user(test_db, "jane", "Secret123!")
+
+    response = test_client.post(
+        "/api/v1/auth/login", data={"username": "jane", "password": "Secret123!"})
+    assert response.status_code == 200
+
+    response = test_client.post(
+        "/api/v1/auth/login", data={"username": "jane", "password": "wrong"})
+    assert response.status_code == 403
+
+
+def test_login_when_saturated(test_client, test_db, monkeypatch):
+    add_user(test_db, "jane", "Secret123!")
+
+    async def busy(*args):
+        raise PasswordHasherBusy(retry_after=2)
+
+    monkeypatch.setattr(passwords.password_hasher, "run", busy)
+    response = test_client.post(
+        "/api/v1/auth/login", data={"username": "jane", "password": "Secret123!"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
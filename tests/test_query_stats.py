@@ -0,0 +1,52 @@
+import asyncio
+
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+from loguru import logger
+from sqlalchemy import select
+
+from andromeda_ng.service.libs.query_stats import QueryStatsMiddleware, fingerprint
+from andromeda_ng.service.models import Customer
+
+
+def test_fingerprint_collapses_literals_and_in_lists():
+    assert fingerprint("SELECT * FROM notes\n WHERE id IN (?, ?, ?)") == \
+        fingerprint("SELECT * FROM notes WHERE id IN (?)")
+    assert fingerprint("SELECT * FROM leads WHERE id = $1 LIMIT 10") == \
+        "SELECT * FROM leads WHERE id = ? LIMIT ?"
+    assert fingerprint("SELECT 'a' WHERE x = 'it''s'") == "SELECT ? WHERE x = ?"
+
+
+def test_response_headers_count_queries(test_client):
+    response = test_client.get("/api/v1/customers/")
+    assert response.status_code == 200
+    assert response.headers["X-DB-Query-Count"] == "1"
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+    response = test_client.get("/api/v1/ping")
+    assert response.headers["X-DB-Query-Count"] == "0"
+
+
+def test_repeated_statements_log_a_warning(test_db):
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, threshold=3)
+
+    @app.get("/n-plus-one")
+    async def n_plus_one():
+        async with test_db() as db:
+            for _ in range(4):
+                await db.execute(select(Customer).where(Customer.zammad_id == 1))
+        return {}
+
+    warnings = []
+    sink = logger.add(lambda message: warnings.append(message.record),
+                      level="WARNING")
+    try:
+        response = TestClient(app).get("/n-plus-one")
+    finally:
+        logger.remove(sink)
+
+    assert response.headers["X-DB-Query-Count"] == "4"
+    [warning] = warnings
+    assert warning["extra"]["repeats"] == 4
+    assert warning["extra"]["endpoint"] == "GET /n-plus-one"
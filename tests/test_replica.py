@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from andromeda_ng.service import database
+from andromeda_ng.service.database import ReplicaHealth, PRIMARY_COOKIE, get_async_db
+from andromeda_ng.service.models import Customer
+
+
+@pytest.fixture
+def routing(monkeypatch):
+    primary = create_async_engine("sqlite+aiosqlite:///:memory:")
+    replica = create_async_engine("sqlite+aiosqlite:///:memory:")
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(bind=primary))
+    monkeypatch.setattr(database, "ReplicaSessionLocal", async_sessionmaker(bind=replica))
+    health = ReplicaHealth(replica)
+    monkeypatch.setattr(database, "replica_health", health)
+
+    app = FastAPI()
+
+    def engine_name(db):
+        return "replica" if db.bind is replica else "primary"
+
+    @app.get("/read")
+    async def read(db=Depends(get_async_db)):
+        return engine_name(db)
+
+    @app.post("/write")
+    async def write(db=Depends(get_async_db)):
+        return engine_name(db)
+
+    yield TestClient(app), health
+    asyncio.run(primary.dispose())
+    asyncio.run(replica.dispose())
+
+
+def test_reads_go_to_replica_and_writes_to_primary(routing):
+    client, health = routing
+    assert client.get("/read").json() == "replica"
+    response = client.post("/write")
+    assert response.json() == "primary"
+    assert PRIMARY_COOKIE in response.cookies
+
+
+def test_read_your_writes_window(routing):
+    client, health = routing
+    client.post("/write")
+    # the client carries the cookie, so its reads follow the write
+    assert client.get("/read").json() == "primary"
+
+    client.cookies.clear()
+    assert client.get("/read").json() == "replica"
+
+
+def test_unhealthy_replica_falls_back_to_primary(routing):
+    client, health = routing
+    health.mark_down("test")
+    assert client.get("/read").json() == "primary"
+
+    health.down_until = 0
+    assert client.get("/read").json() == "replica"
+
+
+def test_failed_health_check_marks_replica_down(routing):
+    client, health = routing
+    health.engine = create_async_engine("sqlite+aiosqlite:////nonexistent/dir/replica.db")
+    health.checked_at = 0
+    assert client.get("/read").json() == "primary"
+    assert not asyncio.run(health.available())
+    asyncio.run(health.engine.dispose())
+
+
+def test_read_only_session_releases_connection_after_each_statement(test_read_db):
+    async def run():
+        async with test_read_db() as db:
+            db.add(Customer(customer_name="Acme", customer_phone="1", customer_street="s",
+                            customer_city="c", customer_state="IL", customer_postal="1"))
+            await db.commit()
+            customer = (await db.execute(select(Customer))).scalars().one()
+            # rows are buffered and the transaction already ended
+            assert not db.in_transaction()
+            assert customer.customer_name == "Acme"
+            assert await db.scalar(select(func.count()).select_from(Customer)) == 1
+            assert not db.in_transaction()
+    asyncio.run(run())
+
+
+def test_read_only_sessionmaker_opens_read_only_transactions():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    factory = database.read_only_sessionmaker(engine)
+    assert factory.kw["bind"].get_execution_options()["postgresql_readonly"] is True
+    assert factory.class_ is database.ReadOnlyAsyncSession
+    asyncio.run(engine.dispose())
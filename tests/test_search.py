@@ -0,0 +1,69 @@
+from andromeda_ng.service.crud.search_service import search_terms
+
+
+def seed(test_client):
+    response = test_client.post("/api/v1/customers/", json={
+        "customer_name": "Acme Rockets", "customer_phone": "555", "customer_street": "1 Main St",
+        "customer_city": "Springfield", "customer_state": "IL", "customer_postal": "62701"})
+    assert response.status_code == 201
+    customer = test_client.get("/api/v1/customers/name/Acme Rockets").json()
+    test_client.post("/api/v1/contacts/", json={
+        "contact_first_name": "Wile", "contact_last_name": "Coyote",
+        "contact_email": "wile@acme.com", "customer_id": customer["id"]})
+    test_client.post("/api/v1/notes/", json={
+        "note_title": "Rocket order", "note_content": "Wants more acme rockets",
+        "customer_id": customer["id"]})
+    for n in range(3):
+        test_client.post("/api/v1/leads/", json={
+            "lead_first_name": f"Road{n}", "lead_last_name": "Runner",
+            "lead_email": f"road{n}@acme.com", "lead_phone": "555", "lead_company": "Acme"})
+
+
+def test_search_terms():
+    assert search_terms("  Wile E. Coyote!") == ["wile", "e", "coyote"]
+    assert search_terms("foo_bar") == ["foo", "bar"]
+    assert search_terms("***") == []
+
+
+def test_search_typed_hits(test_client):
+    seed(test_client)
+
+    response = test_client.get("/api/v1/search", params={"q": "acme"})
+    assert response.status_code == 200
+    page = response.json()
+    types = sorted(hit["type"] for hit in page["items"])
+    assert types == ["contact", "customer", "lead", "lead", "lead", "note"]
+    assert page["next_cursor"] is None
+
+    response = test_client.get("/api/v1/search", params={"q": "wile coyote"})
+    hits = response.json()["items"]
+    assert [(hit["type"], hit["title"], hit["subtitle"]) for hit in hits] == [
+        ("contact", "Wile Coyote", "wile@acme.com")]
+
+    response = test_client.get("/api/v1/search", params={"q": "acme", "types": ["customer", "note"]})
+    assert sorted(hit["type"] for hit in response.json()["items"]) == ["customer", "note"]
+
+
+def test_search_pages_with_cursor(test_client):
+    seed(test_client)
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"q": "acme", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = test_client.get("/api/v1/search", params=params).json()
+        seen += [(hit["type"], hit["id"]) for hit in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 6
+    assert len(set(seen)) == 6
+
+
+def test_search_errors(test_client):
+    assert test_client.get("/api/v1/search", params={"q": "!!"}).status_code == 400
+    assert test_client.get("/api/v1/search", params={"q": "acme", "cursor": "junk"}).status_code == 400
+    assert test_client.get("/api/v1/search", params={"q": "acme", "types": ["deal"]}).status_code == 400
+    assert test_client.get("/api/v1/search").status_code == 422
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from andromeda_ng.service.libs.slow_queries import slow_query_log, parameter_shape
+from andromeda_ng.service.models import Customer
+from tests.test_admin import auth_header
+
+
+@pytest.fixture
+def log_everything(monkeypatch):
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+    slow_query_log.clear()
+    yield slow_query_log
+    slow_query_log.clear()
+
+
+def test_parameter_shape_hides_values():
+    assert parameter_shape({"name": "Acme", "limit": 10}) == {"name": "str", "limit": "int"}
+    assert parameter_shape(("Acme", 1.5)) == ["str", "float"]
+    assert parameter_shape([("a",), ("b",)]) == {"rows": 2, "shape": ["str"]}
+
+
+def test_slow_queries_endpoint(test_client, log_everything):
+    test_client.get("/api/v1/customers/name/acme")
+
+    response = test_client.get("/api/v1/admin/db/slow-queries?order=recent",
+                               headers=auth_header(admin=True))
+    assert response.status_code == 200
+    [entry] = response.json()["queries"]
+    assert entry["sql"].startswith("SELECT customers.id")
+    assert entry["endpoint"] == "GET /api/v1/customers/name/{customer_name}"
+    assert "acme" not in str(entry["parameters"])
+
+
+def test_slow_query_explain(test_engine, test_db, log_everything, monkeypatch):
+    monkeypatch.setattr(slow_query_log, "explain", True)
+
+    async def run():
+        async with test_db() as db:
+            await db.execute(select(Customer).where(Customer.zammad_id == 7))
+        await asyncio.sleep(0.05)
+    asyncio.run(run())
+
+    entries = slow_query_log.entries()
+    entry = next(e for e in entries if "FROM customers" in e["sql"])
+    assert entry["endpoint"] is None
+    assert "customers" in entry["plan"]
@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from andromeda_ng.service.libs import zammad
+from andromeda_ng.service.schema import ZammadCompany
+
+TICKETS = [
+    {"id": 1, "title": "Printer", "number": "1001", "state": "open", "state_id": 2,
+     "priority": "2 normal", "article_ids": [1, 2, 3]},
+    {"id": 2, "title": "VPN", "number": "1002", "state": "closed", "state_id": 4,
+     "priority": "3 high", "article_ids": [4]},
+    {"id": 3, "title": "Laptop", "number": "1003", "state": "Pending Reminder",
+     "state_id": 3, "priority": "1 low", "article_ids": []},
+]
+
+
+def stand_in_zammad() -> FastAPI:
+    """Minimal stand-in for the parts of the Zammad REST API we call"""
+    app = FastAPI()
+    app.state.requests = []
+
+    @app.middleware("http")
+    async def record(request: Request, call_next):
+        app.state.requests.append(request)
+        return await call_next(request)
+
+    @app.post("/api/v1/organizations")
+    async def create_organization(request: Request):
+        return {"id": 42, **(await request.json())}
+
+    @app.post("/api/v1/users")
+    async def create_user(request: Request):
+        return {"id": 7, **(await request.json())}
+
+    @app.get("/api/v1/tickets/search")
+    async def search(query: str, expand: bool = False):
+        if "organization_id:404" in query:
+            return []
+        return TICKETS
+
+    return app
+
+
+@pytest.fixture
+def stand_in():
+    app = stand_in_zammad()
+    zammad.configure_client(transport=httpx.ASGITransport(app=app))
+    yield app
+    asyncio.run(zammad.close_client())
+
+
+def test_create_organization(stand_in):
+    result = asyncio.run(zammad.create_organization(ZammadCompany(name="Acme")))
+    assert result["id"] == 42
+    assert result["name"] == "Acme"
+    request = stand_in.state.requests[0]
+    assert request.headers["authorization"].startswith("Bearer ")
+
+
+def test_create_user(stand_in):
+    result = asyncio.run(zammad.create_user(
+        {"email": "jane@example.com", "login": "jane@example.com"}, 42))
+    assert result["id"] == 7
+
+
+def test_get_company_tickets(stand_in):
+    result = asyncio.run(zammad.get_company_tickets(42))
+    assert len(stand_in.state.requests) == 1
+    assert result["total_count"] == 3
+    assert result["open_count"] == 2
+    assert [t["id"] for t in result["all_tickets"]] == [1, 2, 3]
+    assert set(result["all_tickets"][0]) == set(zammad.TICKET_FIELDS)
+
+
+def test_get_company_tickets_none_found(stand_in):
+    result = asyncio.run(zammad.get_company_tickets(404))
+    assert result["total_count"] == 0
+    assert result["open_count"] == 0
+    assert result["all_tickets"] == []
+
+
+def test_get_company_tickets_server_error():
+    def failing(request):
+        return httpx.Response(500)
+
+    zammad.configure_client(transport=httpx.MockTransport(failing))
+    try:
+        assert asyncio.run(zammad.get_company_tickets(42)) is None
+    finally:
+        asyncio.run(zammad.close_client())